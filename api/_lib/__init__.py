@@ -0,0 +1,7 @@
+"""Shared helpers for the Handenheit serverless functions.
+
+Vercel does not turn underscore-prefixed paths under api/ into endpoints, so
+the handlers can import from here without exposing anything new. Handlers put
+api/ on sys.path first since their file names (vector-search.py, ...) are not
+importable packages themselves.
+"""
@@ -0,0 +1,385 @@
+"""Approximate nearest-neighbor search over attendee embeddings
+
+HNSWIndex is a pure-Python Hierarchical Navigable Small World graph
+(Malkov & Yashunin): each vector is linked to its nearest neighbors on a
+stack of increasingly sparse layers, and a query greedily descends the
+layers before a best-first search of width ef_search on the bottom one.
+Query cost grows roughly with log(N) instead of N, inserts are incremental,
+and so is persistence: a save writes the new and replaced vectors in place
+and appends the new nodes and rewired links to a change log, and the full
+graph is rewritten only when the log outgrows it (see storage.should_compact).
+
+ExactIndex is the brute-force baseline with the same interface, used for
+small datasets and for measuring recall.
+
+Vectors are L2-normalized on insert, so similarity is a dot product and
+equals the cosine similarity that match_attendees returns.
+"""
+
+import heapq
+import math
+import os
+import random
+from array import array
+from operator import mul
+
+from _lib.storage import (append_json_line, read_json, read_json_lines,
+                          remove_file, should_compact, write_bytes, write_json,
+                          write_records)
+
+DEFAULT_M = 16
+DEFAULT_EF_CONSTRUCTION = 100
+# Vector search asks for 50 matches; see bench/ann-recall-report.md
+DEFAULT_EF_SEARCH = 128
+
+def normalize(vector):
+    """Return the vector scaled to unit length as a float32 array"""
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return array('f', (x / norm for x in vector))
+
+def dot(a, b):
+    return sum(map(mul, a, b))
+
+def save_vectors(path, vectors):
+    """Write equal-length float32 vectors as one flat binary file"""
+    flat = array('f')
+    for v in vectors:
+        flat.extend(v)
+    write_bytes(path, flat.tobytes())
+
+def save_changed_vectors(path, vectors, positions):
+    """Write just the vectors at positions into a file written by save_vectors()"""
+    if positions:
+        write_records(path, 4 * len(vectors[0]), {i: vectors[i].tobytes() for i in positions})
+
+def load_vectors(path, dim, count):
+    """Read vectors written by save_vectors()"""
+    flat = array('f')
+    with open(path, 'rb') as f:
+        flat.frombytes(f.read())
+    return [flat[i * dim:(i + 1) * dim] for i in range(count)]
+
+class ExactIndex:
+    """Brute-force cosine search; exact but O(N) per query"""
+
+    def __init__(self):
+        self.ids = []
+        self.vectors = []
+        self.positions = {}
+        # Vectors up to saved are on disk; dirty ones were replaced since
+        self.saved = 0
+        self.dirty = set()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, item_id, vector):
+        item_id = str(item_id)
+        vector = normalize(vector)
+        if item_id in self.positions:
+            self.vectors[self.positions[item_id]] = vector
+            self.dirty.add(self.positions[item_id])
+            return
+        self.positions[item_id] = len(self.ids)
+        self.ids.append(item_id)
+        self.vectors.append(vector)
+
+    def search(self, vector, k=10, **_):
+        """Return [(id, similarity)] for the k most similar vectors"""
+        query = normalize(vector)
+        scored = ((dot(query, v), i) for i, v in enumerate(self.vectors))
+        return [(self.ids[i], s) for s, i in heapq.nlargest(k, scored)]
+
+    def save(self, directory):
+        """Persist the changes since the last save (exact.log), or everything when compacting"""
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, 'exact.json')
+        log_path = os.path.join(directory, 'exact.log')
+        vectors_path = os.path.join(directory, 'vectors.f32')
+
+        if should_compact(meta_path, log_path):
+            save_vectors(vectors_path, self.vectors)
+            write_json(meta_path, {
+                'dim': len(self.vectors[0]) if self.vectors else 0,
+                'ids': self.ids
+            })
+            remove_file(log_path)
+        elif self.dirty or self.saved < len(self.ids):
+            # Vectors first: a log line is only read once its vectors are on disk
+            save_changed_vectors(vectors_path, self.vectors, self.dirty | set(range(self.saved, len(self.ids))))
+            append_json_line(log_path, {
+                'dim': len(self.vectors[0]),
+                'start': self.saved,
+                'ids': self.ids[self.saved:]
+            })
+        self.saved = len(self.ids)
+        self.dirty = set()
+
+    @classmethod
+    def load(cls, directory, **_):
+        """Load a saved index, or return None if there is none"""
+        meta = read_json(os.path.join(directory, 'exact.json'))
+        if meta is None:
+            return None
+
+        index = cls()
+        dim = meta['dim']
+        index.ids = meta['ids']
+        # Replaying a change the snapshot already holds rewrites the same ids
+        for change in read_json_lines(os.path.join(directory, 'exact.log')):
+            dim = change['dim']
+            index.ids[change['start']:change['start'] + len(change['ids'])] = change['ids']
+        index.positions = {item_id: i for i, item_id in enumerate(index.ids)}
+        index.vectors = load_vectors(os.path.join(directory, 'vectors.f32'), dim, len(index.ids))
+        index.saved = len(index.ids)
+        return index
+
+class HNSWIndex:
+    """Incremental HNSW graph with tunable recall/latency
+
+    m bounds the links per node (2*m on the bottom layer), ef_construction
+    the search width used while inserting, and ef_search the default search
+    width at query time. Larger values raise recall at the cost of latency.
+    """
+
+    def __init__(self, m=DEFAULT_M, ef_construction=DEFAULT_EF_CONSTRUCTION, ef_search=DEFAULT_EF_SEARCH, seed=None):
+        self.m = m
+        self.m0 = 2 * m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.level_mult = 1 / math.log(m)
+        self.rng = random.Random(seed)
+
+        self.ids = []
+        self.positions = {}
+        self.vectors = []
+        self.levels = []
+        # graph[node][level] -> list of neighbor nodes
+        self.graph = []
+        self.entry = None
+        self.max_level = -1
+        # Nodes up to saved are on disk; dirty ones were moved or relinked since
+        self.saved = 0
+        self.dirty = set()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _random_level(self):
+        return int(-math.log(1.0 - self.rng.random()) * self.level_mult)
+
+    def _search_layer(self, query, entry_points, ef, level):
+        """Best-first search of one layer; returns [(similarity, node)] best first"""
+        visited = set(entry_points)
+        candidates = []
+        results = []
+        for node in entry_points:
+            s = dot(query, self.vectors[node])
+            heapq.heappush(candidates, (-s, node))
+            heapq.heappush(results, (s, node))
+
+        while candidates:
+            neg_s, node = heapq.heappop(candidates)
+            if -neg_s < results[0][0] and len(results) >= ef:
+                break
+            for neighbor in self.graph[node][level]:
+                if neighbor in visited:
+                    continue
+                visited.add(neighbor)
+                s = dot(query, self.vectors[neighbor])
+                if len(results) < ef or s > results[0][0]:
+                    heapq.heappush(candidates, (-s, neighbor))
+                    heapq.heappush(results, (s, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted(results, reverse=True)
+
+    def _select_neighbors(self, scored, limit):
+        """Neighbor selection heuristic: prefer diverse directions
+
+        A candidate is kept only if it is closer to the new node than to any
+        neighbor already kept; remaining slots are filled with the closest
+        pruned candidates so sparse regions stay connected.
+        """
+        selected = []
+        pruned = []
+        for s, node in scored:
+            if len(selected) >= limit:
+                break
+            vec = self.vectors[node]
+            if all(dot(vec, self.vectors[other]) < s for _, other in selected):
+                selected.append((s, node))
+            else:
+                pruned.append((s, node))
+        for item in pruned:
+            if len(selected) >= limit:
+                break
+            selected.append(item)
+        return [node for _, node in selected]
+
+    def _link(self, node, level, neighbors):
+        limit = self.m0 if level == 0 else self.m
+        self.graph[node][level] = list(neighbors)
+        self.dirty.add(node)
+        for neighbor in neighbors:
+            links = self.graph[neighbor][level]
+            if node in links:
+                continue
+            links.append(node)
+            self.dirty.add(neighbor)
+            if len(links) > limit:
+                # Shrink by plain similarity; rerunning the heuristic on every
+                # overflow costs more than it gains in recall
+                vec = self.vectors[neighbor]
+                scored = heapq.nlargest(limit, ((dot(vec, self.vectors[n]), n) for n in links))
+                self.graph[neighbor][level] = [n for _, n in scored]
+
+    def _connect(self, node):
+        """Wire a node into every layer up to its level"""
+        query = self.vectors[node]
+        level = self.levels[node]
+
+        entry = [self.entry]
+        for lc in range(self.max_level, level, -1):
+            entry = [self._search_layer(query, entry, 1, lc)[0][1]]
+
+        for lc in range(min(level, self.max_level), -1, -1):
+            scored = [(s, n) for s, n in self._search_layer(query, entry, self.ef_construction, lc) if n != node]
+            limit = self.m0 if lc == 0 else self.m
+            self._link(node, lc, self._select_neighbors(scored, limit))
+            entry = [n for _, n in scored] or entry
+
+    def add(self, item_id, vector):
+        """Insert a vector, or replace it and relink if the id already exists"""
+        item_id = str(item_id)
+        vector = normalize(vector)
+
+        if item_id in self.positions:
+            node = self.positions[item_id]
+            self.vectors[node] = vector
+            self.dirty.add(node)
+            if len(self.ids) > 1:
+                self._connect(node)
+            return
+
+        node = len(self.ids)
+        level = self._random_level()
+        self.positions[item_id] = node
+        self.ids.append(item_id)
+        self.vectors.append(vector)
+        self.levels.append(level)
+        self.graph.append([[] for _ in range(level + 1)])
+
+        if self.entry is None:
+            self.entry = node
+            self.max_level = level
+            return
+
+        self._connect(node)
+        if level > self.max_level:
+            self.entry = node
+            self.max_level = level
+
+    def search(self, vector, k=10, ef_search=None):
+        """Return [(id, similarity)] for approximately the k most similar vectors"""
+        if self.entry is None:
+            return []
+
+        query = normalize(vector)
+        entry = [self.entry]
+        for lc in range(self.max_level, 0, -1):
+            entry = [self._search_layer(query, entry, 1, lc)[0][1]]
+
+        ef = max(ef_search or self.ef_search, k)
+        return [(self.ids[n], s) for s, n in self._search_layer(query, entry, ef, 0)[:k]]
+
+    def save(self, directory):
+        """Persist the graph (JSON) and vectors (float32) to a directory
+
+        Once a snapshot exists only the changes since the last save are
+        written: new and replaced vectors in place, and the new nodes and
+        every relinked node's links as one line of hnsw.log. The snapshot is
+        rewritten when the log outgrows it.
+        """
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, 'hnsw.json')
+        log_path = os.path.join(directory, 'hnsw.log')
+        vectors_path = os.path.join(directory, 'vectors.f32')
+
+        if should_compact(meta_path, log_path):
+            save_vectors(vectors_path, self.vectors)
+            write_json(meta_path, {
+                'm': self.m,
+                'ef_construction': self.ef_construction,
+                'ef_search': self.ef_search,
+                'dim': len(self.vectors[0]) if self.vectors else 0,
+                'ids': self.ids,
+                'levels': self.levels,
+                'graph': self.graph,
+                'entry': self.entry,
+                'max_level': self.max_level
+            })
+            remove_file(log_path)
+        elif self.dirty or self.saved < len(self.ids):
+            changed = self.dirty | set(range(self.saved, len(self.ids)))
+            # Vectors first: a log line is only read once its vectors are on disk
+            save_changed_vectors(vectors_path, self.vectors, changed)
+            append_json_line(log_path, {
+                'dim': len(self.vectors[0]),
+                'start': self.saved,
+                'ids': self.ids[self.saved:],
+                'levels': self.levels[self.saved:],
+                'graph': {node: self.graph[node] for node in changed},
+                'entry': self.entry,
+                'max_level': self.max_level
+            })
+        self.saved = len(self.ids)
+        self.dirty = set()
+
+    @classmethod
+    def load(cls, directory, **overrides):
+        """Load a saved index, or return None if there is none
+
+        overrides may adjust ef_search (or ef_construction for later inserts)
+        without rebuilding.
+        """
+        meta = read_json(os.path.join(directory, 'hnsw.json'))
+        if meta is None:
+            return None
+
+        index = cls(m=meta['m'], ef_construction=meta['ef_construction'], ef_search=meta['ef_search'])
+        for key, value in overrides.items():
+            if value is not None:
+                setattr(index, key, value)
+
+        dim = meta['dim']
+        index.ids = meta['ids']
+        index.levels = meta['levels']
+        index.graph = meta['graph']
+        index.entry = meta['entry']
+        index.max_level = meta['max_level']
+
+        # Replaying a change the snapshot already holds rewrites the same values
+        for change in read_json_lines(os.path.join(directory, 'hnsw.log')):
+            start, end = change['start'], change['start'] + len(change['ids'])
+            dim = change['dim']
+            index.ids[start:end] = change['ids']
+            index.levels[start:end] = change['levels']
+            index.graph.extend([] for _ in range(len(index.ids) - len(index.graph)))
+            for node, links in change['graph'].items():
+                index.graph[int(node)] = links
+            index.entry = change['entry']
+            index.max_level = change['max_level']
+
+        index.positions = {item_id: i for i, item_id in enumerate(index.ids)}
+        index.vectors = load_vectors(os.path.join(directory, 'vectors.f32'), dim, len(index.ids))
+        index.saved = len(index.ids)
+        return index
+
+def describe(index):
+    """Small JSON-able summary of an index, for reports and debugging"""
+    info = {'type': type(index).__name__, 'size': len(index)}
+    if isinstance(index, HNSWIndex):
+        info.update({'m': index.m, 'ef_construction': index.ef_construction, 'ef_search': index.ef_search, 'max_level': index.max_level})
+    return info
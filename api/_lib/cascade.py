@@ -0,0 +1,143 @@
+"""Two-stage search cascade
+
+The coarse stage ranks every attendee cheaply - either with the local BM25
+index or with a fast model reading a one-line digest per profile - and only
+the top K candidates are sent to the expensive model for scoring and
+highlights. Expensive-model tokens then scale with K instead of the size of
+the database.
+"""
+
+import json
+import urllib.request
+
+from _lib.lexical import LexicalIndex
+from _lib.metrics import record_usage
+from _lib.providers import GEMINI_BASE_URL
+from _lib.resilience import urlopen
+from _lib.serialize import loads, strip_code_fence
+
+DEFAULT_CASCADE_K = 40
+
+# Coarse models, by the same names the frontend uses for full searches
+COARSE_MODEL_IDS = {
+    'gemini-3-flash': 'gemini-3-flash-preview',
+    'gemini-flash': 'gemini-2.0-flash'
+}
+
+DESCRIPTION_CHARS = 160
+
+def _text(val):
+    if isinstance(val, dict):
+        return val.get('text', '')
+    return val or ''
+
+def screening_line(attendee):
+    """One-line digest of a profile for the coarse model"""
+    parts = [str(attendee.get('id')), attendee.get('name') or '']
+    for key in ('headline', 'location', 'school'):
+        if attendee.get(key):
+            parts.append(attendee[key])
+
+    exp = []
+    for e in attendee.get('experience') or []:
+        entry = f"{e.get('title', '')} @ {e.get('company', '')}"
+        if e.get('description'):
+            entry += f" ({e['description'][:DESCRIPTION_CHARS]})"
+        exp.append(entry)
+    if exp:
+        parts.append('exp: ' + '; '.join(exp))
+
+    edu = [', '.join(p for p in (e.get('degree'), e.get('school')) if p) for e in attendee.get('education') or []]
+    if edu:
+        parts.append('edu: ' + '; '.join(edu))
+
+    for key in ('organizations', 'projects', 'volunteering', 'awards'):
+        names = [o.get('name') or o.get('organization') or o.get('role') or '' for o in attendee.get(key) or [] if isinstance(o, dict)]
+        if names:
+            parts.append(f"{key}: {'; '.join(n for n in names if n)}")
+
+    for key in ('skills', 'interests', 'languages'):
+        if attendee.get(key):
+            parts.append(f"{key}: {', '.join(attendee[key])}")
+
+    about = _text(attendee.get('about'))
+    if about:
+        parts.append('about: ' + about[:DESCRIPTION_CHARS * 2])
+
+    return ' | '.join(parts)
+
+def call_gemini_screen(api_key, search_query, attendees, k, model_id, deadline=None):
+    """Ask a fast Gemini model for the ids of the K most relevant attendees"""
+    digest = '\n'.join(screening_line(a) for a in attendees)
+
+    url = f'{GEMINI_BASE_URL}/v1beta/models/{model_id}:generateContent?key={api_key}'
+
+    req_data = {
+        'contents': [{
+            'parts': [{
+                'text': f"""You are screening attendee profiles for a search. Each line is: id | name | profile details.
+
+{digest}
+
+Search query: "{search_query}"
+
+Return the ids of up to {k} attendees who could plausibly match the query, most relevant first. Include inferred matches (e.g. a school located in a searched state). Return ONLY JSON: {{"ids": [id, ...]}}"""
+            }],
+            'role': 'user'
+        }],
+        'generationConfig': {
+            'temperature': 0,
+            'maxOutputTokens': 64 + k * 24,
+            'responseMimeType': 'application/json'
+        }
+    }
+
+    req = urllib.request.Request(
+        url,
+        data=json.dumps(req_data).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}
+    )
+
+    response = urlopen(req, timeout=30, deadline=deadline)
+    result = loads(response.read())
+    record_usage('gemini', model_id, result)
+
+    text = result['candidates'][0]['content']['parts'][0]['text']
+    return [str(i) for i in loads(strip_code_fence(text)).get('ids', [])]
+
+def select_candidates(search_query, attendees, k=DEFAULT_CASCADE_K, coarse_model='gemini-3-flash', api_key='', deadline=None):
+    """Run the coarse stage and return (top-K attendees, cascade info)
+
+    Fast-model picks come first; remaining slots are filled from the BM25
+    ranking so a terse model answer cannot starve the expensive stage. If the
+    fast model fails the cascade degrades to lexical ranking alone.
+    """
+    info = {'coarse_model': coarse_model, 'k': k, 'total': len(attendees)}
+    if len(attendees) <= k:
+        info['candidates'] = len(attendees)
+        return attendees, info
+
+    by_id = {str(a.get('id')): a for a in attendees}
+    ranked = []
+
+    if coarse_model != 'lexical':
+        model_id = COARSE_MODEL_IDS.get(coarse_model)
+        if not model_id:
+            raise ValueError(f'Invalid coarse model: {coarse_model}')
+        try:
+            ranked = [i for i in call_gemini_screen(api_key, search_query, attendees, k, model_id, deadline) if i in by_id]
+        except Exception as e:
+            info['coarse_error'] = str(e)
+
+    seen = set(ranked)
+    for attendee_id, _ in LexicalIndex(attendees).search(search_query):
+        if len(ranked) >= k:
+            break
+        key = str(attendee_id)
+        if key not in seen:
+            seen.add(key)
+            ranked.append(key)
+
+    candidates = [by_id[i] for i in ranked[:k]]
+    info['candidates'] = len(candidates)
+    return candidates, info
@@ -0,0 +1,109 @@
+"""Chunk-level (per-section) attendee embeddings in Supabase
+
+A single embedding per attendee dilutes long profiles. With ATTENDEE_CHUNKS
+enabled, sync also stores one embedding per profile section in the
+attendee_chunks table (see supabase/attendee-chunks.sql) and vector search
+ranks attendees by their best-matching chunk. The matching chunks come back
+with their (section, index) address, which is what highlights point at.
+"""
+
+import json
+import os
+import urllib.request
+
+from _lib.embeddings import embed_texts
+from _lib.profiles import profile_sections
+from _lib.resilience import urlopen
+
+SUPABASE_URL = os.environ.get('SUPABASE_URL', '')
+SUPABASE_KEY = os.environ.get('SUPABASE_SERVICE_KEY', '')
+
+CHUNKS_ENABLED = os.environ.get('ATTENDEE_CHUNKS', '').lower() in ('1', 'true', 'yes')
+
+# Chunks shown to the rerank model as hints about where the match is
+MAX_MATCHED_SECTIONS = 3
+
+def _headers(extra=None):
+    headers = {
+        'Content-Type': 'application/json',
+        'apikey': SUPABASE_KEY,
+        'Authorization': f'Bearer {SUPABASE_KEY}'
+    }
+    headers.update(extra or {})
+    return headers
+
+def build_chunks(attendee, api_key, deadline=None):
+    """Embed each section of an attendee and return attendee_chunks rows"""
+    attendee_id = str(attendee.get('id'))
+    sections = profile_sections(attendee)
+    if not sections:
+        return []
+
+    embeddings = embed_texts([text for _, _, text in sections], api_key, deadline)
+    return [{
+        'id': f'{attendee_id}:{section}:{"" if index is None else index}',
+        'attendee_id': attendee_id,
+        'section': section,
+        'idx': index,
+        'content': text,
+        'embedding': embedding
+    } for (section, index, text), embedding in zip(sections, embeddings)]
+
+def replace_attendee_chunks(attendee_id, chunks, deadline=None):
+    """Replace all stored chunks of an attendee
+
+    Old rows are deleted first because entries may have been removed or
+    reordered, which changes their (section, index) addresses.
+    """
+    attendee_id = urllib.request.quote(str(attendee_id), safe='')
+    req = urllib.request.Request(
+        f'{SUPABASE_URL}/rest/v1/attendee_chunks?attendee_id=eq.{attendee_id}',
+        headers=_headers(),
+        method='DELETE'
+    )
+    urlopen(req, timeout=30, deadline=deadline)
+
+    if not chunks:
+        return
+
+    req = urllib.request.Request(
+        f'{SUPABASE_URL}/rest/v1/attendee_chunks',
+        data=json.dumps(chunks).encode('utf-8'),
+        headers=_headers({'Prefer': 'resolution=merge-duplicates'})
+    )
+    urlopen(req, timeout=30, deadline=deadline)
+
+def search_chunks(query_embedding, match_count=50, match_threshold=0.3, deadline=None):
+    """Max-sim attendee retrieval over chunk embeddings
+
+    Returns attendee rows like match_attendees, each with 'similarity' (the
+    best chunk's) and 'chunks' ([{section, index, similarity}], best first).
+    """
+    req_data = {
+        'query_embedding': query_embedding,
+        'match_threshold': match_threshold,
+        'match_count': match_count
+    }
+
+    req = urllib.request.Request(
+        f'{SUPABASE_URL}/rest/v1/rpc/match_attendee_chunks',
+        data=json.dumps(req_data).encode('utf-8'),
+        headers=_headers()
+    )
+
+    response = urlopen(req, timeout=30, deadline=deadline)
+    rows = []
+    for r in json.loads(response.read().decode('utf-8')):
+        row = dict(r['attendee'])
+        row['similarity'] = r['similarity']
+        row['chunks'] = r['chunks']
+        rows.append(row)
+    return rows
+
+def matched_sections(row):
+    """Best-matching chunk addresses of a row, e.g. ['experience[2]', 'headline']"""
+    labels = []
+    for c in (row.get('chunks') or [])[:MAX_MATCHED_SECTIONS]:
+        index = c.get('index')
+        labels.append(c['section'] if index is None else f"{c['section']}[{index}]")
+    return labels
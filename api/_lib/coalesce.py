@@ -0,0 +1,195 @@
+"""Single-flight coalescing of identical concurrent searches
+
+At events several people often run the same search within seconds of each
+other. The first request for a key becomes the leader and does the work;
+requests with the same key that arrive while it runs wait for the leader's
+response instead of calling the model again. Keys cover the query, the
+model, the other request options and the dataset version, so only requests
+that would get the same answer share one. If the leader fails without
+answering, each waiting request does the work itself.
+
+SINGLE_FLIGHT picks the backend:
+- memory (default): requests in one process (proxy-server.py, a warm
+  function instance)
+- file: also across processes and instances that share the data directory
+  (HANDENHEIT_DATA_DIR on a shared volume); a lock file marks the search in
+  flight and the leader leaves its response next to it, where it stays until
+  no follower can still be waiting for it
+- off: every request does its own work
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from _lib.metrics import REGISTRY
+from _lib.resilience import FUNCTION_MAX_DURATION
+from _lib.storage import DATA_DIR, read_json, write_json
+
+SINGLE_FLIGHT = os.environ.get('SINGLE_FLIGHT', 'memory').lower()
+
+# How often followers look for the leader's response in file mode
+POLL_SECONDS = 0.05
+
+def normalize_query(query):
+    """Queries that differ only in case and spacing get the same answer"""
+    return ' '.join(query.split()).lower()
+
+def flight_key(*parts):
+    """Hex digest identifying a request; parts must be JSON-serializable"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+
+class MemoryFlight:
+    """A request's place in an in-process flight"""
+
+    def __init__(self, flights, key, call, leader):
+        self.flights = flights
+        self.key = key
+        self.call = call
+        self.leader = leader
+
+    def publish(self, body, status_code):
+        """Leader: the response followers will send"""
+        self.call.response = (body, status_code)
+
+    def finish(self):
+        """Leader: release the followers, with or without a response"""
+        with self.flights.lock:
+            self.flights.calls.pop(self.key, None)
+        self.call.done.set()
+
+    def wait(self, timeout):
+        """Follower: the leader's (body, status), or None if it gave none in time"""
+        self.call.done.wait(timeout)
+        return self.call.response
+
+class MemoryFlights:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def join(self, key):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                return MemoryFlight(self, key, call, leader=False)
+            call = self.calls[key] = _Call()
+        return MemoryFlight(self, key, call, leader=True)
+
+class FileFlight:
+    """A request's place in a flight shared through the data directory
+
+    The lock file holds the flight's id and the response file carries it
+    too, so followers never take a response left by an earlier flight.
+    """
+
+    def __init__(self, directory, key, flight_id, leader):
+        self.lock_path = os.path.join(directory, f'{key}.lock')
+        self.response_path = os.path.join(directory, f'{key}.json')
+        self.flight_id = flight_id
+        self.leader = leader
+
+    def publish(self, body, status_code):
+        write_json(self.response_path, {'flight': self.flight_id, 'body': body, 'status': status_code})
+
+    def finish(self):
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    def wait(self, timeout):
+        until = time.monotonic() + timeout
+        while True:
+            response = read_json(self.response_path)
+            if response and response.get('flight') == self.flight_id:
+                return response['body'], response['status']
+            if not os.path.exists(self.lock_path) or time.monotonic() >= until:
+                # The leader finished without answering, or is too slow
+                return None
+            time.sleep(POLL_SECONDS)
+
+class FileFlights:
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(DATA_DIR, 'flights')
+        os.makedirs(self.directory, exist_ok=True)
+        self.swept = 0.0  # time.monotonic() of the last sweep
+
+    def sweep(self):
+        """Remove responses older than any follower waits, at most once per FUNCTION_MAX_DURATION
+
+        Followers give up on the leader within a function timeout, so by then
+        nobody reads the response any more.
+        """
+        if time.monotonic() - self.swept < FUNCTION_MAX_DURATION:
+            return
+        self.swept = time.monotonic()
+        cutoff = time.time() - FUNCTION_MAX_DURATION
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def join(self, key):
+        lock_path = os.path.join(self.directory, f'{key}.lock')
+        while True:
+            flight_id = uuid.uuid4().hex
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    # A leader that outlived any function timeout has crashed
+                    if time.time() - os.path.getmtime(lock_path) > FUNCTION_MAX_DURATION:
+                        os.remove(lock_path)
+                        continue
+                    with open(lock_path, 'r', encoding='utf-8') as f:
+                        leader_id = f.read()
+                except FileNotFoundError:
+                    continue  # Finished meanwhile; try to lead
+                if not leader_id:
+                    time.sleep(POLL_SECONDS / 5)  # Created but not written yet
+                    continue
+                return FileFlight(self.directory, key, leader_id, leader=False)
+
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(flight_id)
+            self.sweep()
+            return FileFlight(self.directory, key, flight_id, leader=True)
+
+class _SoloFlight:
+    """Coalescing off: always the leader, nothing shared"""
+    leader = True
+
+    def publish(self, body, status_code):
+        pass
+
+    def finish(self):
+        pass
+
+_flights = None
+_flights_lock = threading.Lock()
+
+def join_flight(key, route):
+    """Join the flight for key: lead it, or follow the request already leading it"""
+    global _flights
+    if SINGLE_FLIGHT == 'off':
+        return _SoloFlight()
+    with _flights_lock:
+        if _flights is None:
+            _flights = FileFlights() if SINGLE_FLIGHT == 'file' else MemoryFlights()
+    flight = _flights.join(key)
+    if not flight.leader:
+        REGISTRY.increment('handenheit_coalesced_total', {'route': route})
+    return flight
@@ -0,0 +1,208 @@
+"""Compact result schema for search responses
+
+Output tokens dominate search latency: with 50 candidates the verbose schema
+spends most of its budget on repeated keys and a free-text reason for every
+highlight. In compact mode the model answers with short keys, enumerated
+section/field/weight codes and prose only for the top N matches. The server
+expands that back into the verbose {summary, matches[{id, score, relevance,
+highlights}]} shape before responding, so the frontend sees no difference.
+"""
+
+import json
+
+# How many of the best matches get model-written relevance/reason text
+DEFAULT_REASON_TOP_N = 10
+
+SECTION_CODES = {
+    'ex': 'experience',
+    'ed': 'education',
+    'sk': 'skills',
+    'la': 'languages',
+    'hd': 'headline',
+    'or': 'organizations',
+    'vo': 'volunteering',
+    'pr': 'projects',
+    'aw': 'awards',
+    'in': 'interests',
+    'ab': 'about',
+    'lo': 'location',
+    'sc': 'school'
+}
+
+FIELD_CODES = {
+    't': 'title',
+    'c': 'company',
+    's': 'school',
+    'd': 'degree',
+    'n': 'name',
+    'r': 'role',
+    'o': 'organization',
+    'ds': 'description'
+}
+
+WEIGHT_CODES = {1: 'low', 2: 'medium', 3: 'high'}
+
+# Score bands from the scoring rules, used to label synthesized relevance text
+SCORE_BANDS = [
+    (95, 'Perfect match'),
+    (85, 'Exceptional match'),
+    (75, 'Strong match'),
+    (60, 'Good match'),
+    (40, 'Moderate match'),
+    (20, 'Weak match'),
+    (0, 'Very weak match')
+]
+
+def compact_output_format(reason_top_n=DEFAULT_REASON_TOP_N):
+    """Returns the output-format section of the prompt for compact mode"""
+    sections = ', '.join(f'{code}={name}' for code, name in SECTION_CODES.items())
+    fields = ', '.join(f'{code}={name}' for code, name in FIELD_CODES.items())
+
+    return f"""Return a COMPACT JSON object with this EXACT structure (short keys, no extra whitespace):
+{{"s":"summary string","m":[{{"i":id,"sc":score,"r":"relevance","h":[[section,index,field,weight,"reason"]]}}]}}
+
+KEYS:
+- "s": one-sentence summary of the results
+- "m": the matches; "i" is the attendee id, "sc" is the score (REQUIRED - 0 to 100)
+- "r": relevance explanation starting with the match quality (e.g. "Perfect match: ..."). ONLY include "r" for the {reason_top_n} highest-scoring matches; omit it for all others
+- "h": highlights, each a 5-element array [section, index, field, weight, reason]
+
+HIGHLIGHT CODES:
+- section: {sections}
+- index: the 0-based array index for experience/education/organizations/volunteering/projects/awards/skills/languages/interests entries, -1 otherwise
+- field: {fields}, or "" when there is no specific field
+- weight: 1=low, 2=medium, 3=high
+- reason: why this item matches - ONLY for the {reason_top_n} highest-scoring matches, use "" for all others. Inferred matches among them MUST include the factual context
+
+Return ONLY the JSON, nothing else. THE "sc" FIELD IS MANDATORY FOR EVERY MATCH.
+
+Example format:
+{{"s":"Found 2 people with connection to Palantir (1 perfect match, 1 good match)","m":[{{"i":"123","sc":98,"r":"Perfect match: Currently employed at Palantir Technologies as Tech Lead","h":[["ex",0,"t",3,"Currently works at Palantir as Tech Lead"],["hd",-1,"",3,"Headline mentions Palantir"]]}},{{"i":"456","sc":88,"r":"Exceptional match: Previously worked at Palantir as Software Engineer for 2 years","h":[["ex",1,"c",3,"Past employment at Palantir"]]}}]}}"""
+
+def score_band(score):
+    """Return the match quality label for a score"""
+    for floor, label in SCORE_BANDS:
+        if score >= floor:
+            return label
+    return SCORE_BANDS[-1][1]
+
+def _load_field(profile, section):
+    """Return a profile section, decoding JSON text columns from Supabase rows"""
+    val = profile.get(section)
+    if isinstance(val, str) and section not in ('headline', 'location', 'school', 'about'):
+        try:
+            return json.loads(val)
+        except ValueError:
+            return val
+    return val
+
+def describe_item(profile, section, index):
+    """Short human-readable label for a highlighted profile item, or None"""
+    if not profile:
+        return None
+
+    val = _load_field(profile, section)
+    if isinstance(val, list):
+        if index is None or not 0 <= index < len(val):
+            return None
+        item = val[index]
+        if not isinstance(item, dict):
+            return str(item)
+        if section == 'experience':
+            parts = [item.get('title'), item.get('company')]
+            return ' at '.join(p for p in parts if p) or None
+        if section == 'education':
+            parts = [item.get('degree'), item.get('school')]
+            return ', '.join(p for p in parts if p) or None
+        if section == 'volunteering':
+            parts = [item.get('role'), item.get('organization')]
+            return ' at '.join(p for p in parts if p) or None
+        if section == 'organizations':
+            parts = [item.get('role'), item.get('name')]
+            return ', '.join(p for p in parts if p) or None
+        return item.get('name') or item.get('title')
+
+    if section == 'about':
+        return 'About section'
+    if val:
+        return str(val)
+    return None
+
+def _expand_highlight(entry, profile):
+    """Expand one [section, index, field, weight, reason] array"""
+    entry = list(entry) + [None] * (5 - len(entry))
+    section_code, index, field_code, weight_code, reason = entry[:5]
+
+    section = SECTION_CODES.get(section_code, section_code)
+    highlight = {'section': section}
+
+    if isinstance(index, int) and index >= 0:
+        highlight['index'] = index
+    else:
+        index = None
+
+    field = FIELD_CODES.get(field_code, field_code)
+    if field:
+        highlight['field'] = field
+
+    if not reason:
+        label = describe_item(profile, section, index)
+        reason = f'Matches search: {label}' if label else f'Relevant {section}'
+    highlight['reason'] = reason
+
+    highlight['weight'] = WEIGHT_CODES.get(weight_code, weight_code if weight_code in WEIGHT_CODES.values() else 'medium')
+    return highlight
+
+def synthesize_relevance(score, highlights, profile):
+    """Build a relevance line for matches the model was told not to explain"""
+    labels = []
+    ordered = sorted(highlights, key=lambda h: {'high': 0, 'medium': 1, 'low': 2}.get(h.get('weight'), 1))
+    for h in ordered:
+        label = describe_item(profile, h['section'], h.get('index'))
+        if label and label not in labels and h['section'] != 'about':
+            labels.append(label)
+        if len(labels) == 2:
+            break
+
+    band = score_band(score)
+    if labels:
+        return f"{band}: {'; '.join(labels)}"
+    return f'{band} for this search'
+
+def expand_compact_result(result, attendees=None):
+    """Expand a compact model result into the verbose result shape
+
+    attendees is the list of profiles that was sent to the model; it is used to
+    write relevance/reason text for matches the model did not explain. Results
+    already in the verbose shape (the model ignored the compact instructions)
+    are returned unchanged.
+    """
+    if not isinstance(result, dict) or 'matches' in result or 'm' not in result:
+        return result
+
+    profiles = {}
+    for a in attendees or []:
+        if isinstance(a, dict) and a.get('id') is not None:
+            profiles[str(a['id'])] = a
+
+    matches = []
+    for m in result.get('m') or []:
+        if not isinstance(m, dict):
+            continue
+        # Models sometimes fall back to the long key names, so accept both
+        match_id = m.get('i', m.get('id'))
+        profile = profiles.get(str(match_id))
+        score = m.get('sc', m.get('score')) or 0
+        highlights = [_expand_highlight(h, profile) for h in m.get('h') or [] if isinstance(h, (list, tuple))]
+
+        matches.append({
+            'id': match_id,
+            'score': score,
+            'relevance': m.get('r') or m.get('relevance') or synthesize_relevance(score, highlights, profile),
+            'highlights': highlights
+        })
+
+    return {
+        'summary': result.get('s', ''),
+        'matches': matches
+    }
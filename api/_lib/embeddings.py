@@ -0,0 +1,117 @@
+"""Embedding providers shared by the search and sync handlers
+
+EMBEDDING_PROVIDER picks where vectors come from:
+
+- gemini (default): text-embedding-004 over the network, 100 texts per call
+- local: a sentence-transformers model run on the CPU inside the function,
+  loaded once per process (ONNX runtime by default) and batched, so a query
+  embedding costs milliseconds instead of a round trip
+
+Vectors from different models are not comparable. After switching provider
+or LOCAL_EMBEDDING_MODEL, re-sync every attendee. The default local model
+produces 768 dimensions like text-embedding-004, so the Supabase tables keep
+working; a model with another size needs the vector(768) columns changed.
+"""
+
+import json
+import os
+import urllib.request
+
+from _lib.providers import GEMINI_BASE_URL
+from _lib.resilience import urlopen
+
+EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER', 'gemini').lower()
+EMBEDDING_PROVIDERS = ('gemini', 'local')
+
+LOCAL_EMBEDDING_MODEL = os.environ.get('LOCAL_EMBEDDING_MODEL', 'sentence-transformers/all-mpnet-base-v2')
+LOCAL_EMBEDDING_BACKEND = os.environ.get('LOCAL_EMBEDDING_BACKEND', 'onnx')  # onnx or torch
+LOCAL_BATCH_SIZE = 64
+
+# batchEmbedContents accepts at most 100 requests per call
+BATCH_LIMIT = 100
+
+def batch_embed(texts, api_key, timeout=30, deadline=None):
+    """Embed many texts with text-embedding-004, 100 per network call"""
+    url = f'{GEMINI_BASE_URL}/v1beta/models/text-embedding-004:batchEmbedContents?key={api_key}'
+
+    embeddings = []
+    for start in range(0, len(texts), BATCH_LIMIT):
+        req_data = {
+            'requests': [{
+                'model': 'models/text-embedding-004',
+                'content': {'parts': [{'text': text}]}
+            } for text in texts[start:start + BATCH_LIMIT]]
+        }
+
+        req = urllib.request.Request(
+            url,
+            data=json.dumps(req_data).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+
+        response = urlopen(req, timeout=timeout, deadline=deadline)
+        result = json.loads(response.read().decode('utf-8'))
+        embeddings.extend(e['values'] for e in result['embeddings'])
+
+    return embeddings
+
+_local_model = None
+
+def load_local_model():
+    """The local model, loaded on first use and kept for the life of the process"""
+    global _local_model
+    if _local_model is None:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError('EMBEDDING_PROVIDER=local needs sentence-transformers (pip install "sentence-transformers[onnx]")')
+
+        if LOCAL_EMBEDDING_BACKEND == 'torch':
+            _local_model = SentenceTransformer(LOCAL_EMBEDDING_MODEL, device='cpu')
+        else:
+            _local_model = SentenceTransformer(LOCAL_EMBEDDING_MODEL, device='cpu', backend=LOCAL_EMBEDDING_BACKEND)
+    return _local_model
+
+def local_embed(texts):
+    """Embed texts with the local model in batches of LOCAL_BATCH_SIZE"""
+    vectors = load_local_model().encode(
+        texts,
+        batch_size=LOCAL_BATCH_SIZE,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return vectors.tolist()
+
+def requires_google_key():
+    """True if embeddings go through the Gemini API"""
+    return EMBEDDING_PROVIDER == 'gemini'
+
+def embed_texts(texts, api_key=None, deadline=None):
+    """Embed many texts with the configured provider
+
+    deadline (a resilience.Deadline) bounds network calls; local embedding
+    is not interrupted.
+    """
+    if not texts:
+        return []
+    if EMBEDDING_PROVIDER == 'local':
+        return local_embed(texts)
+    if EMBEDDING_PROVIDER == 'gemini':
+        return batch_embed(texts, api_key, deadline=deadline)
+    raise ValueError(f'Invalid EMBEDDING_PROVIDER: {EMBEDDING_PROVIDER} (expected one of {", ".join(EMBEDDING_PROVIDERS)})')
+
+def embed_query(text, api_key=None, deadline=None):
+    """Embed a single text (a search query or one profile)"""
+    return embed_texts([text], api_key, deadline)[0]
+
+def cosine_similarity(a, b):
+    """Cosine similarity of two equal-length vectors"""
+    dot = norm_a = norm_b = 0.0
+    for x, y in zip(a, b):
+        dot += x * y
+        norm_a += x * x
+        norm_b += y * y
+    if not norm_a or not norm_b:
+        return 0.0
+    return dot / ((norm_a ** 0.5) * (norm_b ** 0.5))
@@ -0,0 +1,222 @@
+"""Entity enrichment: canonical facts about the companies and schools in profiles
+
+The search prompt asks the model to infer facts such as "Berwick Academy is
+in Maine" for every profile on every search. This module resolves each
+distinct company and school once - in batches, with a fast Gemini model -
+and caches the answer under the data directory, keyed by the same
+normalized name the facet index uses. Search handlers then attach the known
+facts to profiles as a compact org_facts field, and the facet index derives
+industry and org_location facets from them, so location and industry
+filters need no LLM call at all.
+
+Resolution runs offline (POST /api/enrich-entities, or during sync with
+ENTITY_ENRICHMENT=on); search only ever reads the cache. With the shared
+state in Supabase (see shared.py) the cache is the entities table, so what
+one function resolves every other one reads; without it, entities.json in
+the data directory.
+"""
+
+import json
+import os
+import urllib.request
+
+from _lib.facets import normalize_name
+from _lib.providers import GEMINI_BASE_URL
+from _lib.resilience import urlopen
+from _lib.shared import dataset_version, select_rows, supabase_request
+from _lib.storage import data_path, read_json, write_json
+
+ENTITY_KINDS = ('company', 'school')
+ENTITY_FIELDS = ('name', 'location', 'industry', 'type')
+ENTITY_ENRICHMENT = os.environ.get('ENTITY_ENRICHMENT', '').lower() in ('1', 'true', 'on')
+
+ENRICHMENT_MODEL_ID = 'gemini-2.0-flash'
+RESOLVE_BATCH_SIZE = 40
+
+def call_gemini_resolve(api_key, kind, names, model_id=ENRICHMENT_MODEL_ID, deadline=None):
+    """Ask a fast Gemini model for location, industry and type of each name
+
+    Returns {name: {location, industry, type}}; names the model does not
+    know come back with null fields rather than guesses.
+    """
+    listing = '\n'.join(f'- {name}' for name in names)
+
+    url = f'{GEMINI_BASE_URL}/v1beta/models/{model_id}:generateContent?key={api_key}'
+
+    req_data = {
+        'contents': [{
+            'parts': [{
+                'text': f"""For each {kind} below, give its real-world facts.
+
+{listing}
+
+For each name return:
+- "location": city, state/region, country of its main campus or headquarters (e.g. "South Berwick, Maine, US")
+- "industry": the sector in a few words (e.g. "investment banking", "higher education", "secondary education")
+- "type": what it is (e.g. "university", "liberal arts college", "high school", "company", "nonprofit", "government", "student organization")
+
+Use null for any fact you are not certain of. Do NOT guess.
+Return ONLY JSON: {{"entities": [{{"name": "...", "location": ..., "industry": ..., "type": ...}}]}}"""
+            }],
+            'role': 'user'
+        }],
+        'generationConfig': {
+            'temperature': 0,
+            'maxOutputTokens': 128 + len(names) * 64,
+            'responseMimeType': 'application/json'
+        }
+    }
+
+    req = urllib.request.Request(
+        url,
+        data=json.dumps(req_data).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}
+    )
+
+    response = urlopen(req, timeout=55, deadline=deadline)
+    result = json.loads(response.read().decode('utf-8'))
+
+    text = result['candidates'][0]['content']['parts'][0]['text'].strip()
+    if text.startswith('```json'):
+        text = text[7:]
+    if text.startswith('```'):
+        text = text[3:]
+    if text.endswith('```'):
+        text = text[:-3]
+
+    resolved = {}
+    for entity in json.loads(text.strip()).get('entities', []):
+        if isinstance(entity, dict) and entity.get('name'):
+            resolved[entity['name']] = {field: entity.get(field) for field in ('location', 'industry', 'type')}
+    return resolved
+
+def entity_names(attendee):
+    """{kind: [raw name]} for the companies and schools in one profile"""
+    experience = attendee.get('experience') or []
+    education = attendee.get('education') or []
+    if isinstance(experience, str):
+        experience = json.loads(experience or '[]')
+    if isinstance(education, str):
+        education = json.loads(education or '[]')
+
+    return {
+        'company': [e.get('company') for e in experience if isinstance(e, dict) and e.get('company')],
+        'school': [s for s in [attendee.get('school')] + [e.get('school') for e in education if isinstance(e, dict)] if s]
+    }
+
+def format_facts(entity):
+    """"type; location; industry" with unknown facts left out"""
+    return '; '.join(str(entity[field]) for field in ('type', 'location', 'industry') if entity.get(field))
+
+class EntityCache:
+    """Resolved entities by kind and normalized name
+
+    Kept in the shared entities table when version (the dataset version it
+    was read at) is given and the table exists, else in one JSON file.
+    """
+
+    def __init__(self, version=None, deadline=None):
+        self.path = data_path('entities.json')
+        self.version = version
+        # (kind, key) resolved since the cache was read, for save() to upload
+        self.added = []
+        rows = None
+        if version is not None:
+            rows = select_rows('entities', f'select=kind,key,{",".join(ENTITY_FIELDS)}&order=kind,key', deadline)
+        self.shared = rows is not None
+        if self.shared:
+            self.entities = {kind: {} for kind in ENTITY_KINDS}
+            for row in rows:
+                self.entities.setdefault(row['kind'], {})[row['key']] = {field: row[field] for field in ENTITY_FIELDS}
+        else:
+            self.entities = read_json(self.path) or {kind: {} for kind in ENTITY_KINDS}
+        self.loaded_mtime = self._mtime()
+
+    def __len__(self):
+        return sum(len(known) for known in self.entities.values())
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def is_stale(self, version=None):
+        """True if the shared dataset version moved, or another process saved the file, since it was loaded"""
+        if self.shared:
+            return version != self.version
+        return self._mtime() != self.loaded_mtime
+
+    def save(self):
+        if not self.shared:
+            write_json(self.path, self.entities)
+            self.loaded_mtime = self._mtime()
+        elif self.added:
+            supabase_request('entities', [dict(self.entities[kind][key], kind=kind, key=key) for kind, key in self.added],
+                             prefer='resolution=merge-duplicates')
+        self.added = []
+
+    def get(self, kind, name):
+        return self.entities.get(kind, {}).get(normalize_name(name))
+
+    def unresolved(self, kind, names):
+        """Distinct names (first spelling seen) with no cache entry yet"""
+        known = self.entities.get(kind, {})
+        pending = {}
+        for name in names:
+            key = normalize_name(name)
+            if key and key not in known:
+                pending.setdefault(key, name.strip())
+        return list(pending.values())
+
+    def resolve(self, kind, names, api_key, limit=None, deadline=None):
+        """Resolve uncached names in batches; returns how many were added
+
+        Names the model answered without any fact are cached too, so they
+        are not asked about again.
+        """
+        pending = self.unresolved(kind, names)
+        if limit is not None:
+            pending = pending[:limit]
+
+        known = self.entities.setdefault(kind, {})
+        for start in range(0, len(pending), RESOLVE_BATCH_SIZE):
+            batch = pending[start:start + RESOLVE_BATCH_SIZE]
+            resolved = call_gemini_resolve(api_key, kind, batch, deadline=deadline)
+            by_key = {normalize_name(name): facts for name, facts in resolved.items()}
+            for name in batch:
+                facts = by_key.get(normalize_name(name)) or {'location': None, 'industry': None, 'type': None}
+                known[normalize_name(name)] = dict(facts, name=name)
+                self.added.append((kind, normalize_name(name)))
+        return len(pending)
+
+    def profile_facts(self, attendee):
+        """Compact {raw name: "type; location; industry"} for the entities known for a profile"""
+        facts = {}
+        for kind, names in entity_names(attendee).items():
+            for name in names:
+                entity = self.get(kind, name)
+                text = format_facts(entity) if entity else ''
+                if text:
+                    facts.setdefault(name, text)
+        return facts
+
+    def attach(self, attendees):
+        """Copies of the profiles with org_facts added where anything is known"""
+        if not len(self):
+            return attendees
+        enriched = []
+        for attendee in attendees:
+            facts = self.profile_facts(attendee)
+            enriched.append(dict(attendee, org_facts=facts) if facts else attendee)
+        return enriched
+
+_cache = None
+
+def get_entities(deadline=None):
+    """Process-wide entity cache, reloaded when the shared dataset version moves or another process has saved a newer file"""
+    global _cache
+    version = dataset_version(deadline)
+    if _cache is None or _cache.is_stale(version):
+        _cache = EntityCache(version, deadline)
+    return _cache
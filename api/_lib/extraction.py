@@ -0,0 +1,128 @@
+"""Resume PDF extraction with Claude
+
+Shared by the /api/extract-pdf handler and the background job worker
+(_lib/jobs.py).
+"""
+
+import json
+import urllib.request
+from datetime import datetime
+
+from _lib.providers import ANTHROPIC_BASE_URL
+from _lib.resilience import urlopen
+
+def get_extraction_prompt():
+    """Returns the prompt for extracting profile data from a resume PDF"""
+    return """STEP 1: First, read through the ENTIRE PDF document from start to finish, including ALL pages. Pay special attention to:
+- The very END of the document (last page, bottom sections)
+- Any paragraphs of prose/essay text anywhere in the document
+- Text that may appear in different formatting or smaller font
+
+STEP 2: Extract and categorize ALL text into this JSON structure:
+
+{
+  "name": "Full name",
+  "headline": "Current role or professional summary",
+  "location": "Location if mentioned",
+  "about": {"title": "Original section title if any (e.g., 'Postscript - The Socratic Virtue of a Chief of Staff')", "text": "The full prose text"},
+  "experience": [{"title": "Job title", "company": "Company name", "duration": "Date range", "description": "Description"}],
+  "education": [{"school": "School name", "degree": "Degree", "duration": "Date range"}],
+  "projects": [{"name": "Project name", "role": "Role", "duration": "Date range", "description": "Description"}],
+  "awards": [{"name": "Award name", "date": "Date", "description": "Description"}],
+  "skills": ["skill1", "skill2"],
+  "languages": ["English (Native)", "Spanish (Conversational)"],
+  "interests": ["interest1", "interest2"],
+  "organizations": [{"name": "Org name", "role": "Role", "duration": "Date range"}],
+  "volunteering": [{"role": "Role", "organization": "Org name", "duration": "Date range"}]
+}
+
+CATEGORIZATION:
+- experience = jobs, internships, employment
+- projects = personal/academic projects (not jobs)
+- education = schools, degrees
+- skills = technical tools (Figma, Python, etc.) - NOT spoken languages
+- languages = spoken languages WITH proficiency in parentheses exactly as written
+- interests = hobbies, extracurriculars
+- organizations = clubs, memberships
+- volunteering = volunteer work
+- awards = honors, achievements
+- about = ANY AND ALL paragraph/prose text that isn't a bullet point job description. This includes text at the END of the resume. PRESERVE the original section title/header if there is one.
+
+CRITICAL RULES:
+1. Preserve ALL text exactly - no paraphrasing
+2. Keep parentheticals like "English (Native)" or "Hebrew (Proficient/B2)"
+3. The "about" field is your CATCH-ALL - if text doesn't fit elsewhere, it goes here
+4. CHECK THE LAST PAGE CAREFULLY - essays/postscripts often appear at the end
+
+Return ONLY valid JSON, no markdown code blocks."""
+
+def extract_from_pdf(api_key, pdf_base64, deadline=None):
+    """Call Claude API to extract profile data from PDF"""
+    prompt = get_extraction_prompt()
+
+    req_data = {
+        'model': 'claude-sonnet-4-20250514',
+        'max_tokens': 8000,
+        'messages': [{
+            'role': 'user',
+            'content': [
+                {
+                    'type': 'document',
+                    'source': {
+                        'type': 'base64',
+                        'media_type': 'application/pdf',
+                        'data': pdf_base64
+                    }
+                },
+                {
+                    'type': 'text',
+                    'text': prompt
+                }
+            ]
+        }]
+    }
+
+    req = urllib.request.Request(
+        f'{ANTHROPIC_BASE_URL}/v1/messages',
+        data=json.dumps(req_data).encode('utf-8'),
+        headers={
+            'Content-Type': 'application/json',
+            'x-api-key': api_key,
+            'anthropic-version': '2023-06-01'
+        }
+    )
+
+    response = urlopen(req, timeout=60, deadline=deadline)
+    result = json.loads(response.read().decode('utf-8'))
+
+    # Extract the text content from Claude's response
+    text = result['content'][0]['text']
+
+    # Remove markdown code blocks if present
+    text = text.strip()
+    if text.startswith('```json'):
+        text = text[7:]
+    if text.startswith('```'):
+        text = text[3:]
+    if text.endswith('```'):
+        text = text[:-3]
+    text = text.strip()
+
+    # Parse the JSON
+    profile_data = json.loads(text)
+
+    return profile_data
+
+def extract_profile(api_key, pdf_base64, school='', deadline=None):
+    """Extract a profile from a PDF and stamp it like the handler always has"""
+    result = extract_from_pdf(api_key, pdf_base64, deadline)
+
+    # Add school if provided
+    if school and result:
+        result['school'] = school
+
+    # Add timestamp
+    if result:
+        result['timestamp'] = datetime.utcnow().isoformat() + 'Z'
+
+    return result
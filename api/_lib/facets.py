@@ -0,0 +1,336 @@
+"""Facet indexes: which attendees worked at a company, studied at a school or live somewhere
+
+Built during sync from experience[].company, education[].school, school and
+location. Names are normalized (case, accents, punctuation, "The ...",
+corporate suffixes) and merged through ALIASES, so "UPenn", "Penn" and
+"University of Pennsylvania" are one facet value. Comma-separated names also
+count toward each part, so "The Wharton School, University of Pennsylvania"
+is found under both the Wharton School and the University of Pennsylvania,
+and "Philadelphia, PA" under Philadelphia and Pennsylvania.
+
+Each facet value maps to a set of attendee ids, so counts and id lists are
+dictionary lookups. filter_ids() turns a {facet: value(s)} filter into the
+set of matching ids, used to shrink the candidate set before any embedding,
+vector or LLM call. Once companies and schools have been resolved by the
+entity cache, industry and org_location facets answer questions such as
+"worked in investment banking" or "went to school in Maine" the same way.
+
+Sync keeps the index in the data directory, which only its own process
+sees. current_facets() is what searches and /api/facets read: with the
+shared state in Supabase (see shared.py) it is rebuilt from the attendees
+table's names whenever the dataset version moves.
+"""
+
+import json
+import os
+import re
+import threading
+import unicodedata
+
+from _lib.shared import dataset_version, rpc_rows
+from _lib.storage import data_path, read_json, write_json
+
+# Derived from the entity cache (_lib/entities.py): the industries and
+# locations of the companies and schools an attendee is linked to
+DERIVED_FACETS = ('industry', 'org_location')
+FACETS = ('company', 'school', 'location') + DERIVED_FACETS
+
+# Normalized name -> canonical normalized name
+ALIASES = {
+    'upenn': 'university of pennsylvania',
+    'penn': 'university of pennsylvania',
+    'u penn': 'university of pennsylvania',
+    'wharton': 'wharton school',
+    'wharton school of the university of pennsylvania': 'wharton school',
+    'mit': 'massachusetts institute of technology',
+    'harvard': 'harvard university',
+    'harvard college': 'harvard university',
+    'yale': 'yale university',
+    'yale college': 'yale university',
+    'princeton': 'princeton university',
+    'stanford': 'stanford university',
+    'columbia': 'columbia university',
+    'brown': 'brown university',
+    'cornell': 'cornell university',
+    'dartmouth': 'dartmouth college',
+    'uchicago': 'university of chicago',
+    'ohio state': 'ohio state university',
+    'nyu': 'new york university',
+    'ucla': 'university of california los angeles',
+    'uc berkeley': 'university of california berkeley',
+    'berkeley': 'university of california berkeley',
+    'goldman sachs group': 'goldman sachs',
+    'bain': 'bain company',
+    'mckinsey': 'mckinsey company',
+    'bcg': 'boston consulting group',
+    'nyc': 'new york',
+    'new york city': 'new york',
+    'sf': 'san francisco',
+    'usa': 'united states',
+    'us': 'united states',
+    'uk': 'united kingdom'
+}
+
+US_STATES = {
+    'al': 'alabama', 'ak': 'alaska', 'az': 'arizona', 'ar': 'arkansas', 'ca': 'california',
+    'co': 'colorado', 'ct': 'connecticut', 'de': 'delaware', 'fl': 'florida', 'ga': 'georgia',
+    'hi': 'hawaii', 'id': 'idaho', 'il': 'illinois', 'in': 'indiana', 'ia': 'iowa',
+    'ks': 'kansas', 'ky': 'kentucky', 'la': 'louisiana', 'me': 'maine', 'md': 'maryland',
+    'ma': 'massachusetts', 'mi': 'michigan', 'mn': 'minnesota', 'ms': 'mississippi', 'mo': 'missouri',
+    'mt': 'montana', 'ne': 'nebraska', 'nv': 'nevada', 'nh': 'new hampshire', 'nj': 'new jersey',
+    'nm': 'new mexico', 'ny': 'new york', 'nc': 'north carolina', 'nd': 'north dakota', 'oh': 'ohio',
+    'ok': 'oklahoma', 'or': 'oregon', 'pa': 'pennsylvania', 'ri': 'rhode island', 'sc': 'south carolina',
+    'sd': 'south dakota', 'tn': 'tennessee', 'tx': 'texas', 'ut': 'utah', 'vt': 'vermont',
+    'va': 'virginia', 'wa': 'washington', 'wv': 'west virginia', 'wi': 'wisconsin', 'wy': 'wyoming'
+}
+
+CORPORATE_SUFFIXES = {'inc', 'llc', 'ltd', 'llp', 'corp', 'corporation', 'co', 'plc', 'gmbh'}
+
+# Location parts that say nothing about where someone is
+LOCATION_NOISE = {'area', 'greater', 'metropolitan', 'metro', 'region', 'remote'}
+
+def normalize_name(name):
+    """Lowercase ASCII words with punctuation, "the" and company suffixes removed"""
+    text = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode('ascii').lower()
+    text = re.sub(r'\([^)]*\)', ' ', text)
+    words = re.sub(r'[^a-z0-9]+', ' ', text.replace('&', ' ')).split()
+    if words and words[0] == 'the':
+        words = words[1:]
+    while len(words) > 1 and words[-1] in CORPORATE_SUFFIXES:
+        words.pop()
+    key = ' '.join(words)
+    return ALIASES.get(key, key)
+
+def _location_key(part):
+    words = [w for w in normalize_name(part).split() if w not in LOCATION_NOISE]
+    key = ' '.join(words)
+    return ALIASES.get(key, US_STATES.get(key, key))
+
+def facet_keys(facet, value):
+    """[(key, label)] a raw name contributes: the whole name and each comma part"""
+    if not value or not isinstance(value, str):
+        return []
+    normalize = _location_key if facet == 'location' else normalize_name
+    parts = [value] + (value.split(',') if ',' in value else [])
+    pairs = {}
+    for part in parts:
+        key = normalize(part)
+        if key:
+            pairs.setdefault(key, part.strip())
+    return list(pairs.items())
+
+def _json_list(text):
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return []
+    return value if isinstance(value, list) else []
+
+def attendee_facets(attendee):
+    """{facet: [(key, label)]} for one attendee profile or attendees table row"""
+    experience = attendee.get('experience') or []
+    education = attendee.get('education') or []
+    # Rows read back from the attendees table carry these as JSON strings
+    if isinstance(experience, str):
+        experience = _json_list(experience)
+    if isinstance(education, str):
+        education = _json_list(education)
+
+    raw = {
+        'company': [e.get('company') for e in experience if isinstance(e, dict)],
+        'school': [attendee.get('school')] + [e.get('school') for e in education if isinstance(e, dict)],
+        'location': [attendee.get('location')]
+    }
+
+    facets = {}
+    for facet, names in raw.items():
+        pairs = {}
+        for name in names:
+            for key, label in facet_keys(facet, name):
+                pairs.setdefault(key, label)
+        facets[facet] = list(pairs.items())
+    return facets
+
+class FacetIndex:
+    """Facet value -> attendee id sets, updated incrementally as profiles sync"""
+
+    def __init__(self):
+        # index[facet][key] -> set of attendee ids
+        self.index = {facet: {} for facet in FACETS}
+        # labels[facet][key] -> a display name seen for the key
+        self.labels = {facet: {} for facet in FACETS}
+        # keys[id][facet] -> keys the attendee contributes, for removal on update
+        self.keys = {}
+
+    @classmethod
+    def from_attendees(cls, attendees, entities=None):
+        index = cls()
+        for attendee in attendees:
+            index.add(attendee, entities)
+        return index
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _discard(self, attendee_id, facet, keys):
+        for key in keys:
+            ids = self.index[facet].get(key)
+            if ids is None:
+                continue
+            ids.discard(attendee_id)
+            if not ids:
+                del self.index[facet][key]
+                self.labels[facet].pop(key, None)
+
+    def _insert(self, attendee_id, facet, pairs):
+        for key, label in pairs:
+            self.index[facet].setdefault(key, set()).add(attendee_id)
+            self.labels[facet].setdefault(key, label)
+        self.keys[attendee_id][facet] = [key for key, _ in pairs]
+
+    def remove(self, attendee_id):
+        attendee_id = str(attendee_id)
+        for facet, keys in self.keys.pop(attendee_id, {}).items():
+            self._discard(attendee_id, facet, keys)
+
+    def add(self, attendee, entities=None):
+        """Index an attendee, replacing whatever was indexed for the same id
+
+        entities is an EntityCache; when given, the derived facets are
+        filled from the attendee's resolved companies and schools.
+        """
+        attendee_id = str(attendee.get('id'))
+        self.remove(attendee_id)
+
+        self.keys[attendee_id] = {}
+        for facet, pairs in attendee_facets(attendee).items():
+            self._insert(attendee_id, facet, pairs)
+        if entities is not None:
+            self._add_derived(attendee_id, entities)
+
+    def _add_derived(self, attendee_id, entities):
+        industries = {}
+        locations = {}
+        for kind in ('company', 'school'):
+            for key in self.keys[attendee_id].get(kind, []):
+                entity = entities.entities.get(kind, {}).get(key)
+                if not entity:
+                    continue
+                if entity.get('industry'):
+                    industries.setdefault(normalize_name(entity['industry']), entity['industry'])
+                for location_key, label in facet_keys('location', entity.get('location')):
+                    locations.setdefault(location_key, label)
+
+        self._insert(attendee_id, 'industry', list(industries.items()))
+        self._insert(attendee_id, 'org_location', list(locations.items()))
+
+    def apply_entities(self, entities):
+        """Recompute the derived facets of every attendee from an EntityCache"""
+        for attendee_id, keys in self.keys.items():
+            for facet in DERIVED_FACETS:
+                self._discard(attendee_id, facet, keys.pop(facet, []))
+            self._add_derived(attendee_id, entities)
+
+    def ids(self, facet, value):
+        """Ids of attendees with the given facet value (any spelling or alias)"""
+        if facet not in self.index:
+            raise ValueError(f'Invalid facet: {facet}')
+        key = _location_key(value) if facet in ('location', 'org_location') else normalize_name(value)
+        return self.index[facet].get(key, set())
+
+    def count(self, facet, value):
+        return len(self.ids(facet, value))
+
+    def counts(self, facet, limit=None):
+        """[{value, key, count}] for a facet, most common first"""
+        if facet not in self.index:
+            raise ValueError(f'Invalid facet: {facet}')
+        rows = sorted(self.index[facet].items(), key=lambda item: (-len(item[1]), item[0]))
+        if limit:
+            rows = rows[:limit]
+        return [{'value': self.labels[facet].get(key, key), 'key': key, 'count': len(ids)} for key, ids in rows]
+
+    def filter_ids(self, filters):
+        """Ids matching every facet in filters (a value or a list of values per facet)
+
+        Returns None if filters is empty, meaning no restriction.
+        """
+        allowed = None
+        for facet, values in (filters or {}).items():
+            if isinstance(values, str):
+                values = [values]
+            matching = set()
+            for value in values:
+                matching |= self.ids(facet, value)
+            allowed = matching if allowed is None else allowed & matching
+        return allowed
+
+    def to_json(self):
+        return {
+            'index': {facet: {key: sorted(ids) for key, ids in keys.items()} for facet, keys in self.index.items()},
+            'labels': self.labels,
+            'keys': self.keys
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        index = cls()
+        for facet in FACETS:
+            index.index[facet] = {key: set(ids) for key, ids in data['index'].get(facet, {}).items()}
+            index.labels[facet] = data['labels'].get(facet, {})
+        index.keys = data['keys']
+        return index
+
+class FacetStore:
+    """The synced attendees' facet index, persisted under the data directory"""
+
+    def __init__(self):
+        self.path = data_path('facets.json')
+        data = read_json(self.path)
+        self.index = FacetIndex.from_json(data) if data else FacetIndex()
+        self.loaded_mtime = self._mtime()
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def is_stale(self):
+        """True if another process saved the index since it was loaded"""
+        return self._mtime() != self.loaded_mtime
+
+    def save(self):
+        write_json(self.path, self.index.to_json())
+        self.loaded_mtime = self._mtime()
+
+_store = None
+
+def get_facets():
+    """Process-wide facet store, reloaded when a sync elsewhere has saved a newer one"""
+    global _store
+    if _store is None or _store.is_stale():
+        _store = FacetStore()
+    return _store
+
+_shared = None  # (dataset version, FacetIndex)
+_shared_lock = threading.Lock()
+
+def current_facets(entities=None, deadline=None):
+    """The facet index of everything synced, the same in every function
+
+    Built from attendee_facet_sources and kept until the shared dataset
+    version moves; without the shared state, the index sync keeps in the
+    data directory. entities (an EntityCache) fills the derived facets.
+    """
+    global _shared
+    version = dataset_version(deadline)
+    if version is None:
+        return get_facets().index
+    with _shared_lock:
+        if _shared is None or _shared[0] != version:
+            rows = rpc_rows('attendee_facet_sources', deadline=deadline)
+            if rows is None:
+                return get_facets().index
+            _shared = (version, FacetIndex.from_attendees(rows, entities))
+        return _shared[1]
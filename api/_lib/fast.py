@@ -0,0 +1,177 @@
+"""Fast search tier: ranking and highlights without an LLM call
+
+Candidates from vector retrieval are re-ranked by fusing their similarity
+with a BM25 score over the same profiles, and highlights come from the
+query's similarity to each profile section (each experience, education,
+project... entry) - taken from chunk retrieval when available, otherwise
+embedded on the fly. The result has the same
+{summary, matches[{id, score, relevance, highlights}]} shape the LLM tiers
+return, in the time of an embedding call instead of a generation.
+"""
+
+from _lib.compact import describe_item, synthesize_relevance
+from _lib.embeddings import embed_texts, cosine_similarity
+from _lib.lexical import LexicalIndex, tokenize
+from _lib.profiles import profile_sections
+
+FAST_RESULT_COUNT = 15
+
+# Fusion weights; lexical scores are normalized to the best BM25 hit
+VECTOR_WEIGHT = 0.7
+LEXICAL_WEIGHT = 0.3
+
+# Fused relevance mapped linearly onto the 0-100 score scale
+SCORE_FLOOR = 0.25
+SCORE_CEIL = 0.75
+
+# Best possible score when ranking by keywords alone
+LEXICAL_MAX_SCORE = 75
+
+# A section is highlighted if it is close to the query in absolute terms and
+# close to the profile's best section
+HIGHLIGHT_MIN_SIMILARITY = 0.45
+HIGHLIGHT_MARGIN = 0.05
+MAX_HIGHLIGHTS = 3
+
+FIELD_BY_SECTION = {
+    'experience': 'title',
+    'education': 'school',
+    'projects': 'name',
+    'organizations': 'name',
+    'volunteering': 'role',
+    'awards': 'name'
+}
+
+def score_sections(profiles, query_embedding, api_key, deadline=None):
+    """Embed every section of the given profiles and compare it to the query
+
+    Used when retrieval did not return chunk similarities. Sections are
+    embedded in batched calls. Returns {str(id): [(section, index, similarity)]}.
+    """
+    addresses = []
+    texts = []
+    for p in profiles:
+        for section, index, text in profile_sections(p):
+            addresses.append((str(p.get('id')), section, index))
+            texts.append(text)
+
+    by_id = {}
+    if texts:
+        for (attendee_id, section, index), embedding in zip(addresses, embed_texts(texts, api_key, deadline)):
+            by_id.setdefault(attendee_id, []).append((section, index, cosine_similarity(query_embedding, embedding)))
+    return by_id
+
+def chunk_scores(rows):
+    """Section similarities carried on chunk-retrieval rows
+
+    Returns {str(id): [(section, index, similarity)]} in the same shape as
+    score_sections(), without any extra embedding call.
+    """
+    by_id = {}
+    for row in rows:
+        by_id[str(row.get('id'))] = [(c.get('section'), c.get('index'), c.get('similarity') or 0.0) for c in row.get('chunks') or []]
+    return by_id
+
+def _highlight_field(profile, section, index, query_tokens):
+    """Pick the field to highlight; experience prefers the company if the query names it"""
+    experience = profile.get('experience') or []
+    # The index comes from stored chunks and can outlive an edited profile
+    if section == 'experience' and index is not None and 0 <= index < len(experience):
+        company = experience[index].get('company') or ''
+        if query_tokens & set(tokenize(company)):
+            return 'company'
+    return FIELD_BY_SECTION.get(section)
+
+def section_highlights(profile, sections, query_tokens):
+    """Highlights for the sections closest to the query, best first"""
+    scored = sorted(
+        ((similarity, section, index) for section, index, similarity in sections),
+        key=lambda s: s[0],
+        reverse=True
+    )
+    if not scored:
+        return [], 0.0
+
+    best = scored[0][0]
+    highlights = []
+    for similarity, section, index in scored[:MAX_HIGHLIGHTS]:
+        if similarity < HIGHLIGHT_MIN_SIMILARITY or similarity < best - HIGHLIGHT_MARGIN:
+            break
+
+        highlight = {'section': section}
+        if index is not None:
+            highlight['index'] = index
+        field = _highlight_field(profile, section, index, query_tokens)
+        if field:
+            highlight['field'] = field
+
+        label = describe_item(profile, section, index)
+        highlight['reason'] = f'Closest match to search: {label}' if label else f'Relevant {section}'
+        highlight['weight'] = 'high' if not highlights else 'medium'
+        highlights.append(highlight)
+
+    return highlights, best
+
+def rank_fast(search_query, candidates, section_similarities, limit=FAST_RESULT_COUNT):
+    """Rank (profile, similarity) candidates and build the search result
+
+    section_similarities is {str(id): [(section, index, similarity)]} for the
+    candidate profiles, from chunk_scores() or score_sections().
+    """
+    profiles = [p for p, _ in candidates]
+    lexical = dict((str(i), s) for i, s in LexicalIndex(profiles).search(search_query))
+    best_lexical = max(lexical.values()) if lexical else 0.0
+    query_tokens = set(tokenize(search_query))
+
+    ranked = []
+    for profile, similarity in candidates:
+        key = str(profile.get('id'))
+        highlights, best_section = section_highlights(profile, section_similarities.get(key, []), query_tokens)
+
+        # Whole-profile embeddings are diluted by long profiles; a strongly
+        # matching section is better evidence
+        vector = max(similarity or 0.0, best_section)
+        lexical_norm = lexical.get(key, 0.0) / best_lexical if best_lexical else 0.0
+        fused = VECTOR_WEIGHT * vector + LEXICAL_WEIGHT * lexical_norm
+
+        score = round(100 * min(1.0, max(0.0, (fused - SCORE_FLOOR) / (SCORE_CEIL - SCORE_FLOOR))))
+        ranked.append({
+            'id': profile.get('id'),
+            'score': score,
+            'relevance': synthesize_relevance(score, highlights, profile),
+            'highlights': highlights
+        })
+
+    ranked.sort(key=lambda m: m['score'], reverse=True)
+    matches = ranked[:limit]
+
+    return {
+        'summary': f'Found {len(matches)} matches ranked by similarity (fast search, no AI review)',
+        'matches': matches
+    }
+
+def rank_lexical(search_query, profiles, limit=FAST_RESULT_COUNT):
+    """Rank profiles by BM25 alone, for when there is neither time nor an embedding for more
+
+    Scores are relative to the best keyword match and capped at
+    LEXICAL_MAX_SCORE: keyword overlap alone is not evidence of a perfect match.
+    """
+    by_id = {str(p.get('id')): p for p in profiles}
+    scored = LexicalIndex(profiles).search(search_query, limit)
+    best = scored[0][1] if scored else 0.0
+
+    matches = []
+    for attendee_id, bm25 in scored:
+        profile = by_id[str(attendee_id)]
+        score = round(LEXICAL_MAX_SCORE * bm25 / best)
+        matches.append({
+            'id': profile.get('id'),
+            'score': score,
+            'relevance': synthesize_relevance(score, [], profile),
+            'highlights': []
+        })
+
+    return {
+        'summary': f'Found {len(matches)} matches ranked by keyword overlap (no AI review)',
+        'matches': matches
+    }
@@ -0,0 +1,497 @@
+"""Background jobs for long-running sync and PDF extraction
+
+A job is a list of items (attendees to sync, PDFs to extract) processed by
+a worker in small batches. Each item's outcome is persisted as soon as its
+batch finishes, so the item statuses are the checkpoint: a worker that is
+stopped - by a request timeout, a deploy, a closed tab - leaves the job
+resumable from the first pending item. Failed items are retried with
+exponential backoff up to MAX_ATTEMPTS before they are marked failed.
+
+Workers take a lease on a job before touching it, so two workers (a
+status poll and the proxy's background thread, say) never process the
+same job at once. run_job() works for a bounded time slice and returns;
+on Vercel each status poll drives one slice, while proxy-server.py runs a
+background thread that drains the queue continuously.
+
+Storage is pluggable through JOB_STORE: sqlite (default, one database file
+in the data directory) or file (one JSON directory per job). Both are
+local to the machine, which suits development, proxy-server.py and
+local-server.py. On Vercel a job submitted to one instance would be polled
+on another and lost when the first is recycled, so there every request is
+refused (501) rather than accepted and dropped.
+
+A worker slice stops within its budget: the budget is a resilience
+Deadline handed to every provider call the items make, and a status poll's
+slice also fits in what is left of the function's maxDuration.
+"""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+from _lib.resilience import Deadline
+from _lib.storage import DATA_DIR, data_path, read_json, write_json
+
+JOB_STORE = os.environ.get('JOB_STORE', 'sqlite').lower()
+JOB_SLICE_SECONDS = float(os.environ.get('JOB_SLICE_SECONDS', 40))
+
+JOB_KINDS = ('sync', 'extract')
+BATCH_SIZES = {'sync': 10, 'extract': 1}
+
+# Least time worth starting another batch with
+MIN_BATCH_SECONDS = 5
+
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 2
+LEASE_SECONDS = 120
+
+# Job statuses: queued (work left), done (every item done or failed), cancelled
+# Item statuses: pending, done, failed
+
+def _now():
+    return time.time()
+
+def _summary(job, items, include_results=False):
+    """Public view of a job: progress counts and per-item errors"""
+    counts = {'pending': 0, 'done': 0, 'failed': 0}
+    errors = []
+    results = []
+    for item in items:
+        counts[item['status']] += 1
+        if item.get('error'):
+            errors.append({'index': item['index'], 'status': item['status'], 'attempts': item['attempts'], 'error': item['error']})
+        if include_results and item['status'] == 'done':
+            results.append({'index': item['index'], 'result': item.get('result')})
+
+    summary = {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'total': len(items),
+        'done': counts['done'],
+        'failed': counts['failed'],
+        'pending': counts['pending'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at'],
+        'errors': errors
+    }
+    if include_results:
+        summary['results'] = results
+    return summary
+
+class SQLiteJobStore:
+    """Jobs and items in one SQLite database under the data directory"""
+
+    def __init__(self, path=None):
+        self.path = path or data_path('jobs.sqlite3')
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.executescript('''
+                create table if not exists jobs (
+                    id text primary key,
+                    kind text not null,
+                    status text not null,
+                    options text not null,
+                    created_at real not null,
+                    updated_at real not null,
+                    lease_owner text,
+                    lease_until real
+                );
+                create table if not exists job_items (
+                    job_id text not null references jobs(id),
+                    idx integer not null,
+                    payload text not null,
+                    status text not null default 'pending',
+                    attempts integer not null default 0,
+                    retry_at real not null default 0,
+                    error text,
+                    result text,
+                    primary key (job_id, idx)
+                );
+            ''')
+        finally:
+            db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return _Transaction(db)
+
+    def create(self, kind, payloads, options=None):
+        job_id = uuid.uuid4().hex
+        now = _now()
+        with self._connect() as db:
+            db.execute(
+                'insert into jobs (id, kind, status, options, created_at, updated_at) values (?, ?, ?, ?, ?, ?)',
+                (job_id, kind, 'queued', json.dumps(options or {}), now, now)
+            )
+            db.executemany(
+                'insert into job_items (job_id, idx, payload) values (?, ?, ?)',
+                [(job_id, i, json.dumps(p)) for i, p in enumerate(payloads)]
+            )
+        return job_id
+
+    def append(self, job_id, payloads):
+        with self._connect() as db:
+            start = db.execute('select coalesce(max(idx) + 1, 0) from job_items where job_id = ?', (job_id,)).fetchone()[0]
+            db.executemany(
+                'insert into job_items (job_id, idx, payload) values (?, ?, ?)',
+                [(job_id, start + i, json.dumps(p)) for i, p in enumerate(payloads)]
+            )
+            db.execute("update jobs set status = 'queued', updated_at = ? where id = ? and status = 'done'", (_now(), job_id))
+
+    def job(self, job_id):
+        with self._connect() as db:
+            row = db.execute('select * from jobs where id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        return job
+
+    def summary(self, job_id, include_results=False):
+        job = self.job(job_id)
+        if job is None:
+            return None
+        with self._connect() as db:
+            rows = db.execute(
+                'select idx, status, attempts, error, result from job_items where job_id = ? order by idx', (job_id,)
+            ).fetchall()
+        items = [{
+            'index': r['idx'],
+            'status': r['status'],
+            'attempts': r['attempts'],
+            'error': r['error'],
+            'result': json.loads(r['result']) if r['result'] else None
+        } for r in rows]
+        return _summary(job, items, include_results)
+
+    def claim(self, owner, job_id=None):
+        """Lease a queued job (the given one, or the oldest); returns its id or None"""
+        now = _now()
+        with self._connect() as db:
+            if job_id is None:
+                row = db.execute(
+                    "select id from jobs where status = 'queued' and (lease_until is null or lease_until < ?) order by created_at limit 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id = row['id']
+            claimed = db.execute(
+                "update jobs set lease_owner = ?, lease_until = ? where id = ? and status = 'queued' and (lease_until is null or lease_until < ? or lease_owner = ?)",
+                (owner, now + LEASE_SECONDS, job_id, now, owner)
+            ).rowcount
+        return job_id if claimed else None
+
+    def release(self, job_id, owner):
+        with self._connect() as db:
+            db.execute('update jobs set lease_owner = null, lease_until = null where id = ? and lease_owner = ?', (job_id, owner))
+
+    def pending(self, job_id, limit):
+        """[(index, payload, attempts)] of items due for processing, in order"""
+        with self._connect() as db:
+            rows = db.execute(
+                "select idx, payload, attempts from job_items where job_id = ? and status = 'pending' and retry_at <= ? order by idx limit ?",
+                (job_id, _now(), limit)
+            ).fetchall()
+        return [(r['idx'], json.loads(r['payload']), r['attempts']) for r in rows]
+
+    def next_retry(self, job_id):
+        """Seconds until the earliest pending item is due, or None if none is pending"""
+        with self._connect() as db:
+            row = db.execute("select min(retry_at) from job_items where job_id = ? and status = 'pending'", (job_id,)).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - _now())
+
+    def record(self, job_id, outcomes):
+        """Persist [(index, status, attempts, retry_at, error, result)] - the checkpoint"""
+        with self._connect() as db:
+            db.executemany(
+                'update job_items set status = ?, attempts = ?, retry_at = ?, error = ?, result = ? where job_id = ? and idx = ?',
+                [(status, attempts, retry_at, error, json.dumps(result) if result is not None else None, job_id, index)
+                 for index, status, attempts, retry_at, error, result in outcomes]
+            )
+            db.execute('update jobs set updated_at = ? where id = ?', (_now(), job_id))
+
+    def set_status(self, job_id, status):
+        with self._connect() as db:
+            db.execute('update jobs set status = ?, updated_at = ? where id = ?', (status, _now(), job_id))
+
+class _Transaction:
+    """sqlite3 connection as a context manager that commits (or rolls back) and closes"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('begin immediate')
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute('rollback' if exc_type else 'commit')
+        self.db.close()
+
+class FileJobStore:
+    """One directory per job: job.json (state) and payloads.json, under the data directory
+
+    A lock file created with O_EXCL serializes updates to a job across
+    processes.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(DATA_DIR, 'jobs')
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, job_id, name):
+        return os.path.join(self.directory, job_id, name)
+
+    def _lock(self, job_id):
+        return _FileLock(self._path(job_id, 'lock'))
+
+    def create(self, kind, payloads, options=None):
+        job_id = uuid.uuid4().hex
+        now = _now()
+        os.makedirs(os.path.join(self.directory, job_id))
+        write_json(self._path(job_id, 'payloads.json'), payloads)
+        write_json(self._path(job_id, 'job.json'), {
+            'id': job_id, 'kind': kind, 'status': 'queued', 'options': options or {},
+            'created_at': now, 'updated_at': now, 'lease_owner': None, 'lease_until': None,
+            'items': [{'index': i, 'status': 'pending', 'attempts': 0, 'retry_at': 0, 'error': None, 'result': None} for i in range(len(payloads))]
+        })
+        return job_id
+
+    def append(self, job_id, payloads):
+        with self._lock(job_id):
+            job = read_json(self._path(job_id, 'job.json'))
+            existing = read_json(self._path(job_id, 'payloads.json'), [])
+            start = len(existing)
+            write_json(self._path(job_id, 'payloads.json'), existing + list(payloads))
+            job['items'].extend({'index': start + i, 'status': 'pending', 'attempts': 0, 'retry_at': 0, 'error': None, 'result': None} for i in range(len(payloads)))
+            if job['status'] == 'done':
+                job['status'] = 'queued'
+            job['updated_at'] = _now()
+            write_json(self._path(job_id, 'job.json'), job)
+
+    def job(self, job_id):
+        return read_json(self._path(job_id, 'job.json'))
+
+    def summary(self, job_id, include_results=False):
+        job = self.job(job_id)
+        return None if job is None else _summary(job, job['items'], include_results)
+
+    def claim(self, owner, job_id=None):
+        now = _now()
+        if job_id is None:
+            queued = []
+            for name in os.listdir(self.directory):
+                job = self.job(name)
+                if job and job['status'] == 'queued' and (job['lease_until'] is None or job['lease_until'] < now):
+                    queued.append((job['created_at'], name))
+            if not queued:
+                return None
+            job_id = min(queued)[1]
+
+        with self._lock(job_id):
+            job = self.job(job_id)
+            if job is None or job['status'] != 'queued':
+                return None
+            if job['lease_until'] is not None and job['lease_until'] >= now and job['lease_owner'] != owner:
+                return None
+            job['lease_owner'] = owner
+            job['lease_until'] = now + LEASE_SECONDS
+            write_json(self._path(job_id, 'job.json'), job)
+        return job_id
+
+    def release(self, job_id, owner):
+        with self._lock(job_id):
+            job = self.job(job_id)
+            if job['lease_owner'] == owner:
+                job['lease_owner'] = job['lease_until'] = None
+                write_json(self._path(job_id, 'job.json'), job)
+
+    def pending(self, job_id, limit):
+        job = self.job(job_id)
+        payloads = read_json(self._path(job_id, 'payloads.json'), [])
+        now = _now()
+        due = [i for i in job['items'] if i['status'] == 'pending' and i['retry_at'] <= now][:limit]
+        return [(i['index'], payloads[i['index']], i['attempts']) for i in due]
+
+    def next_retry(self, job_id):
+        retry_at = [i['retry_at'] for i in self.job(job_id)['items'] if i['status'] == 'pending']
+        return max(0.0, min(retry_at) - _now()) if retry_at else None
+
+    def record(self, job_id, outcomes):
+        with self._lock(job_id):
+            job = self.job(job_id)
+            for index, status, attempts, retry_at, error, result in outcomes:
+                job['items'][index].update(status=status, attempts=attempts, retry_at=retry_at, error=error, result=result)
+            job['updated_at'] = _now()
+            write_json(self._path(job_id, 'job.json'), job)
+
+    def set_status(self, job_id, status):
+        with self._lock(job_id):
+            job = self.job(job_id)
+            job['status'] = status
+            job['updated_at'] = _now()
+            write_json(self._path(job_id, 'job.json'), job)
+
+class _FileLock:
+    """Exclusive lock file; a lock older than LEASE_SECONDS is considered abandoned"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                try:
+                    if _now() - os.path.getmtime(self.path) > LEASE_SECONDS:
+                        os.remove(self.path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.05)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+JOB_STORES = {
+    'sqlite': SQLiteJobStore,
+    'file': FileJobStore
+}
+
+_store = None
+
+def get_job_store():
+    """Process-wide job store selected by JOB_STORE"""
+    global _store
+    if _store is None:
+        if JOB_STORE not in JOB_STORES:
+            raise ValueError(f'Invalid JOB_STORE: {JOB_STORE} (expected one of {", ".join(JOB_STORES)})')
+        _store = JOB_STORES[JOB_STORE]()
+    return _store
+
+def process_sync(payloads, options, deadline):
+    """Sync a batch of attendees; returns [(ok, result or error)] per item"""
+    from _lib.sync import sync_batch
+
+    results = sync_batch(payloads, os.environ.get('GOOGLE_API_KEY', ''), options.get('force', False), deadline)
+    errors = {str(e['id']): e['error'] for e in results['errors'] if e.get('id') is not None}
+    errors.update((str(i), 'Out of time') for i in results['retry'])
+    return [(False, errors[str(p.get('id'))]) if str(p.get('id')) in errors else (True, {'id': p.get('id')}) for p in payloads]
+
+def process_extract(payloads, options, deadline):
+    """Extract one profile per PDF item ({pdf, school})"""
+    from _lib.extraction import extract_profile
+
+    api_key = os.environ.get('ANTHROPIC_API_KEY', '')
+    if not api_key:
+        raise RuntimeError('Anthropic API key not configured on server')
+    return [(True, extract_profile(api_key, p['pdf'], p.get('school', options.get('school', '')), deadline)) for p in payloads]
+
+PROCESSORS = {
+    'sync': process_sync,
+    'extract': process_extract
+}
+
+def run_job(store, job_id=None, budget_seconds=JOB_SLICE_SECONDS, owner=None):
+    """Work on a job (or the oldest queued one) for up to budget_seconds
+
+    Returns the id of the job worked on, or None if there was nothing to
+    claim. The job stays queued if work remains when the budget runs out.
+    """
+    owner = owner or uuid.uuid4().hex
+    job_id = store.claim(owner, job_id)
+    if job_id is None:
+        return None
+
+    job = store.job(job_id)
+    process = PROCESSORS[job['kind']]
+    deadline = Deadline(budget_seconds)
+    try:
+        while deadline.allows(MIN_BATCH_SECONDS):
+            batch = store.pending(job_id, BATCH_SIZES[job['kind']])
+            if not batch:
+                wait = store.next_retry(job_id)
+                if wait is None:
+                    if store.job(job_id)['status'] == 'queued':
+                        store.set_status(job_id, 'done')
+                    break
+                if not deadline.allows(wait + MIN_BATCH_SECONDS):
+                    break
+                time.sleep(wait)
+                continue
+
+            if store.job(job_id)['status'] == 'cancelled':
+                break
+
+            try:
+                outcomes = process([payload for _, payload, _ in batch], job['options'], deadline)
+            except Exception as e:
+                outcomes = [(False, str(e))] * len(batch)
+
+            records = []
+            for (index, _, attempts), (ok, value) in zip(batch, outcomes):
+                attempts += 1
+                if ok:
+                    records.append((index, 'done', attempts, 0, None, value))
+                elif attempts >= MAX_ATTEMPTS:
+                    records.append((index, 'failed', attempts, 0, value, None))
+                else:
+                    retry_at = _now() + RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+                    records.append((index, 'pending', attempts, retry_at, value, None))
+            store.record(job_id, records)
+    finally:
+        store.release(job_id, owner)
+
+    return job_id
+
+def handle_job_request(data):
+    """(response, status code) for a /api/jobs action; shared with proxy-server.py"""
+    if os.environ.get('VERCEL'):
+        return {'error': 'Background jobs need one machine: the job store is local to each Vercel instance. '
+                         'Run them through proxy-server.py or local-server.py.'}, 501
+    store = get_job_store()
+    action = data.get('action', 'status')
+    job_id = data.get('job_id')
+
+    if action == 'submit':
+        kind = data.get('kind')
+        items = data.get('items') or []
+        if kind not in JOB_KINDS:
+            return {'error': f'Invalid kind: {kind} (expected one of {", ".join(JOB_KINDS)})'}, 400
+        if not items:
+            return {'error': 'No items provided'}, 400
+        job_id = store.create(kind, items, data.get('options') or {})
+        return store.summary(job_id), 202
+
+    if not job_id or store.job(job_id) is None:
+        return {'error': f'Job not found: {job_id}'}, 404
+
+    if action == 'append':
+        items = data.get('items') or []
+        if store.job(job_id)['status'] == 'cancelled':
+            return {'error': 'Job was cancelled'}, 409
+        if items:
+            store.append(job_id, items)
+        return store.summary(job_id), 200
+
+    if action == 'cancel':
+        store.set_status(job_id, 'cancelled')
+        return store.summary(job_id), 200
+
+    if action == 'status':
+        if data.get('run') and store.job(job_id)['status'] == 'queued':
+            # The slice has to end before the request does
+            run_job(store, job_id, min(JOB_SLICE_SECONDS, Deadline().remaining()))
+        return store.summary(job_id, bool(data.get('include_results'))), 200
+
+    return {'error': f'Invalid action: {action}'}, 400
@@ -0,0 +1,75 @@
+"""In-memory BM25 keyword index over attendee profiles
+
+Cheap enough to build per request for a few thousand profiles, so handlers
+that receive the dataset in the request body can rank it without any network
+call. Used as the coarse pass of the search cascade.
+"""
+
+import math
+import re
+
+from _lib.profiles import create_attendee_text
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:['.&+-][a-z0-9]+)*")
+
+STOPWORDS = {
+    'a', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'by', 'connection',
+    'connections', 'did', 'do', 'does', 'experience', 'find', 'for', 'from',
+    'has', 'have', 'in', 'is', 'me', 'of', 'on', 'or', 'people', 'person',
+    'show', 'someone', 'the', 'to', 'who', 'with', 'worked', 'works'
+}
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed"""
+    return [t for t in TOKEN_RE.findall((text or '').lower()) if t not in STOPWORDS]
+
+class LexicalIndex:
+    """BM25 (k1=1.2, b=0.75) over one text document per attendee"""
+
+    def __init__(self, attendees, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.term_freqs = []
+        self.doc_lens = []
+        self.doc_freqs = {}
+
+        for a in attendees:
+            tokens = tokenize(create_attendee_text(a))
+            freqs = {}
+            for t in tokens:
+                freqs[t] = freqs.get(t, 0) + 1
+            for t in freqs:
+                self.doc_freqs[t] = self.doc_freqs.get(t, 0) + 1
+
+            self.ids.append(a.get('id'))
+            self.term_freqs.append(freqs)
+            self.doc_lens.append(len(tokens))
+
+        self.avg_len = (sum(self.doc_lens) / len(self.doc_lens)) if self.doc_lens else 0.0
+
+    def idf(self, term):
+        n = len(self.ids)
+        df = self.doc_freqs.get(term, 0)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query, limit=None):
+        """Return [(id, score)] for documents matching any query term, best first"""
+        terms = set(tokenize(query))
+        if not terms or not self.ids:
+            return []
+
+        idfs = {t: self.idf(t) for t in terms if t in self.doc_freqs}
+        scored = []
+        for i, freqs in enumerate(self.term_freqs):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lens[i] / (self.avg_len or 1))
+            for t, idf in idfs.items():
+                tf = freqs.get(t)
+                if tf:
+                    score += idf * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((self.ids[i], score))
+
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        return scored[:limit] if limit else scored
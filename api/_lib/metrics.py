@@ -0,0 +1,134 @@
+"""Per-request stage timings, provider token usage and a Prometheus registry
+
+Handlers create a Timings per request and wrap each stage in a span:
+
+    timings = Timings('vector-search')
+    with timings.span('embed'):
+        ...
+
+The spans become the response's Server-Timing header (visible in the
+browser's network panel) and are added to process-wide histograms that
+proxy-server.py serves at /metrics in the Prometheus text format. Provider
+usage fields - input, output and cache-read tokens - are counted per
+provider and model.
+
+Scoring calls are not streamed, so time-to-first-token is measured as
+time to the response headers ("llm_ttfb"); the rest of "llm" is the body.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+class Registry:
+    """Process-wide counters and histograms, rendered as Prometheus text"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # histograms[(route, stage)] -> [bucket counts..., sum, count]
+        self.histograms = {}
+        # counters[(name, labels)] -> value
+        self.counters = {}
+
+    def observe(self, route, stage, seconds):
+        with self.lock:
+            hist = self.histograms.setdefault((route, stage), [0] * len(BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+
+    def increment(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            if self.histograms:
+                lines.append('# HELP handenheit_stage_seconds Time spent per request stage')
+                lines.append('# TYPE handenheit_stage_seconds histogram')
+            for (route, stage), hist in sorted(self.histograms.items()):
+                labels = f'route="{route}",stage="{stage}"'
+                for bound, count in zip(BUCKETS, hist):
+                    lines.append(f'handenheit_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'handenheit_stage_seconds_bucket{{{labels},le="+Inf"}} {hist[-1]}')
+                lines.append(f'handenheit_stage_seconds_sum{{{labels}}} {hist[-2]:.6f}')
+                lines.append(f'handenheit_stage_seconds_count{{{labels}}} {hist[-1]}')
+
+            names = sorted({name for name, _ in self.counters})
+            for name in names:
+                lines.append(f'# TYPE {name} counter')
+                for (counter, labels), value in sorted(self.counters.items()):
+                    if counter == name:
+                        label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+                        lines.append(f'{name}{{{label_text}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+class Timings:
+    """Stage spans for one request"""
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        # [(stage, seconds)] in the order the stages ended
+        self.spans = []
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage, seconds):
+        self.spans.append((stage, seconds))
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def header(self):
+        """Server-Timing header value, durations in milliseconds"""
+        entries = [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in self.spans]
+        entries.append(f'total;dur={self.total() * 1000:.1f}')
+        return ', '.join(entries)
+
+    def finish(self, status_code):
+        """Add this request's spans to the process-wide registry"""
+        for stage, seconds in self.spans:
+            REGISTRY.observe(self.route, stage, seconds)
+        REGISTRY.observe(self.route, 'total', self.total())
+        REGISTRY.increment('handenheit_requests_total', {'route': self.route, 'status': str(status_code)})
+
+def usage_tokens(result):
+    """{input, output, cache_read} token counts from an Anthropic or Gemini response body"""
+    if 'usage' in result:
+        usage = result.get('usage') or {}
+        return {
+            'input': usage.get('input_tokens', 0),
+            'output': usage.get('output_tokens', 0),
+            'cache_read': usage.get('cache_read_input_tokens', 0)
+        }
+    usage = result.get('usageMetadata') or {}
+    return {
+        'input': usage.get('promptTokenCount', 0),
+        'output': usage.get('candidatesTokenCount', 0),
+        'cache_read': usage.get('cachedContentTokenCount', 0)
+    }
+
+def record_usage(provider, model, result):
+    """Count a provider response's tokens; returns the counts"""
+    tokens = usage_tokens(result)
+    for kind, count in tokens.items():
+        if count:
+            REGISTRY.increment('handenheit_tokens_total', {'provider': provider, 'model': model, 'kind': kind}, count)
+    return tokens
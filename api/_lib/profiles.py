@@ -0,0 +1,134 @@
+"""Attendee profile helpers shared by the sync and search handlers"""
+
+def create_attendee_text(attendee):
+    """Create a text representation of an attendee for embedding"""
+    parts = []
+
+    if attendee.get('name'):
+        parts.append(f"Name: {attendee['name']}")
+
+    if attendee.get('headline'):
+        parts.append(f"Headline: {attendee['headline']}")
+
+    if attendee.get('location'):
+        parts.append(f"Location: {attendee['location']}")
+
+    if attendee.get('school'):
+        parts.append(f"School: {attendee['school']}")
+
+    # About section
+    about = attendee.get('about')
+    if about:
+        if isinstance(about, dict):
+            parts.append(f"About: {about.get('text', '')}")
+        else:
+            parts.append(f"About: {about}")
+
+    # Experience
+    experience = attendee.get('experience', [])
+    if experience:
+        exp_parts = []
+        for exp in experience:
+            exp_str = f"{exp.get('title', '')} at {exp.get('company', '')}"
+            if exp.get('description'):
+                exp_str += f" - {exp['description']}"
+            exp_parts.append(exp_str)
+        parts.append(f"Experience: {'; '.join(exp_parts)}")
+
+    # Education
+    education = attendee.get('education', [])
+    if education:
+        edu_parts = []
+        for edu in education:
+            edu_parts.append(f"{edu.get('degree', '')} from {edu.get('school', '')}")
+        parts.append(f"Education: {'; '.join(edu_parts)}")
+
+    # Skills
+    skills = attendee.get('skills', [])
+    if skills:
+        parts.append(f"Skills: {', '.join(skills)}")
+
+    # Interests
+    interests = attendee.get('interests', [])
+    if interests:
+        parts.append(f"Interests: {', '.join(interests)}")
+
+    # Projects
+    projects = attendee.get('projects', [])
+    if projects:
+        proj_parts = []
+        for proj in projects:
+            proj_str = proj.get('name', '')
+            if proj.get('description'):
+                proj_str += f" - {proj['description']}"
+            proj_parts.append(proj_str)
+        parts.append(f"Projects: {'; '.join(proj_parts)}")
+
+    # Organizations
+    organizations = attendee.get('organizations', [])
+    if organizations:
+        org_parts = []
+        for org in organizations:
+            org_str = org.get('name', '')
+            if org.get('role'):
+                org_str += f" ({org['role']})"
+            org_parts.append(org_str)
+        parts.append(f"Organizations: {'; '.join(org_parts)}")
+
+    return '\n'.join(parts)
+
+def _about_text(about):
+    if isinstance(about, dict):
+        return about.get('text', '')
+    return about or ''
+
+def profile_sections(attendee):
+    """Split a profile into highlightable sections
+
+    Returns a list of (section, index, text) tuples, one per experience,
+    education, project, organization, volunteering and award entry plus the
+    headline and about text. index is None for the non-array sections. The
+    (section, index) pair is the same address the search highlights use.
+    """
+    sections = []
+
+    if attendee.get('headline'):
+        sections.append(('headline', None, attendee['headline']))
+
+    about = _about_text(attendee.get('about'))
+    if about:
+        sections.append(('about', None, about))
+
+    # Entries with neither half of "x at y" set are skipped rather than
+    # embedded as a bare " at "
+    for i, exp in enumerate(attendee.get('experience') or []):
+        text = ' at '.join(p for p in (exp.get('title'), exp.get('company')) if p)
+        if exp.get('description'):
+            text += f" - {exp['description']}"
+        sections.append(('experience', i, text))
+
+    for i, edu in enumerate(attendee.get('education') or []):
+        sections.append(('education', i, ' from '.join(p for p in (edu.get('degree'), edu.get('school')) if p)))
+
+    for i, proj in enumerate(attendee.get('projects') or []):
+        text = proj.get('name', '')
+        if proj.get('description'):
+            text += f" - {proj['description']}"
+        sections.append(('projects', i, text))
+
+    for i, org in enumerate(attendee.get('organizations') or []):
+        text = org.get('name', '')
+        if org.get('role'):
+            text += f" ({org['role']})"
+        sections.append(('organizations', i, text))
+
+    for i, vol in enumerate(attendee.get('volunteering') or []):
+        sections.append(('volunteering', i, ' at '.join(p for p in (vol.get('role'), vol.get('organization')) if p)))
+
+    for i, award in enumerate(attendee.get('awards') or []):
+        text = award.get('name', '')
+        if award.get('description'):
+            text += f" - {award['description']}"
+        sections.append(('awards', i, text))
+
+    return [s for s in sections if s[2].strip(' -')]
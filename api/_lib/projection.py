@@ -0,0 +1,119 @@
+"""Columnar Supabase retrieval: only the columns the search prompts use
+
+match_attendees returns whole attendee rows - image and url included, with
+the experience, education... lists as JSON text inside the JSON response,
+decoded a second time here. With SUPABASE_PROJECTION set (run
+supabase/columnar-search.sql first) vector search calls
+match_attendees_projected instead:
+
+- columns: each match carries just the prompt columns, as one jsonb object
+  whose lists are real JSON
+- ids: matches carry only id, similarity and a digest of that object; the
+  profiles come from a local profile cache, and only the ones it lacks (or
+  holds an older digest of) are fetched, with attendee_profiles
+
+The profile cache is kept in the data directory, so each Vercel instance
+fills its own as it searches. Both modes return rows in the local store's
+shape ({id, similarity, record}), read by format_attendees_for_ai without
+further parsing.
+"""
+
+import json
+import os
+import threading
+import urllib.request
+
+from _lib.records import Attendee
+from _lib.resilience import urlopen
+from _lib.serialize import loads
+from _lib.storage import data_path, read_json, write_json
+
+SUPABASE_URL = os.environ.get('SUPABASE_URL', '')
+SUPABASE_KEY = os.environ.get('SUPABASE_SERVICE_KEY', '')
+
+SUPABASE_PROJECTION = os.environ.get('SUPABASE_PROJECTION', 'off').lower()
+
+def _rpc(name, payload, deadline=None):
+    req = urllib.request.Request(
+        f'{SUPABASE_URL}/rest/v1/rpc/{name}',
+        data=json.dumps(payload).encode('utf-8'),
+        headers={
+            'Content-Type': 'application/json',
+            'apikey': SUPABASE_KEY,
+            'Authorization': f'Bearer {SUPABASE_KEY}'
+        }
+    )
+    response = urlopen(req, timeout=30, deadline=deadline)
+    return loads(response.read())
+
+class ProfileCache:
+    """Projected profiles by id with the digest they were fetched at, persisted as one JSON file"""
+
+    def __init__(self):
+        self.path = data_path('profile-cache.json')
+        # entries[id] -> (digest, Attendee); saved as [digest, attendees table row]
+        self.entries = {attendee_id: (digest, Attendee.from_row(row))
+                        for attendee_id, (digest, row) in read_json(self.path, {}).items()}
+        self.lock = threading.Lock()
+        self.loaded_mtime = self._mtime()
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def is_stale(self):
+        """True if another process saved the cache since it was loaded"""
+        return self._mtime() != self.loaded_mtime
+
+    def get(self, attendee_id, digest):
+        """The cached record of an attendee if it is still at digest, else None"""
+        entry = self.entries.get(attendee_id)
+        if entry is None or entry[0] != digest:
+            return None
+        return entry[1]
+
+    def update(self, profiles):
+        """Cache attendee_profiles results and save; returns {id: record}"""
+        records = {}
+        with self.lock:
+            for p in profiles:
+                records[p['id']] = Attendee.from_row(p['profile'])
+                self.entries[p['id']] = (p['digest'], records[p['id']])
+            if records:
+                write_json(self.path, {attendee_id: [digest, record.to_row()]
+                                       for attendee_id, (digest, record) in self.entries.items()})
+                self.loaded_mtime = self._mtime()
+        return records
+
+_cache = None
+
+def get_profile_cache():
+    """Process-wide profile cache, reloaded when another process has saved a newer one"""
+    global _cache
+    if _cache is None or _cache.is_stale():
+        _cache = ProfileCache()
+    return _cache
+
+def search_projected(query_embedding, match_count=50, match_threshold=0.3, deadline=None):
+    """Rows ({id, similarity, record}) of the most similar attendees, best first"""
+    ids_only = SUPABASE_PROJECTION == 'ids'
+    matches = _rpc('match_attendees_projected', {
+        'query_embedding': query_embedding,
+        'match_threshold': match_threshold,
+        'match_count': match_count,
+        'ids_only': ids_only
+    }, deadline)
+
+    if ids_only:
+        cache = get_profile_cache()
+        missing = [m['id'] for m in matches if cache.get(m['id'], m['digest']) is None]
+        fetched = cache.update(_rpc('attendee_profiles', {'ids': missing}, deadline)) if missing else {}
+        records = {m['id']: fetched.get(m['id']) or cache.get(m['id'], m['digest']) for m in matches}
+    else:
+        records = {m['id']: Attendee.from_row(m['profile']) for m in matches}
+
+    # An attendee deleted between the two calls has no profile
+    return [{'id': m['id'], 'similarity': m['similarity'], 'record': records[m['id']]}
+            for m in matches if records[m['id']] is not None]
@@ -0,0 +1,11 @@
+"""Provider API base URLs
+
+Overridable so the handlers can be pointed at a proxy or at the offline
+stand-in server in bench/standin.py.
+"""
+
+import os
+
+GEMINI_BASE_URL = os.environ.get('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com').rstrip('/')
+ANTHROPIC_BASE_URL = os.environ.get('ANTHROPIC_BASE_URL', 'https://api.anthropic.com').rstrip('/')
+OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL', 'https://api.openai.com').rstrip('/')
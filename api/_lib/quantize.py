@@ -0,0 +1,234 @@
+"""Quantized embedding storage with exact float rescoring
+
+A 768-dim float32 embedding is 3 KB; with chunk embeddings and several
+years of resume books that adds up. QuantizedIndex keeps only a compact code
+per vector in memory:
+
+- int8: symmetric scalar quantization, one signed byte per dimension plus a
+  per-vector scale (4x smaller than float32)
+- binary: one sign bit per dimension packed into an int (32x smaller),
+  compared by Hamming distance with int.bit_count()
+
+A query scans the codes for a shortlist of rescore_factor * k candidates and
+rescores just those against the exact float32 vectors, which stay on disk and
+are read through mmap, so the shortlist pays for float precision and the
+full scan does not. Like the other indexes, saves write only the codes and
+vectors changed since the last one, plus a line of quantized.log.
+"""
+
+import heapq
+import mmap
+import os
+from array import array
+from operator import mul
+
+from _lib.ann import dot, normalize
+from _lib.storage import (append_json_line, read_json, read_json_lines,
+                          remove_file, should_compact, write_bytes, write_json,
+                          write_records)
+
+QUANTIZATION_MODES = ('int8', 'binary')
+DEFAULT_RESCORE_FACTOR = 10
+
+def int8_code(vector):
+    """Return (codes, scale) with vector ~= codes * scale"""
+    scale = max(abs(x) for x in vector) / 127 or 1.0
+    return array('b', (round(x / scale) for x in vector)), scale
+
+def binary_code(vector):
+    """Pack the sign of each dimension into an int, bit i set when vector[i] > 0"""
+    code = 0
+    for i, x in enumerate(vector):
+        if x > 0:
+            code |= 1 << i
+    return code
+
+class FloatStore:
+    """float32 vectors read on demand from a flat file via mmap
+
+    Vectors added or replaced since the last save are held in memory until
+    save() rewrites the file or save_changes() writes just them into it.
+    """
+
+    def __init__(self, path=None, dim=0, count=0):
+        self.dim = dim
+        self.count = count
+        self.overrides = {}
+        self.map = None
+        if path and count:
+            with open(path, 'rb') as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i in self.overrides:
+            return self.overrides[i]
+        vec = array('f')
+        offset = i * self.dim * 4
+        vec.frombytes(self.map[offset:offset + self.dim * 4])
+        return vec
+
+    def __setitem__(self, i, vector):
+        self.dim = self.dim or len(vector)
+        self.overrides[i] = vector
+        self.count = max(self.count, i + 1)
+
+    def save(self, path):
+        flat = array('f')
+        for i in range(self.count):
+            flat.extend(self[i])
+        write_bytes(path, flat.tobytes())
+        self._reopen(path)
+
+    def save_changes(self, path):
+        write_records(path, 4 * self.dim, {i: v.tobytes() for i, v in self.overrides.items()})
+        self._reopen(path)
+
+    def _reopen(self, path):
+        if self.map is not None:
+            self.map.close()
+        self.__init__(path, self.dim, self.count)
+
+class QuantizedIndex:
+    """Code scan plus float rescoring; same interface as ExactIndex/HNSWIndex"""
+
+    def __init__(self, mode='binary', rescore_factor=DEFAULT_RESCORE_FACTOR):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f'Invalid quantization mode: {mode}')
+        self.mode = mode
+        self.rescore_factor = rescore_factor
+        self.ids = []
+        self.positions = {}
+        self.codes = []
+        self.scales = []
+        self.vectors = FloatStore()
+        # Codes up to saved are on disk; dirty ones were replaced since
+        self.saved = 0
+        self.dirty = set()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, item_id, vector):
+        item_id = str(item_id)
+        vector = normalize(vector)
+        if self.mode == 'int8':
+            code, scale = int8_code(vector)
+        else:
+            code, scale = binary_code(vector), 1.0
+
+        if item_id in self.positions:
+            i = self.positions[item_id]
+            self.codes[i] = code
+            self.scales[i] = scale
+            self.dirty.add(i)
+        else:
+            i = len(self.ids)
+            self.positions[item_id] = i
+            self.ids.append(item_id)
+            self.codes.append(code)
+            self.scales.append(scale)
+        self.vectors[i] = vector
+
+    def shortlist(self, query, n):
+        """Indexes of the n best candidates by code similarity"""
+        if self.mode == 'int8':
+            scored = ((sum(map(mul, query, code)) * scale, i) for i, (code, scale) in enumerate(zip(self.codes, self.scales)))
+            return [i for _, i in heapq.nlargest(n, scored)]
+
+        query_code = binary_code(query)
+        scored = (((query_code ^ code).bit_count(), i) for i, code in enumerate(self.codes))
+        return [i for _, i in heapq.nsmallest(n, scored)]
+
+    def search(self, vector, k=10, rescore_factor=None, **_):
+        """Return [(id, similarity)] with exact similarities for the shortlist"""
+        if not self.ids:
+            return []
+        query = normalize(vector)
+        candidates = self.shortlist(query, k * (rescore_factor or self.rescore_factor))
+        rescored = heapq.nlargest(k, ((dot(query, self.vectors[i]), i) for i in candidates))
+        return [(self.ids[i], s) for s, i in rescored]
+
+    def _code_bytes(self, i):
+        if self.mode == 'int8':
+            return self.codes[i].tobytes()
+        return self.codes[i].to_bytes((self.vectors.dim + 7) // 8, 'little')
+
+    def save(self, directory):
+        """Persist the changes since the last save (quantized.log), or everything when compacting"""
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, 'quantized.json')
+        log_path = os.path.join(directory, 'quantized.log')
+        codes_path = os.path.join(directory, 'codes.i8' if self.mode == 'int8' else 'codes.bin')
+        vectors_path = os.path.join(directory, 'vectors.f32')
+
+        if should_compact(meta_path, log_path):
+            meta = {
+                'mode': self.mode,
+                'rescore_factor': self.rescore_factor,
+                'dim': self.vectors.dim,
+                'ids': self.ids
+            }
+            if self.mode == 'int8':
+                meta['scales'] = self.scales
+            write_bytes(codes_path, b''.join(self._code_bytes(i) for i in range(len(self.ids))))
+            self.vectors.save(vectors_path)
+            write_json(meta_path, meta)
+            remove_file(log_path)
+        elif self.dirty or self.saved < len(self.ids):
+            changed = self.dirty | set(range(self.saved, len(self.ids)))
+            # Codes and vectors first: a log line is only read once they are on disk
+            code_size = self.vectors.dim if self.mode == 'int8' else (self.vectors.dim + 7) // 8
+            write_records(codes_path, code_size, {i: self._code_bytes(i) for i in changed})
+            self.vectors.save_changes(vectors_path)
+            change = {'dim': self.vectors.dim, 'start': self.saved, 'ids': self.ids[self.saved:]}
+            if self.mode == 'int8':
+                change['scales'] = {i: self.scales[i] for i in changed}
+            append_json_line(log_path, change)
+        self.saved = len(self.ids)
+        self.dirty = set()
+
+    @classmethod
+    def load(cls, directory, mode=None, **overrides):
+        """Load a saved index, or return None if there is none (or it used another mode)"""
+        meta = read_json(os.path.join(directory, 'quantized.json'))
+        if meta is None or (mode and meta['mode'] != mode):
+            return None
+
+        index = cls(meta['mode'], overrides.get('rescore_factor') or meta['rescore_factor'])
+        dim = meta['dim']
+        index.ids = meta['ids']
+        scales = meta.get('scales', [])
+        # Replaying a change the snapshot already holds rewrites the same values
+        for change in read_json_lines(os.path.join(directory, 'quantized.log')):
+            dim = change['dim']
+            index.ids[change['start']:change['start'] + len(change['ids'])] = change['ids']
+            scales.extend([1.0] * (len(index.ids) - len(scales)))
+            for i, scale in change.get('scales', {}).items():
+                scales[int(i)] = scale
+        index.positions = {item_id: i for i, item_id in enumerate(index.ids)}
+
+        if index.mode == 'int8':
+            flat = array('b')
+            with open(os.path.join(directory, 'codes.i8'), 'rb') as f:
+                flat.frombytes(f.read())
+            index.codes = [flat[i * dim:(i + 1) * dim] for i in range(len(index.ids))]
+            index.scales = scales
+        else:
+            nbytes = (dim + 7) // 8
+            with open(os.path.join(directory, 'codes.bin'), 'rb') as f:
+                raw = f.read()
+            index.codes = [int.from_bytes(raw[i * nbytes:(i + 1) * nbytes], 'little') for i in range(len(index.ids))]
+            index.scales = [1.0] * len(index.ids)
+
+        index.vectors = FloatStore(os.path.join(directory, 'vectors.f32'), dim, len(index.ids))
+        index.saved = len(index.ids)
+        return index
+
+    def memory_bytes(self):
+        """Approximate resident size of the codes (the float vectors stay on disk)"""
+        dim = self.vectors.dim
+        per_vector = dim + 8 if self.mode == 'int8' else (dim + 7) // 8
+        return per_vector * len(self.ids)
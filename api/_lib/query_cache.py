@@ -0,0 +1,142 @@
+"""Semantic cache of vector-search answers
+
+People phrase the same search many ways ("Palantir connections", "people who
+worked at Palantir"), so an exact-key cache rarely hits. Each answered query
+is kept with its embedding; a new query whose embedding is at least
+SEMANTIC_CACHE_THRESHOLD cosine-similar to a cached one, with the same model
+and options, gets the cached answer back instead of another model call. The
+response says which query answered it and whether the match was exact.
+
+Entries belong to one dataset version (shared.dataset_version() when
+Supabase holds it, the local sync state's otherwise): the first answer
+stored after a sync starts a fresh cache. The SEMANTIC_CACHE_SIZE most recent answers are kept
+in the data directory (0 disables the cache); each new answer is appended
+to a log, which is folded into the snapshot once it outgrows it. Embeddings are stored
+normalized as float32, so a lookup is one dot product per entry.
+"""
+
+import base64
+import os
+import threading
+from array import array
+
+from _lib.ann import dot, normalize
+from _lib.storage import (append_json_line, data_path, read_json,
+                          read_json_lines, remove_file, should_compact,
+                          write_json)
+
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.95))
+SEMANTIC_CACHE_SIZE = int(os.environ.get('SEMANTIC_CACHE_SIZE', 256))
+
+def _encode(vector):
+    return base64.b64encode(normalize(vector).tobytes()).decode('ascii')
+
+def _decode(text):
+    vector = array('f')
+    vector.frombytes(base64.b64decode(text))
+    return vector
+
+class QueryCache:
+    """Answered queries of one dataset version, oldest first
+
+    Persisted as a snapshot (query-cache.json) plus a log of the answers
+    stored since (query-cache.log), so storing an answer appends one line.
+    """
+
+    def __init__(self):
+        self.path = data_path('query-cache.json')
+        self.log_path = data_path('query-cache.log')
+        self.version = None
+        # entries: {'scope', 'query', 'embedding' (base64 float32), 'response'}
+        self.entries = []
+        self.vectors = []
+        data = read_json(self.path) or {}
+        for entry in data.get('entries', []):
+            self._add(data.get('version'), entry)
+        for change in read_json_lines(self.log_path):
+            self._add(change['version'], change['entry'])
+        self.lock = threading.Lock()
+        self.loaded_version = self._version()
+
+    def _version(self):
+        versions = []
+        for path in (self.path, self.log_path):
+            try:
+                stat = os.stat(path)
+                versions.append((stat.st_mtime, stat.st_size))
+            except OSError:
+                versions.append(None)
+        return tuple(versions)
+
+    def is_stale(self):
+        """True if another process saved the cache since it was loaded"""
+        return self._version() != self.loaded_version
+
+    def _add(self, version, entry):
+        if version != self.version:
+            # Synced since: every cached answer may be out of date
+            self.version = version
+            self.entries = []
+            self.vectors = []
+        kept = [(e, v) for e, v in zip(self.entries, self.vectors)
+                if e['scope'] != entry['scope'] or e['query'] != entry['query']]
+        kept.append((entry, _decode(entry['embedding'])))
+        kept = kept[-SEMANTIC_CACHE_SIZE:]
+        self.entries = [e for e, _ in kept]
+        self.vectors = [v for _, v in kept]
+
+    def lookup(self, scope, query, embedding, version, threshold=SEMANTIC_CACHE_THRESHOLD):
+        """(response, cached query, similarity) of the closest answer above threshold, or None
+
+        scope identifies everything besides the query that shapes the answer
+        (model, options); only entries with the same scope are considered.
+        """
+        if version != self.version or not self.entries:
+            return None
+        unit = normalize(embedding)
+        best = None
+        best_similarity = threshold
+        with self.lock:
+            for entry, vector in zip(self.entries, self.vectors):
+                if entry['scope'] != scope:
+                    continue
+                if entry['query'] == query:
+                    return entry['response'], entry['query'], 1.0
+                similarity = dot(unit, vector)
+                if similarity >= best_similarity:
+                    best, best_similarity = entry, similarity
+        if best is None:
+            return None
+        return best['response'], best['query'], best_similarity
+
+    def embedding(self, query):
+        """Stored embedding of a query answered under any scope, or None"""
+        with self.lock:
+            for entry, vector in zip(self.entries, self.vectors):
+                if entry['query'] == query:
+                    return list(vector)
+        return None
+
+    def store(self, scope, query, embedding, version, response):
+        """Remember the answer to query and save it"""
+        if not SEMANTIC_CACHE_SIZE:
+            return
+        with self.lock:
+            entry = {'scope': scope, 'query': query, 'embedding': _encode(embedding), 'response': response}
+            restarted = version != self.version
+            self._add(version, entry)
+            if restarted or should_compact(self.path, self.log_path):
+                write_json(self.path, {'version': self.version, 'entries': self.entries})
+                remove_file(self.log_path)
+            else:
+                append_json_line(self.log_path, {'version': version, 'entry': entry})
+            self.loaded_version = self._version()
+
+_cache = None
+
+def get_query_cache():
+    """Process-wide cache, reloaded when another process has saved a newer one"""
+    global _cache
+    if _cache is None or _cache.is_stale():
+        _cache = QueryCache()
+    return _cache
@@ -0,0 +1,282 @@
+"""Typed attendee records
+
+Profiles arrive as client JSON (nested lists of objects, about as text or
+{'text': ...}) and come back from the attendees table as rows with the
+nested lists stored as JSON text. An Attendee is decoded once from either -
+Attendee.from_client() validates what a client sent, Attendee.from_row()
+reads a stored row - and encodes straight to the attendees table row
+(to_row()) and the profile shape the search prompts use (to_prompt()), so
+neither is rebuilt field by field nor re-parsed on every search. List
+entries encode back with the keys, key order and values they arrived with;
+a null list is written as an empty one.
+
+Records use __slots__ and tuples, so they carry no per-instance dict, and
+the company, school and organization names repeated across profiles are
+interned to one copy each. The local vector store keeps its rows decoded
+this way; rows retrieved from Supabase are decoded once and the most recent
+ROW_CACHE_SIZE records kept for the candidates later searches retrieve again.
+"""
+
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+from _lib.serialize import loads
+
+# Decoded records of recently retrieved attendees table rows, so candidates
+# that come back in later searches are not decoded again
+ROW_CACHE_SIZE = 4096
+
+class Entry:
+    """One element of a profile list (an experience, education... entry)
+
+    FIELDS are the keys the extension and manual entry form write; any other
+    keys are kept in extra. An entry whose keys are not just its non-null
+    FIELDS in FIELDS order also keeps its key order in keys (explicit nulls
+    included), so every entry encodes back unchanged.
+    """
+
+    __slots__ = ('extra', 'keys')
+    FIELDS = ()
+    KEYS = frozenset()
+    # Fields whose values repeat across profiles; interned
+    SHARED = ()
+    # Key orders seen, so entries laid out alike share one tuple
+    LAYOUTS = {}
+
+    def __init_subclass__(cls):
+        cls.KEYS = frozenset(cls.FIELDS)
+        cls.LAYOUTS = {}
+
+    @classmethod
+    def decode(cls, value):
+        """An entry from a profile list element; raises ValueError if it is malformed"""
+        if not isinstance(value, dict):
+            raise ValueError('must be an object')
+        entry = cls.__new__(cls)
+        present = []
+        for name, text in zip(cls.FIELDS, map(value.get, cls.FIELDS)):
+            if text.__class__ is not str:
+                if text is not None:
+                    raise ValueError(f'{name} must be a string')
+            else:
+                present.append(name)
+                if name in cls.SHARED:
+                    text = sys.intern(text)
+            setattr(entry, name, text)
+        keys = tuple(value)
+        if keys == tuple(present):
+            entry.keys = None
+            entry.extra = None
+        else:
+            entry.keys = cls.LAYOUTS.setdefault(keys, keys)
+            entry.extra = {k: v for k, v in value.items() if k not in cls.KEYS} or None
+        return entry
+
+    def to_dict(self):
+        if self.keys is None:
+            return {name: value for name, value in zip(self.FIELDS, map(self.__getattribute__, self.FIELDS)) if value is not None}
+        extra = self.extra
+        return {key: extra[key] if key not in self.KEYS else self.__getattribute__(key) for key in self.keys}
+
+class Experience(Entry):
+    __slots__ = FIELDS = ('title', 'company', 'duration', 'description')
+    SHARED = ('company',)
+
+class Education(Entry):
+    __slots__ = FIELDS = ('school', 'degree', 'duration', 'description')
+    SHARED = ('school', 'degree')
+
+class Organization(Entry):
+    __slots__ = FIELDS = ('name', 'role', 'duration')
+    SHARED = ('name',)
+
+class Volunteering(Entry):
+    __slots__ = FIELDS = ('role', 'organization', 'duration')
+    SHARED = ('organization',)
+
+class Project(Entry):
+    __slots__ = FIELDS = ('name', 'description')
+
+class Award(Entry):
+    __slots__ = FIELDS = ('name', 'description')
+
+TEXT_FIELDS = ('name', 'headline', 'location', 'school', 'url', 'image', 'about')
+# Lists of entries, in the order prompts list them
+ENTRY_FIELDS = ('experience', 'education', 'organizations', 'volunteering', 'projects', 'awards')
+LIST_FIELDS = ('skills', 'languages', 'interests')
+
+def _text(value, field):
+    if value is not None and value.__class__ is not str:
+        raise ValueError(f'{field} must be a string')
+    return value
+
+def _about(value):
+    # The extension sends about as {'text': ...}; rows store the text
+    if isinstance(value, dict):
+        return _text(value.get('text', ''), 'about.text')
+    return _text(value, 'about')
+
+def _entries(cls, value, field, strict):
+    """Decoded entries of one profile list, which rows store as JSON text
+
+    Rows (strict=False) are read leniently: unparsable text and malformed
+    entries are dropped rather than failing a search.
+    """
+    if value.__class__ is str:
+        try:
+            value = loads(value)
+        except ValueError:
+            value = None
+            if strict:
+                raise ValueError(f'{field} must be a list')
+    if not value:
+        return ()
+    if not isinstance(value, list):
+        if strict:
+            raise ValueError(f'{field} must be a list')
+        return ()
+    entries = []
+    for i, item in enumerate(value):
+        try:
+            entries.append(cls.decode(item))
+        except ValueError as e:
+            if strict:
+                raise ValueError(f'{field}[{i}]: {e}') from None
+    return tuple(entries)
+
+def _strings(value, field, strict):
+    if not value:
+        return ()
+    if not isinstance(value, list) or not all(v.__class__ is str for v in value):
+        if strict:
+            raise ValueError(f'{field} must be a list of strings')
+        return tuple(v for v in value if isinstance(v, str)) if isinstance(value, list) else ()
+    return tuple(value)
+
+class Attendee:
+    """One attendee profile, decoded"""
+
+    __slots__ = ('id',) + TEXT_FIELDS + ENTRY_FIELDS + LIST_FIELDS
+
+    @classmethod
+    def _decode(cls, data, strict):
+        if not isinstance(data, dict):
+            raise ValueError('Attendee must be an object')
+        get = data.get
+        record = cls.__new__(cls)
+        record.id = get('id')
+        record.name = _text(get('name'), 'name')
+        record.headline = _text(get('headline'), 'headline')
+        record.location = _text(get('location'), 'location')
+        record.school = _text(get('school'), 'school')
+        record.url = _text(get('url'), 'url')
+        record.image = _text(get('image'), 'image')
+        record.about = _about(get('about'))
+        record.experience = _entries(Experience, get('experience'), 'experience', strict)
+        record.education = _entries(Education, get('education'), 'education', strict)
+        record.organizations = _entries(Organization, get('organizations'), 'organizations', strict)
+        record.volunteering = _entries(Volunteering, get('volunteering'), 'volunteering', strict)
+        record.projects = _entries(Project, get('projects'), 'projects', strict)
+        record.awards = _entries(Award, get('awards'), 'awards', strict)
+        record.skills = _strings(get('skills'), 'skills', strict)
+        record.languages = _strings(get('languages'), 'languages', strict)
+        record.interests = _strings(get('interests'), 'interests', strict)
+        return record
+
+    @classmethod
+    def from_client(cls, data):
+        """Validate and decode a profile sent by the client; raises ValueError if it is malformed"""
+        if not isinstance(data, dict) or data.get('id') is None:
+            raise ValueError('Attendee has no id')
+        record = cls._decode(data, strict=True)
+        record.id = str(record.id)
+        return record
+
+    @classmethod
+    def from_row(cls, row):
+        """Decode an attendees table row (or a match_attendees result)"""
+        return cls._decode(row, strict=False)
+
+    def to_row(self):
+        """The attendees table row, without embedding"""
+        row = {
+            'id': str(self.id),
+            'name': self.name,
+            'headline': self.headline,
+            'location': self.location,
+            'school': self.school,
+            'url': self.url,
+            'image': self.image,
+            'about': self.about,
+            'experience': self._entries_json('experience'),
+            'education': self._entries_json('education')
+        }
+        for field in LIST_FIELDS:
+            row[field] = list(getattr(self, field))
+        for field in ('organizations', 'volunteering', 'projects', 'awards'):
+            row[field] = self._entries_json(field)
+        return row
+
+    def _entries_json(self, field):
+        return json.dumps([entry.to_dict() for entry in getattr(self, field)])
+
+    def to_prompt(self, matched_sections=None):
+        """The profile as the search prompts list it
+
+        Empty lists, and url and image when unset, are left out.
+        matched_sections (chunk addresses from chunk retrieval) is added when
+        given.
+        """
+        profile = {
+            'id': self.id,
+            'name': self.name,
+            'headline': self.headline,
+            'location': self.location,
+            'school': self.school
+        }
+        # Whole rows carry the links; columnar retrieval (projection.py) leaves them out
+        if self.url is not None:
+            profile['url'] = self.url
+        if self.image is not None:
+            profile['image'] = self.image
+        profile['about'] = self.about
+        for field in ENTRY_FIELDS:
+            entries = getattr(self, field)
+            if entries:
+                profile[field] = [entry.to_dict() for entry in entries]
+        for field in LIST_FIELDS:
+            values = getattr(self, field)
+            if values:
+                profile[field] = list(values)
+        if matched_sections:
+            profile['matched_sections'] = matched_sections
+        return profile
+
+_row_cache = OrderedDict()  # id -> (row values, record)
+_row_cache_lock = threading.Lock()
+
+def row_record(row):
+    """The Attendee behind a retrieval row
+
+    Rows from the local store carry their record; Supabase rows are decoded,
+    or taken from the cache if a row with the same values was decoded before.
+    """
+    record = row.get('record')
+    if record is not None:
+        return record
+    attendee_id = row.get('id')
+    values = tuple(map(row.get, Attendee.__slots__))
+    with _row_cache_lock:
+        cached = _row_cache.get(attendee_id)
+        if cached is not None and cached[0] == values:
+            _row_cache.move_to_end(attendee_id)
+            return cached[1]
+    record = Attendee.from_row(row)
+    with _row_cache_lock:
+        _row_cache[attendee_id] = (values, record)
+        _row_cache.move_to_end(attendee_id)
+        if len(_row_cache) > ROW_CACHE_SIZE:
+            _row_cache.popitem(last=False)
+    return record
@@ -0,0 +1,208 @@
+"""Retries, backoff and circuit breakers for calls to Gemini, Anthropic and Supabase
+
+urlopen() is a drop-in for urllib.request.urlopen. Throttling and transient
+failures (429, 5xx, timeouts, dropped connections) are retried up to
+PROVIDER_MAX_RETRIES times with full-jitter exponential backoff, waiting at
+least as long as a Retry-After header asks, so a burst of 429s spreads out
+instead of failing every request at once.
+
+Each host has a circuit breaker. After BREAKER_FAILURES consecutive
+failures it opens and calls to that host fail immediately for
+BREAKER_RESET_SECONDS; then one trial call is let through, and its outcome
+closes or re-opens the breaker. 429 does not count as a failure: the host
+is up, it is asking us to slow down.
+
+A Deadline caps everything: attempt timeouts are cut to the time left, and
+a retry whose backoff would not leave time for another attempt is not made,
+so retries never run past the function's maxDuration. Handlers create one
+Deadline per request and pass it through every stage (embedding, retrieval,
+coarse screening, generation), so each stage's timeout is whatever budget
+the earlier stages left; when too little is left for generation they
+return retrieval-only results instead of being killed mid-call.
+"""
+
+import email.utils
+import http.client
+import os
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+PROVIDER_MAX_RETRIES = int(os.environ.get('PROVIDER_MAX_RETRIES', 3))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8
+# A longer Retry-After is treated as an outage rather than throttling
+RETRY_AFTER_MAX_SECONDS = 60
+
+BREAKER_FAILURES = 5
+BREAKER_RESET_SECONDS = 30
+
+# Vercel maxDuration (vercel.json) less time to build and send the response
+FUNCTION_MAX_DURATION = float(os.environ.get('FUNCTION_MAX_DURATION', 60))
+RESPONSE_MARGIN_SECONDS = 3
+
+# Shortest attempt worth starting
+MIN_ATTEMPT_SECONDS = 1
+
+# Least time worth giving an LLM scoring call; with less left, handlers
+# degrade to retrieval-only results
+MIN_GENERATION_SECONDS = 10
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+class DeadlineExceeded(Exception):
+    """The request has no time left for another provider call"""
+
+class CircuitOpenError(Exception):
+    """Calls to a host are suspended after repeated failures"""
+
+class Deadline:
+    """A point in time a request must finish by"""
+
+    def __init__(self, seconds=FUNCTION_MAX_DURATION - RESPONSE_MARGIN_SECONDS):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, seconds):
+        """True if at least this many seconds are left"""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap):
+        """A stage timeout: cap, cut to the time left"""
+        return min(cap, self.remaining())
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one host: closed, open, then half-open"""
+
+    def __init__(self, host):
+        self.host = host
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            wait = self.opened_at + BREAKER_RESET_SECONDS - time.monotonic()
+            if wait > 0 or self.trial_running:
+                raise CircuitOpenError(f'{self.host} is failing; calls suspended for {max(wait, 0):.0f}s')
+            # Half-open: let one trial call through
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.failures >= BREAKER_FAILURES or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(host):
+    """Process-wide circuit breaker for a host"""
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+def retry_after_seconds(headers):
+    """Seconds a Retry-After header (delta or HTTP date) asks to wait, or None"""
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_seconds(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after + random.uniform(0, BACKOFF_BASE_SECONDS))
+    return delay
+
+def is_timeout(error):
+    """True for errors meaning a call ran out of time rather than failed"""
+    if isinstance(error, urllib.error.URLError) and not isinstance(error, urllib.error.HTTPError):
+        error = error.reason
+    return isinstance(error, (DeadlineExceeded, socket.timeout, TimeoutError))
+
+def urlopen(req, timeout=30, deadline=None, retries=PROVIDER_MAX_RETRIES):
+    """urllib.request.urlopen with retries, per-host circuit breaking and a deadline
+
+    Non-retryable HTTP errors (400, 401, 404, ...) are raised at once, as
+    urllib raises them; the last error is raised when retries run out.
+
+    timeout, cut to what is left of deadline, is urllib's socket timeout: it
+    bounds each blocking operation (connecting, each read), not the attempt
+    as a whole, so a response that keeps trickling in can outlast it.
+    """
+    breaker = get_breaker(urllib.parse.urlsplit(req.full_url).hostname)
+
+    attempt = 0
+    while True:
+        # Before the breaker: a half-open breaker lets one trial call
+        # through, and a trial that never runs would never release it
+        attempt_timeout = timeout
+        if deadline is not None:
+            attempt_timeout = deadline.timeout(timeout)
+            if attempt_timeout < MIN_ATTEMPT_SECONDS:
+                raise DeadlineExceeded(f'No time left to call {breaker.host}')
+
+        breaker.before_call()
+
+        retry_after = None
+        try:
+            response = urllib.request.urlopen(req, timeout=attempt_timeout)
+            breaker.record_success()
+            return response
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRYABLE_STATUS:
+                # The host answered; the request itself is wrong
+                breaker.record_success()
+                raise
+            if e.code == 429:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+            retry_after = retry_after_seconds(e.headers)
+            error = e
+        except (urllib.error.URLError, http.client.HTTPException, socket.timeout, ConnectionError) as e:
+            breaker.record_failure()
+            error = e
+        except Exception:
+            breaker.record_failure()
+            raise
+
+        if attempt >= retries or (retry_after or 0) > RETRY_AFTER_MAX_SECONDS:
+            raise error
+        delay = backoff_seconds(attempt, retry_after)
+        if deadline is not None and delay + MIN_ATTEMPT_SECONDS > deadline.remaining():
+            raise error
+        if isinstance(error, urllib.error.HTTPError):
+            error.close()
+        time.sleep(delay)
+        attempt += 1
@@ -0,0 +1,95 @@
+"""Adaptive candidate selection from retrieval similarity scores
+
+Vector retrieval always returns up to match_count rows, but for narrow
+queries only the first handful are real matches and the rest is a long flat
+tail. Cutting at the knee of the similarity curve (or at the first large
+score gap) keeps the rerank prompt small without a fixed per-query count.
+"""
+
+DEFAULT_MIN_CANDIDATES = 5
+DEFAULT_MAX_CANDIDATES = 50
+
+# Below this spread between best and worst similarity the curve has no
+# meaningful knee, so everything up to max_count is kept
+MIN_SCORE_SPREAD = 0.03
+
+# A knee must sit at least this far (normalized) below the chord; straight
+# or nearly straight curves have no knee
+MIN_KNEE_DISTANCE = 0.1
+
+# Without an explicit score_gap, a single drop of at least this fraction of
+# the whole spread counts as a gap
+RELATIVE_GAP = 0.2
+
+def find_knee(scores):
+    """Index of the knee of a descending score curve (Kneedle), or None
+
+    Scores and positions are normalized to [0, 1]; the knee is the point
+    furthest below the straight line joining the first and last scores.
+    """
+    n = len(scores)
+    if n < 3:
+        return None
+
+    top, bottom = scores[0], scores[-1]
+    spread = top - bottom
+    if spread <= 0:
+        return None
+
+    best_index = None
+    best_distance = MIN_KNEE_DISTANCE
+    for i, s in enumerate(scores):
+        x = i / (n - 1)
+        y = (s - bottom) / spread
+        distance = (1 - x) - y
+        if distance > best_distance:
+            best_distance = distance
+            best_index = i
+
+    return best_index
+
+def find_gap(scores, gap):
+    """Index of the first score at least `gap` below its predecessor, or None"""
+    for i in range(1, len(scores)):
+        if scores[i - 1] - scores[i] >= gap:
+            return i
+    return None
+
+def adaptive_count(scores, min_count=DEFAULT_MIN_CANDIDATES, max_count=DEFAULT_MAX_CANDIDATES, score_gap=None):
+    """Return (count, method) - how many of the descending scores to keep
+
+    The cut is the earlier of the knee and the first gap of at least
+    score_gap (default: RELATIVE_GAP of the score spread); the result is
+    clamped to [min_count, max_count].
+    """
+    scores = list(scores)[:max_count]
+    if len(scores) <= min_count:
+        return len(scores), 'all'
+    if scores[0] - scores[-1] < MIN_SCORE_SPREAD:
+        return len(scores), 'flat'
+
+    count, method = len(scores), 'max'
+
+    knee = find_knee(scores)
+    if knee is not None:
+        count, method = knee + 1, 'knee'
+
+    gap = find_gap(scores, score_gap or RELATIVE_GAP * (scores[0] - scores[-1]))
+    if gap is not None and gap < count:
+        count, method = gap, 'gap'
+
+    return max(min_count, min(count, max_count)), method
+
+def select_candidates(rows, min_count=DEFAULT_MIN_CANDIDATES, max_count=DEFAULT_MAX_CANDIDATES, score_gap=None, score_key='similarity'):
+    """Trim retrieval rows (best first) to an adaptive count
+
+    Returns (rows, info). Rows without a score are passed through untrimmed
+    apart from max_count.
+    """
+    rows = list(rows)[:max_count]
+    scores = [r.get(score_key) for r in rows]
+    if not rows or any(not isinstance(s, (int, float)) for s in scores):
+        return rows, {'fetched': len(rows), 'selected': len(rows), 'method': 'unscored'}
+
+    count, method = adaptive_count(scores, min_count, max_count, score_gap)
+    return rows[:count], {'fetched': len(rows), 'selected': count, 'method': method}
@@ -0,0 +1,106 @@
+"""JSON encoding for request and response bodies, and the search response shape
+
+Handlers parse and emit multi-hundred-KB JSON on every search. JSON_BACKEND
+picks the library: orjson or msgspec when installed (several times faster
+than the standard library on these payloads), falling back to the json
+module; auto (default) takes the first available. All backends produce
+standard JSON, so clients cannot tell them apart. Prompts sent to the models
+keep using the json module, so their text is the same whichever backend runs.
+
+Search results ({summary, matches}) have always been returned as a JSON
+string inside an Anthropic-style content block, which costs an encode and a
+decode on each side. Requests with "structured": true get the result as
+an object under 'result' instead.
+"""
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto').lower()
+JSON_BACKENDS = ('auto', 'orjson', 'msgspec', 'json')
+
+def _select_backend(name):
+    if name not in JSON_BACKENDS:
+        raise ValueError(f'Invalid JSON_BACKEND: {name} (expected one of {", ".join(JSON_BACKENDS)})')
+    if name == 'orjson' or (name == 'auto' and orjson is not None):
+        if orjson is None:
+            raise RuntimeError('JSON_BACKEND=orjson needs orjson (pip install orjson)')
+        return 'orjson'
+    if name == 'msgspec' or (name == 'auto' and msgspec is not None):
+        if msgspec is None:
+            raise RuntimeError('JSON_BACKEND=msgspec needs msgspec (pip install msgspec)')
+        return 'msgspec'
+    return 'json'
+
+BACKEND = _select_backend(JSON_BACKEND)
+
+if BACKEND == 'orjson':
+    def dumps(obj):
+        """obj as UTF-8 JSON bytes"""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(data):
+        """Parse JSON from bytes or str"""
+        return orjson.loads(data)
+elif BACKEND == 'msgspec':
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+    def dumps(obj):
+        """obj as UTF-8 JSON bytes"""
+        return _encoder.encode(obj)
+
+    def loads(data):
+        """Parse JSON from bytes or str"""
+        try:
+            return _decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # Callers catch ValueError, as raised by json and orjson
+            raise ValueError(str(e)) from None
+else:
+    def dumps(obj):
+        """obj as UTF-8 JSON bytes"""
+        return json.dumps(obj).encode('utf-8')
+
+    def loads(data):
+        """Parse JSON from bytes or str"""
+        return json.loads(data)
+
+def dumps_text(obj):
+    """obj as a JSON string"""
+    return dumps(obj).decode('utf-8')
+
+def strip_code_fence(text):
+    """Model output with any ```json fence around it removed"""
+    text = text.strip()
+    if text.startswith('```json'):
+        text = text[7:]
+    if text.startswith('```'):
+        text = text[3:]
+    if text.endswith('```'):
+        text = text[:-3]
+    return text.strip()
+
+def search_response(result, structured=False, **fields):
+    """Response body for a search result, with any other top-level fields
+
+    The result is nested as JSON text in an Anthropic-style content block,
+    the shape app.js reads, or returned as an object under 'result' for
+    structured requests.
+    """
+    if structured:
+        response = {'result': result}
+    else:
+        response = {'content': [{'type': 'text', 'text': dumps_text(result)}]}
+    response.update(fields)
+    return response
@@ -0,0 +1,99 @@
+"""State every function reads the same way, kept in Supabase
+
+On Vercel each function runs with its own data directory, so anything
+sync-attendees saves there is invisible to vector-search, /api/facets and
+the rest. With Supabase configured and supabase/shared-state.sql run, those
+functions read what they share from Supabase instead and keep at most a
+per-instance cache of it, rebuilt whenever dataset_version moves. The
+version is bumped by a trigger on every write to the tables searches read.
+
+Without Supabase, or before the SQL has been run (its tables and functions
+answer 404), dataset_version() returns None and callers fall back to the
+data directory, which local-server.py shares between sync and search.
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from _lib.resilience import PROVIDER_MAX_RETRIES, urlopen
+from _lib.serialize import loads
+
+SUPABASE_URL = os.environ.get('SUPABASE_URL', '')
+SUPABASE_KEY = os.environ.get('SUPABASE_SERVICE_KEY', '')
+
+# How long a function trusts the dataset version it read last
+VERSION_TTL_SECONDS = 5
+
+# Supabase answers at most 1000 rows per request unless configured otherwise
+PAGE_SIZE = 1000
+
+def supabase_request(path, payload=None, method=None, deadline=None, prefer=None, timeout=30, retries=PROVIDER_MAX_RETRIES):
+    """Parsed answer of a Supabase REST call, or None if the table or function does not exist"""
+    headers = {
+        'Content-Type': 'application/json',
+        'apikey': SUPABASE_KEY,
+        'Authorization': f'Bearer {SUPABASE_KEY}'
+    }
+    if prefer:
+        headers['Prefer'] = prefer
+    req = urllib.request.Request(
+        f'{SUPABASE_URL}/rest/v1/{path}',
+        data=json.dumps(payload).encode('utf-8') if payload is not None else None,
+        method=method,
+        headers=headers
+    )
+    try:
+        response = urlopen(req, timeout=timeout, deadline=deadline, retries=retries)
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+    body = response.read()
+    return loads(body) if body else None
+
+def select_rows(table, query, deadline=None):
+    """Every row a table query selects, PAGE_SIZE per request; None if the table does not exist
+
+    query must order the rows (order=...) so the pages do not overlap.
+    """
+    rows = []
+    while True:
+        page = supabase_request(f'{table}?{query}&offset={len(rows)}&limit={PAGE_SIZE}', deadline=deadline)
+        if page is None:
+            return None
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+
+def rpc_rows(name, payload=None, deadline=None):
+    """Every row a set-returning function returns, PAGE_SIZE per request; None if it does not exist"""
+    rows = []
+    while True:
+        page = supabase_request(f'rpc/{name}?offset={len(rows)}&limit={PAGE_SIZE}', payload or {}, deadline=deadline)
+        if page is None:
+            return None
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+
+_version = None  # (version or None, time.monotonic() it was read)
+_version_lock = threading.Lock()
+
+def dataset_version(deadline=None):
+    """The shared dataset version, or None without Supabase or supabase/shared-state.sql"""
+    global _version
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        return None
+    with _version_lock:
+        if _version is not None and time.monotonic() - _version[1] < VERSION_TTL_SECONDS:
+            return _version[0]
+
+    rows = supabase_request('dataset_version?select=version&id=eq.1', deadline=deadline)
+    version = rows[0]['version'] if rows else None
+    with _version_lock:
+        _version = (version, time.monotonic())
+    return version
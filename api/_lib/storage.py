@@ -0,0 +1,99 @@
+"""Local on-disk storage for indexes and caches
+
+Everything the functions keep outside Supabase lives under one data
+directory: HANDENHEIT_DATA_DIR if set (point it at a persistent volume for
+the proxy server), otherwise a folder in the system temp dir, which is the
+only writable location on Vercel and survives for the life of a warm
+instance.
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+DATA_DIR = os.environ.get('HANDENHEIT_DATA_DIR') or os.path.join(tempfile.gettempdir(), 'handenheit')
+
+# A change log is folded back into its snapshot once it grows past this
+# fraction of the snapshot's size
+COMPACT_RATIO = 0.5
+
+def data_path(*parts):
+    """Path under the data directory, creating parent folders as needed"""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def read_json(path, default=None):
+    """Load a JSON file, or return default if it does not exist"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+def _tmp_path(path):
+    """Temp file name unique to this process and thread, so concurrent writers don't collide"""
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+def write_json(path, data):
+    """Write JSON atomically so readers never see a half-written file"""
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def write_bytes(path, data):
+    """Write bytes atomically"""
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def write_records(path, size, records):
+    """Write fixed-size records ({position: bytes}) into a flat file in place
+
+    Records past the end extend the file, so a save costs the records that
+    changed rather than the whole file.
+    """
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        for position in sorted(records):
+            f.seek(position * size)
+            f.write(records[position])
+
+def append_json_line(path, data):
+    """Append one JSON document as a line of a change log"""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(data) + '\n')
+
+def read_json_lines(path):
+    """Documents of a change log; a torn last line (a write cut short) is skipped"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+    documents = []
+    for line in lines:
+        try:
+            documents.append(json.loads(line))
+        except ValueError:
+            break
+    return documents
+
+def should_compact(snapshot_path, log_path):
+    """True if there is no snapshot yet or its change log has outgrown COMPACT_RATIO of it"""
+    try:
+        snapshot = os.path.getsize(snapshot_path)
+    except OSError:
+        return True
+    try:
+        return os.path.getsize(log_path) > COMPACT_RATIO * snapshot
+    except OSError:
+        return False
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
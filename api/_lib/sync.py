@@ -0,0 +1,266 @@
+"""Attendee sync: embedding, storage, facets and sync-state bookkeeping
+
+Shared by the /api/sync-attendees handler and the background job worker
+(_lib/jobs.py), so a sync behaves the same whether it runs inside a request
+or as a queued job.
+"""
+
+import json
+import os
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from _lib.chunks import CHUNKS_ENABLED, build_chunks, replace_attendee_chunks
+from _lib.embeddings import embed_texts
+from _lib.entities import ENTITY_ENRICHMENT, ENTITY_KINDS, entity_names, get_entities
+from _lib.facets import get_facets
+from _lib.profiles import create_attendee_text
+from _lib.records import Attendee
+from _lib.resilience import DeadlineExceeded, urlopen
+from _lib.sync_state import content_hash, get_sync_state
+from _lib.vector_store import LOCAL_BACKENDS, VECTOR_BACKEND, get_store
+
+# Supabase configuration
+SUPABASE_URL = os.environ.get('SUPABASE_URL', '')
+SUPABASE_KEY = os.environ.get('SUPABASE_SERVICE_KEY', '')
+
+# Least time worth starting another attendee with: its storage calls plus
+# the saves that follow the batch
+MIN_ATTENDEE_SECONDS = 5
+
+# The local store, facets and sync state are shared by every request thread
+# in a process (proxy-server.py, the job worker); updates and saves take turns
+_local_lock = threading.Lock()
+
+def sync_targets():
+    """(use_local, use_supabase); the local vector backends can run without Supabase"""
+    return VECTOR_BACKEND in LOCAL_BACKENDS, bool(SUPABASE_URL and SUPABASE_KEY)
+
+def upsert_attendee(record, embedding, deadline=None):
+    """Insert or update an attendee record in Supabase"""
+    url = f'{SUPABASE_URL}/rest/v1/attendees'
+
+    data = record.to_row()
+    data['embedding'] = embedding
+
+    req = urllib.request.Request(
+        url,
+        data=json.dumps(data).encode('utf-8'),
+        headers={
+            'Content-Type': 'application/json',
+            'apikey': SUPABASE_KEY,
+            'Authorization': f'Bearer {SUPABASE_KEY}',
+            'Prefer': 'resolution=merge-duplicates'  # Upsert behavior
+        }
+    )
+
+    response = urlopen(req, timeout=30, deadline=deadline)
+    return response.status
+
+def delete_attendee(attendee_id, deadline=None):
+    """Delete an attendee from Supabase (its chunks cascade)"""
+    url = f'{SUPABASE_URL}/rest/v1/attendees?id=eq.{urllib.parse.quote(str(attendee_id))}'
+
+    req = urllib.request.Request(
+        url,
+        method='DELETE',
+        headers={
+            'apikey': SUPABASE_KEY,
+            'Authorization': f'Bearer {SUPABASE_KEY}'
+        }
+    )
+
+    response = urlopen(req, timeout=30, deadline=deadline)
+    return response.status
+
+def embed_attendees(attendees, google_api_key, deadline=None):
+    """Embeddings of the attendees' texts, in one batch call where possible
+
+    A profile the provider rejects (400, e.g. an empty text) fails the whole
+    batch call, so the batch is then embedded one attendee at a time and the
+    rejected attendees get the error in place of an embedding. Other errors
+    (auth, outages) would fail every attendee alike and are raised.
+    """
+    texts = [create_attendee_text(a) for a in attendees]
+    try:
+        return embed_texts(texts, google_api_key, deadline)
+    except urllib.error.HTTPError as e:
+        if e.code != 400:
+            raise
+
+    embeddings = []
+    for text in texts:
+        try:
+            embeddings.extend(embed_texts([text], google_api_key, deadline))
+        except urllib.error.HTTPError as e:
+            if e.code != 400:
+                raise
+            embeddings.append(e)
+    return embeddings
+
+def sync_batch(attendees, google_api_key, force=False, deadline=None):
+    """Embed and store a batch of attendees; returns per-batch results
+
+    Attendees whose content hash the server already has are skipped unless
+    force is set. Profiles the embedding provider rejects and storage
+    failures are reported per attendee; an embedding outage fails the whole
+    batch and raises. Attendees deadline leaves no time for are listed in
+    retry, to be sent again, rather than run until the function is killed.
+    """
+    use_local, use_supabase = sync_targets()
+    state = get_sync_state(deadline)
+
+    results = {
+        'success': 0,
+        'failed': 0,
+        'skipped': 0,
+        'errors': [],
+        'retry': []
+    }
+
+    # Validate and decode each profile once; a malformed one fails alone
+    records = {}
+    valid = []
+    for attendee in attendees:
+        try:
+            records[str(attendee.get('id'))] = Attendee.from_client(attendee)
+            valid.append(attendee)
+        except ValueError as e:
+            results['failed'] += 1
+            results['errors'].append({'id': attendee.get('id'), 'name': attendee.get('name'), 'error': str(e)})
+
+    # Skip attendees whose content the server already has
+    state.load([attendee.get('id') for attendee in valid])
+    hashes = {}
+    changed = []
+    for attendee in valid:
+        hashes[str(attendee.get('id'))] = content_hash(attendee)
+        if not force and state.unchanged(attendee.get('id'), hashes[str(attendee.get('id'))]):
+            results['skipped'] += 1
+        else:
+            changed.append(attendee)
+    attendees = changed
+
+    # Resolve companies and schools not seen before, so searches can
+    # read their facts instead of inferring them
+    entities = get_entities(deadline)
+    if ENTITY_ENRICHMENT and google_api_key:
+        try:
+            added = 0
+            for kind in ENTITY_KINDS:
+                names = [name for a in attendees for name in entity_names(a)[kind]]
+                added += entities.resolve(kind, names, google_api_key, deadline=deadline)
+            if added:
+                entities.save()
+        except Exception as e:
+            # Enrichment is best effort; the profiles still sync
+            results['errors'].append({'id': None, 'name': 'entity enrichment', 'error': str(e)})
+
+    # Embed the whole batch at once: one model pass locally, 100 texts
+    # per request with Gemini
+    try:
+        embeddings = embed_attendees(attendees, google_api_key, deadline) if attendees else []
+    except DeadlineExceeded:
+        results['retry'] = [attendee.get('id') for attendee in attendees]
+        attendees = embeddings = []
+
+    for attendee, embedding in zip(attendees, embeddings):
+        if deadline is not None and not deadline.allows(MIN_ATTENDEE_SECONDS):
+            results['retry'].append(attendee.get('id'))
+            continue
+        try:
+            if isinstance(embedding, Exception):
+                raise embedding
+
+            # Upsert to Supabase
+            if use_supabase:
+                upsert_attendee(records[str(attendee.get('id'))], embedding, deadline)
+
+                # Per-section embeddings for chunk-level retrieval
+                if CHUNKS_ENABLED:
+                    replace_attendee_chunks(attendee.get('id'), build_chunks(attendee, google_api_key, deadline), deadline)
+
+            with _local_lock:
+                # Incremental insert into the local ANN/exact index
+                if use_local:
+                    get_store().upsert(records[str(attendee.get('id'))], embedding)
+
+                # Company/school/location facets for counts and pre-filtering
+                get_facets().index.add(attendee, entities)
+
+                state.record(attendee.get('id'), hashes[str(attendee.get('id'))])
+            results['success'] += 1
+
+        except DeadlineExceeded:
+            results['retry'].append(attendee.get('id'))
+        except Exception as e:
+            results['failed'] += 1
+            results['errors'].append({
+                'id': attendee.get('id'),
+                'name': attendee.get('name'),
+                'error': str(e)
+            })
+
+    with _local_lock:
+        if use_local and results['success']:
+            get_store().save()
+        if results['success']:
+            get_facets().save()
+            state.save()
+
+    results['version'] = state.version
+    results['epoch'] = state.epoch
+    return results
+
+def sync_manifest(manifest, deleted_ids=(), client_version=0, deadline=None):
+    """Apply tombstones and diff a client manifest against the server's hashes
+
+    Deletions deadline leaves no time for are reported in errors, so the
+    client keeps their tombstones for the next sync.
+    """
+    use_local, use_supabase = sync_targets()
+    state = get_sync_state(deadline)
+    manifest = {str(k): v for k, v in manifest.items()}
+
+    deleted = []
+    errors = []
+    for attendee_id in deleted_ids:
+        attendee_id = str(attendee_id)
+        if attendee_id in manifest:
+            continue  # Re-added since it was deleted
+        if deadline is not None and not deadline.allows(MIN_ATTENDEE_SECONDS):
+            errors.append({'id': attendee_id, 'error': 'Out of time; retried on the next sync'})
+            continue
+        try:
+            if use_supabase:
+                delete_attendee(attendee_id, deadline)
+            with _local_lock:
+                if use_local:
+                    get_store().delete(attendee_id)
+                get_facets().index.remove(attendee_id)
+                state.delete(attendee_id)
+            deleted.append(attendee_id)
+        except Exception as e:
+            errors.append({'id': attendee_id, 'error': str(e)})
+
+    if deleted:
+        with _local_lock:
+            if use_local:
+                get_store().save()
+            get_facets().save()
+            state.save()
+
+    upload, deleted_since = state.compare(manifest, client_version)
+    return {
+        'version': state.version,
+        # Versions are only comparable within one epoch; see sync_state.py
+        'epoch': state.epoch,
+        'upload': upload,
+        'unchanged': len(manifest) - len(upload),
+        'deleted': deleted,
+        # Deletions made elsewhere since the client's last sync
+        'deleted_since': [i for i in deleted_since if i not in deleted],
+        'errors': errors
+    }
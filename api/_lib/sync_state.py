@@ -0,0 +1,202 @@
+"""Versioned sync state: what the server already has, per attendee
+
+Every synced profile is recorded with a SHA-256 content hash and the
+dataset version at which it last changed; deletions are kept as
+tombstones. The dataset version increases by one for every change.
+
+A client sends its manifest ({id: hash}) and the ids it has deleted, and
+gets back only the ids it needs to upload, so a sync costs time and
+bandwidth proportional to what changed rather than to the database size.
+
+With supabase/shared-state.sql the state is kept in its sync_state table,
+so every function and client counts the same versions. Without it, each
+data directory keeps its own state under its own epoch id: versions only
+mean something to a client that last synced against the same epoch.
+
+Hashes are computed over canonical JSON (keys sorted, no whitespace, UTF-8,
+numbers written as JavaScript writes them) - the same bytes app.js hashes
+with crypto.subtle, so client and server agree without exchanging profiles.
+"""
+
+import hashlib
+import json
+import os
+import urllib.parse
+import uuid
+from decimal import Decimal
+
+from _lib.shared import dataset_version, select_rows, supabase_request
+from _lib.storage import data_path, read_json, write_json
+
+# Ids per sync_state query when loading a batch's hashes
+LOAD_CHUNK = 100
+
+def _js_number(x):
+    """A float formatted the way JavaScript's Number.prototype.toString does"""
+    sign, digits, exponent = Decimal(repr(x)).normalize().as_tuple()
+    digits = ''.join(map(str, digits))
+    k = len(digits)
+    n = exponent + k  # value = 0.digits * 10**n
+    prefix = '-' if sign else ''
+    if k <= n <= 21:
+        return prefix + digits + '0' * (n - k)
+    if 0 < n <= 21:
+        return prefix + digits[:n] + '.' + digits[n:]
+    if -6 < n <= 0:
+        return prefix + '0.' + '0' * -n + digits
+    mantissa = digits[0] + ('.' + digits[1:] if k > 1 else '')
+    return f'{prefix}{mantissa}e{"+" if n - 1 >= 0 else "-"}{abs(n - 1)}'
+
+def canonical_json(value):
+    """Compact sorted-key JSON, byte-identical to canonicalJSON() in app.js"""
+    if isinstance(value, dict):
+        items = sorted(((str(k), v) for k, v in value.items()), key=lambda item: item[0])
+        return '{' + ','.join(f'{json.dumps(k, ensure_ascii=False)}:{canonical_json(v)}' for k, v in items) + '}'
+    if isinstance(value, list):
+        return '[' + ','.join(canonical_json(v) for v in value) + ']'
+    if isinstance(value, float):
+        return _js_number(value)
+    return json.dumps(value, ensure_ascii=False)
+
+def content_hash(attendee):
+    """Hex SHA-256 of an attendee's canonical JSON"""
+    return hashlib.sha256(canonical_json(attendee).encode('utf-8')).hexdigest()
+
+class SyncState:
+    """Dataset version, per-record hashes and tombstones, persisted as one JSON file"""
+
+    def __init__(self):
+        self.path = data_path('sync-state.json')
+        data = read_json(self.path) or {}
+        # Identifies this data directory's counter; a new one starts at 0
+        self.epoch = data.get('epoch') or uuid.uuid4().hex
+        self.version = data.get('version', 0)
+        # records[id] -> [content hash, version it last changed]
+        self.records = data.get('records', {})
+        # tombstones[id] -> version it was deleted
+        self.tombstones = data.get('tombstones', {})
+        self.loaded_mtime = self._mtime()
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def is_stale(self):
+        """True if another process saved the state since it was loaded"""
+        return self._mtime() != self.loaded_mtime
+
+    def save(self):
+        write_json(self.path, {
+            'epoch': self.epoch,
+            'version': self.version,
+            'records': self.records,
+            'tombstones': self.tombstones
+        })
+        self.loaded_mtime = self._mtime()
+
+    def load(self, attendee_ids):
+        """Nothing to fetch: every record is in memory"""
+
+    def unchanged(self, attendee_id, hash_value):
+        record = self.records.get(str(attendee_id))
+        return record is not None and record[0] == hash_value
+
+    def compare(self, manifest, since):
+        """(ids to upload, ids deleted after version since) for a client manifest"""
+        return self.diff(manifest), self.deleted_since(since)
+
+    def diff(self, manifest):
+        """Ids from a client manifest ({id: hash}) that the server lacks or has a different version of"""
+        return [attendee_id for attendee_id, hash_value in manifest.items() if not self.unchanged(attendee_id, hash_value)]
+
+    def record(self, attendee_id, hash_value):
+        """Note that an attendee was stored with this content; returns the new version"""
+        attendee_id = str(attendee_id)
+        self.version += 1
+        self.records[attendee_id] = [hash_value, self.version]
+        self.tombstones.pop(attendee_id, None)
+        return self.version
+
+    def delete(self, attendee_id):
+        """Replace an attendee's record with a tombstone; returns the new version"""
+        attendee_id = str(attendee_id)
+        self.version += 1
+        self.records.pop(attendee_id, None)
+        self.tombstones[attendee_id] = self.version
+        return self.version
+
+    def changed_since(self, version):
+        """Ids updated after the given version"""
+        return [attendee_id for attendee_id, (_, v) in self.records.items() if v > version]
+
+    def deleted_since(self, version):
+        """Ids deleted after the given version"""
+        return [attendee_id for attendee_id, v in self.tombstones.items() if v > version]
+
+class SharedSyncState:
+    """The same state kept in the sync_state table, versioned by one sequence
+
+    Hashes are fetched for the ids a batch needs (load()); record() and
+    delete() are written together on save().
+    """
+
+    epoch = 'shared'
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+        self.version = 0
+        # hashes[id] -> content hash of the live records loaded so far
+        self.hashes = {}
+        # changes[id] -> new content hash, None for a deletion
+        self.changes = {}
+
+    def load(self, attendee_ids):
+        """Fetch the hashes of these attendees"""
+        attendee_ids = [str(i) for i in attendee_ids]
+        for start in range(0, len(attendee_ids), LOAD_CHUNK):
+            id_list = ','.join(f'"{i}"' for i in attendee_ids[start:start + LOAD_CHUNK])
+            rows = select_rows('sync_state', f'select=id,hash&deleted=is.false&id=in.({urllib.parse.quote(id_list)})&order=id',
+                               self.deadline)
+            self.hashes.update((row['id'], row['hash']) for row in rows or [])
+
+    def unchanged(self, attendee_id, hash_value):
+        return self.hashes.get(str(attendee_id)) == hash_value
+
+    def record(self, attendee_id, hash_value):
+        self.hashes[str(attendee_id)] = hash_value
+        self.changes[str(attendee_id)] = hash_value
+
+    def delete(self, attendee_id):
+        self.hashes.pop(str(attendee_id), None)
+        self.changes[str(attendee_id)] = None
+
+    def save(self):
+        """Write the changes; each row gets the next version from the sequence"""
+        if not self.changes:
+            return
+        rows = [{'id': i, 'hash': h, 'deleted': h is None} for i, h in self.changes.items()]
+        written = supabase_request('sync_state', rows, deadline=self.deadline,
+                                   prefer='resolution=merge-duplicates,return=representation')
+        self.version = max([self.version] + [row['version'] for row in written or []])
+        self.changes = {}
+
+    def compare(self, manifest, since):
+        result = supabase_request('rpc/sync_diff', {'manifest': manifest, 'since': since}, deadline=self.deadline)
+        self.version = max(self.version, result['version'])
+        return result['upload'], result['deleted_since']
+
+_state = None
+
+def get_sync_state(deadline=None):
+    """The shared sync state when Supabase has one, else the process-wide local one
+
+    The local state is reloaded when another process has saved a newer one.
+    """
+    global _state
+    if dataset_version(deadline) is not None and supabase_request('sync_state?select=id&limit=1', deadline=deadline) is not None:
+        return SharedSyncState(deadline)
+    if _state is None or _state.is_stale():
+        _state = SyncState()
+    return _state
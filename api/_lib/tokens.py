@@ -0,0 +1,148 @@
+"""Token estimates and per-model prompt budgets for search calls
+
+Before a search prompt is sent, its input and output tokens are estimated
+from the attendees it would carry. If the prompt would not fit the model's
+context window, or the answer would not fit the output limit (the
+MAX_TOKENS failures), the attendees are split into shards that each fit,
+scored in separate calls and merged - or, where a single call is wanted,
+the lowest-ranked attendees are dropped. The estimates are returned with
+the search result.
+
+The estimator is a tokenizer-free approximation: letter runs of about four
+characters, numbers in groups of three, punctuation and line breaks with
+their indentation as about one token each, scaled per provider. It errs
+on the high side for profile JSON and is meant for budgeting, not billing;
+the providers' reported usage stays the source of truth for cost.
+"""
+
+import json
+import math
+import os
+import re
+
+# (context window, output tokens requested) per model name as clients send it
+MODEL_LIMITS = {
+    'claude-sonnet': (200000, 16000),
+    'claude': (200000, 16000),
+    'gemini-3-flash': (1048576, 16000),
+    'gemini-3-pro': (1048576, 16000),
+    'gemini-flash': (1048576, 16000),
+    'gemini-pro': (1048576, 16000)
+}
+
+# Tokens per estimator unit; Claude's tokenizer splits profile text finer
+PROVIDER_FACTORS = {
+    'anthropic': 1.15,
+    'gemini': 1.0,
+    'openai': 1.0
+}
+
+# Optional cap on input tokens per call, below the context window, to bound
+# latency and cost; 0 uses the model's window
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 0))
+
+# Estimates are approximate; leave this share of each budget unused
+SAFETY_MARGIN = 0.9
+
+# Most calls one search may be split into before attendees are dropped
+MAX_SHARDS = 4
+
+# Share of the attendees a search is expected to return as matches, and
+# the count below which all of them are assumed to be
+MATCH_SHARE = 0.25
+MIN_EXPECTED_MATCHES = 20
+
+# Output tokens: the summary, a match with model-written reasons, a match
+# with codes only (compact schema), and a match in the verbose schema
+SUMMARY_TOKENS = 60
+REASONED_MATCH_TOKENS = 70
+PLAIN_MATCH_TOKENS = 25
+VERBOSE_MATCH_TOKENS = 130
+
+# System message and the fixed instructions around the attendee list
+PROMPT_OVERHEAD_TOKENS = 120
+
+PIECE_PATTERN = re.compile(r'[^\W\d_]+|\d+|\n[ \t]*|[^\w\s]+| +')
+
+def provider_for(model):
+    return 'anthropic' if model.startswith('claude') else 'gemini'
+
+def estimate_tokens(text, provider='gemini'):
+    """Approximate token count of text for the provider's tokenizer"""
+    units = 0
+    for piece in PIECE_PATTERN.findall(text):
+        first = piece[0]
+        if first == ' ':
+            continue  # Folded into the following word
+        if first == '\n':
+            units += 1
+        elif first.isdigit():
+            units += math.ceil(len(piece) / 3)
+        elif first.isalpha():
+            units += math.ceil(len(piece) / 4)
+        else:
+            units += math.ceil(len(piece) / 2)
+    return math.ceil(units * PROVIDER_FACTORS.get(provider, 1.0))
+
+def estimate_output_tokens(count, compact=True, reason_top_n=10):
+    """Expected output tokens for a prompt carrying count attendees"""
+    count = min(count, max(MIN_EXPECTED_MATCHES, math.ceil(count * MATCH_SHARE)))
+    if not compact:
+        return SUMMARY_TOKENS + count * VERBOSE_MATCH_TOKENS
+    reasoned = min(count, reason_top_n)
+    return SUMMARY_TOKENS + reasoned * REASONED_MATCH_TOKENS + (count - reasoned) * PLAIN_MATCH_TOKENS
+
+def budgets(model):
+    """(input, output) token budgets for one call to model"""
+    context, output = MODEL_LIMITS.get(model, (200000, 16000))
+    input_budget = context - output
+    if PROMPT_TOKEN_BUDGET:
+        input_budget = min(input_budget, PROMPT_TOKEN_BUDGET)
+    return int(input_budget * SAFETY_MARGIN), int(output * SAFETY_MARGIN)
+
+def plan_prompt(model, instructions, attendees, compact=True, reason_top_n=10, max_shards=MAX_SHARDS):
+    """Split attendees into shards that each fit the model's budgets
+
+    instructions is the fixed prompt text (base prompt and query). Attendees
+    are packed in order, so when more than max_shards would be needed the
+    ones dropped are the last - callers order attendees best first.
+    Returns (shards, estimate) where estimate is the summary sent to clients.
+    """
+    provider = provider_for(model)
+    input_budget, output_budget = budgets(model)
+    fixed = PROMPT_OVERHEAD_TOKENS + estimate_tokens(instructions, provider)
+
+    shards = []
+    shard = []
+    shard_tokens = fixed
+    input_tokens = 0
+    for attendee in attendees:
+        tokens = estimate_tokens(json.dumps(attendee, indent=2), provider)
+        over_input = shard_tokens + tokens > input_budget
+        over_output = estimate_output_tokens(len(shard) + 1, compact, reason_top_n) > output_budget
+        if shard and (over_input or over_output):
+            if len(shards) + 1 == max_shards:
+                break
+            shards.append(shard)
+            input_tokens += shard_tokens
+            shard = []
+            shard_tokens = fixed
+        shard.append(attendee)
+        shard_tokens += tokens
+    if shard:
+        shards.append(shard)
+        input_tokens += shard_tokens
+
+    kept = sum(len(s) for s in shards)
+    dropped = len(attendees) - kept
+    estimate = {
+        'input_tokens': input_tokens,
+        'output_tokens': sum(estimate_output_tokens(len(s), compact, reason_top_n) for s in shards),
+        'input_budget': input_budget,
+        'output_budget': output_budget,
+        'plan': 'truncated' if dropped else 'sharded' if len(shards) > 1 else 'single',
+        'shards': len(shards)
+    }
+    if dropped:
+        estimate['dropped'] = dropped
+    return shards, estimate
@@ -0,0 +1,153 @@
+"""Local vector retrieval backend
+
+Selected with VECTOR_BACKEND=hnsw (approximate, scales to hundreds of
+thousands of profiles), VECTOR_BACKEND=int8 or binary (quantized codes in
+memory, exact float rescoring of a shortlist) or VECTOR_BACKEND=exact
+(brute force); the default, supabase, keeps using the match_attendees RPC.
+The local backends need sync and search to share one data directory, so
+they are served by local-server.py and ignored on Vercel.
+The local store keeps the same attendee rows sync-attendees writes to
+Supabase next to an index of their embeddings under the data directory. Rows
+are held in memory as decoded attendee records (see records.py) and answered
+as {id, similarity, record}, which format_attendees_for_ai reads like a
+match_attendees row without parsing it again.
+
+Saves are incremental: the rows changed since the last save are appended to
+rows.log and the index writes just its changes too; rows.json is rewritten
+when the log outgrows it.
+
+HNSW knobs come from HNSW_M, HNSW_EF_CONSTRUCTION and HNSW_EF_SEARCH;
+ef_search can also be raised per request. The quantized backends take
+QUANTIZED_RESCORE_FACTOR (shortlist size as a multiple of match_count).
+"""
+
+import heapq
+import os
+
+from _lib.ann import (DEFAULT_EF_CONSTRUCTION, DEFAULT_EF_SEARCH, DEFAULT_M,
+                      ExactIndex, HNSWIndex, dot, normalize)
+from _lib.quantize import (DEFAULT_RESCORE_FACTOR, QUANTIZATION_MODES,
+                           QuantizedIndex)
+from _lib.records import Attendee
+from _lib.storage import (append_json_line, data_path, read_json,
+                          read_json_lines, remove_file, should_compact,
+                          write_json)
+
+VECTOR_BACKEND = os.environ.get('VECTOR_BACKEND', 'supabase').lower()
+LOCAL_BACKENDS = ('hnsw', 'exact') + QUANTIZATION_MODES
+
+# On Vercel every function has its own data directory, so vector search would
+# never see the index sync builds; the local backends need local-server.py
+if os.environ.get('VERCEL') and VECTOR_BACKEND in LOCAL_BACKENDS:
+    VECTOR_BACKEND = 'supabase'
+
+HNSW_M = int(os.environ.get('HNSW_M', DEFAULT_M))
+HNSW_EF_CONSTRUCTION = int(os.environ.get('HNSW_EF_CONSTRUCTION', DEFAULT_EF_CONSTRUCTION))
+HNSW_EF_SEARCH = int(os.environ.get('HNSW_EF_SEARCH', DEFAULT_EF_SEARCH))
+
+QUANTIZED_RESCORE_FACTOR = int(os.environ.get('QUANTIZED_RESCORE_FACTOR', DEFAULT_RESCORE_FACTOR))
+
+class LocalVectorStore:
+    """Attendee records plus an embedding index, persisted to one directory"""
+
+    def __init__(self, backend=VECTOR_BACKEND):
+        self.backend = backend
+        self.directory = os.path.dirname(data_path('vectors', backend, 'rows.json'))
+        self.rows_path = os.path.join(self.directory, 'rows.json')
+        self.log_path = os.path.join(self.directory, 'rows.log')
+        rows = read_json(self.rows_path, {})
+        for change in read_json_lines(self.log_path):
+            rows.update(change)
+        self.records = {attendee_id: Attendee.from_row(row) for attendee_id, row in rows.items() if row is not None}
+        # Rows changed since the last save, None for a deletion
+        self.changes = {}
+        self.loaded_version = self._version()
+
+        if backend == 'hnsw':
+            self.index = HNSWIndex.load(self.directory, ef_search=HNSW_EF_SEARCH) or HNSWIndex(
+                m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef_search=HNSW_EF_SEARCH
+            )
+        elif backend in QUANTIZATION_MODES:
+            self.index = QuantizedIndex.load(self.directory, backend, rescore_factor=QUANTIZED_RESCORE_FACTOR) or QuantizedIndex(
+                backend, QUANTIZED_RESCORE_FACTOR
+            )
+        else:
+            self.index = ExactIndex.load(self.directory) or ExactIndex()
+
+    def _version(self):
+        versions = []
+        for path in (self.rows_path, self.log_path):
+            try:
+                stat = os.stat(path)
+                versions.append((stat.st_mtime, stat.st_size))
+            except OSError:
+                versions.append(None)
+        return tuple(versions)
+
+    def is_stale(self):
+        """True if another process saved the store since it was loaded"""
+        return self._version() != self.loaded_version
+
+    def upsert(self, record, embedding):
+        """Add or replace one attendee record and its embedding"""
+        attendee_id = str(record.id)
+        self.records[attendee_id] = record
+        self.changes[attendee_id] = record
+        self.index.add(attendee_id, embedding)
+
+    def delete(self, attendee_id):
+        """Remove an attendee's record; its vector stays in the index but is never returned"""
+        self.records.pop(str(attendee_id), None)
+        self.changes[str(attendee_id)] = None
+
+    def save(self):
+        """Persist the changes since the last save, or everything when compacting"""
+        self.index.save(self.directory)
+        # The rows go last: readers reload when they change, and the index
+        # they then load already has the vectors
+        if should_compact(self.rows_path, self.log_path):
+            write_json(self.rows_path, {attendee_id: record.to_row() for attendee_id, record in self.records.items()})
+            remove_file(self.log_path)
+        elif self.changes:
+            append_json_line(self.log_path, {attendee_id: record.to_row() if record is not None else None
+                                             for attendee_id, record in self.changes.items()})
+        self.changes = {}
+        self.loaded_version = self._version()
+
+    def search_ids(self, query_embedding, attendee_ids, match_count=50):
+        """[(id, similarity)] scored exactly over just the given attendees"""
+        query = normalize(query_embedding)
+        positions = self.index.positions
+        scored = ((dot(query, self.index.vectors[positions[i]]), i)
+                  for i in attendee_ids if i in positions and i in self.records)
+        return [(i, s) for s, i in heapq.nlargest(match_count, scored)]
+
+    def search(self, query_embedding, match_count=50, match_threshold=0.3, ef_search=None, allowed_ids=None):
+        """{id, similarity, record} of the most similar attendees, best first
+
+        allowed_ids (e.g. from a facet filter) restricts the search to those
+        attendees and scores them exactly instead of searching the index.
+        """
+        if allowed_ids is not None:
+            hits = self.search_ids(query_embedding, allowed_ids, match_count)
+        else:
+            # Deleted attendees' vectors are still in the index; ask for
+            # enough extra hits that dropping them leaves match_count
+            deleted = max(0, len(self.index) - len(self.records))
+            hits = self.index.search(query_embedding, match_count + deleted, ef_search=ef_search)
+
+        results = []
+        for attendee_id, similarity in hits:
+            if similarity <= match_threshold or attendee_id not in self.records:
+                continue
+            results.append({'id': attendee_id, 'similarity': similarity, 'record': self.records[attendee_id]})
+        return results[:match_count]
+
+_store = None
+
+def get_store():
+    """Process-wide store, reloaded when a sync elsewhere has saved a newer one"""
+    global _store
+    if _store is None or _store.is_stale():
+        _store = LocalVectorStore()
+    return _store
@@ -0,0 +1,193 @@
+"""Warm-up searches after a sync, and the query suggestions they back
+
+Right after a sync every cache is cold, so the first searches wait on
+embedding, retrieval and the model. When the client reports a sync as
+finished (without waiting for the answer), sync-attendees runs the likely
+searches for the new dataset through /api/vector-search before it
+answers, WARMUP_WORKERS at a time and as many as its deadline allows. The
+answers land in the query cache (query_cache.py) of whichever
+vector-search instances served those calls. That cache lives in each
+instance's data directory, so on a deployment scaled out to several
+instances the others stay cold: a suggested search is only sure to come
+back at once from an instance that warmed it, or under local-server.py.
+
+Likely searches come from two places: the query log (searches people have
+actually run, most frequent first) and templates over the top facet values
+("worked at Goldman Sachs", "studied at Dartmouth College"). vector-search
+writes the log and sync-attendees reads it, so with Supabase it is kept in
+the query_log table (supabase/shared-state.sql); without, in the data
+directory, which local-server.py shares between the two.
+
+Warm-up searches are sent to WARMUP_SEARCH_URL, by default the deployment's
+own /api/vector-search on Vercel. Without one (proxy-server.py does not
+serve vector search) suggestions are still offered but nothing is warmed.
+"""
+
+import json
+import os
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from _lib.coalesce import normalize_query
+from _lib.entities import get_entities
+from _lib.facets import current_facets
+from _lib.resilience import FUNCTION_MAX_DURATION, MIN_GENERATION_SECONDS
+from _lib.shared import dataset_version, supabase_request
+from _lib.storage import data_path, read_json, write_json
+
+VERCEL_URL = os.environ.get('VERCEL_URL', '')
+WARMUP_SEARCH_URL = os.environ.get('WARMUP_SEARCH_URL') or (f'https://{VERCEL_URL}/api/vector-search' if VERCEL_URL else '')
+WARMUP_QUERIES = int(os.environ.get('WARMUP_QUERIES', 20))
+WARMUP_MODEL = os.environ.get('WARMUP_MODEL', 'gemini-flash')
+
+# Sent with every warm-up search as app.js sends them with every vector
+# search, so warm answers are cached under the options real searches use
+WARMUP_OPTIONS = {'match_count': 50, 'structured': True}
+
+# Query templates per facet, and how many of each facet's top values to use
+FACET_TEMPLATES = {
+    'company': 'worked at {}',
+    'school': 'studied at {}',
+    'industry': 'experience in {}',
+    'location': 'people in {}'
+}
+FACET_VALUES = 3
+
+# Distinct queries the log keeps counts for
+QUERY_LOG_SIZE = 500
+
+# Warm-up searches run at once; each is its own vector-search call
+WARMUP_WORKERS = 4
+
+# Counting a search is worth one quick try, never a retry
+QUERY_LOG_TIMEOUT_SECONDS = 2
+
+class QueryLog:
+    """Normalized search queries and how often each was run, persisted as one JSON file
+
+    The log of deployments without Supabase; see record_query().
+    """
+
+    def __init__(self):
+        self.path = data_path('query-log.json')
+        self.counts = read_json(self.path, {})
+        self.lock = threading.Lock()
+        self.loaded_mtime = self._mtime()
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def is_stale(self):
+        """True if another process saved the log since it was loaded"""
+        return self._mtime() != self.loaded_mtime
+
+    def record(self, query):
+        query = normalize_query(query)
+        if not query:
+            return
+        with self.lock:
+            self.counts[query] = self.counts.get(query, 0) + 1
+            if len(self.counts) > QUERY_LOG_SIZE:
+                # Forget the rarest queries, keeping the one just run
+                ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0] != query))
+                self.counts = dict(ranked[:QUERY_LOG_SIZE])
+            write_json(self.path, self.counts)
+            self.loaded_mtime = self._mtime()
+
+    def top(self, limit):
+        """The most frequent queries, most frequent first"""
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return [query for query, _ in ranked[:limit]]
+
+_log = None
+
+def get_query_log():
+    """Process-wide query log, reloaded when another process has saved a newer one"""
+    global _log
+    if _log is None or _log.is_stale():
+        _log = QueryLog()
+    return _log
+
+def record_query(query):
+    """Count one run of a search in the shared query_log table, or the local log without it
+
+    Meant to run off the request path (vector-search starts it in a thread).
+    """
+    query = normalize_query(query)
+    if not query:
+        return
+    try:
+        if dataset_version() is not None and supabase_request(
+            'rpc/record_query', {'search_query': query, 'keep': QUERY_LOG_SIZE},
+            timeout=QUERY_LOG_TIMEOUT_SECONDS, retries=0
+        ) is not None:
+            return
+    except Exception:
+        pass  # The log only shapes suggestions; no search fails over it
+    get_query_log().record(query)
+
+def top_queries(limit):
+    """The most frequent logged queries, most frequent first"""
+    if dataset_version() is not None:
+        rows = supabase_request(f'query_log?select=query&order=count.desc,query&limit={limit}')
+        if rows is not None:
+            return [row['query'] for row in rows]
+    return get_query_log().top(limit)
+
+def suggest_queries(limit=WARMUP_QUERIES):
+    """Likely searches for the synced dataset: logged ones first, then facet templates"""
+    index = current_facets(get_entities())
+    facet_queries = [[template.format(row['value']) for row in index.counts(facet, FACET_VALUES)]
+                     for facet, template in FACET_TEMPLATES.items()]
+    # Interleave the facets so a small limit still covers each of them
+    templated = []
+    for rank in range(FACET_VALUES):
+        templated.extend(queries[rank] for queries in facet_queries if rank < len(queries))
+
+    suggestions = []
+    seen = set()
+    for query in top_queries(limit) + templated:
+        key = normalize_query(query)
+        if key not in seen:
+            seen.add(key)
+            suggestions.append(query)
+    return suggestions[:limit]
+
+def warm_search(query, model=WARMUP_MODEL, timeout=FUNCTION_MAX_DURATION):
+    """Run one search through WARMUP_SEARCH_URL; returns whether it was already cached"""
+    req = urllib.request.Request(
+        WARMUP_SEARCH_URL,
+        data=json.dumps(dict(WARMUP_OPTIONS, query=query, model=model, warmup=True)).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        result = json.loads(response.read().decode('utf-8'))
+    return bool(result.get('cached'))
+
+def warm_up(deadline):
+    """Run the likely searches for the current dataset, as many as deadline allows
+
+    Returns (suggestions, summary): how many searches were run, already
+    cached, failed and skipped for lack of time. The summary is None when
+    there is no search URL to warm or nothing to suggest.
+    """
+    suggestions = suggest_queries()
+    if not WARMUP_SEARCH_URL or not suggestions:
+        return suggestions, None
+
+    def warm(query):
+        # A search that cannot finish in time would only be cut off
+        if not deadline.allows(MIN_GENERATION_SECONDS):
+            return 'skipped'
+        try:
+            return 'cached' if warm_search(query, timeout=deadline.remaining()) else 'searched'
+        except Exception:
+            return 'failed'
+
+    with ThreadPoolExecutor(max_workers=WARMUP_WORKERS) as pool:
+        outcomes = list(pool.map(warm, suggestions))
+    return suggestions, {outcome: outcomes.count(outcome) for outcome in ('searched', 'cached', 'failed', 'skipped')}
@@ -4,13 +4,20 @@ Authentication endpoint for Handenheit
 Verifies password against environment variable
 """
 
-import json
 import os
+import sys
 from http.server import BaseHTTPRequestHandler
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _lib.encoding import compress, read_body
+from _lib.metrics import Timings
+from _lib.serialize import dumps, loads
+
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         """Handle password authentication"""
+        self.timings = Timings('auth')
         try:
             # Get password from environment variable
             correct_password = os.environ.get('HANDENHEIT_PASSWORD', '')
@@ -20,9 +27,7 @@ class handler(BaseHTTPRequestHandler):
                 return
 
             # Parse request body
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length).decode('utf-8')
-            data = json.loads(body)
+            data = loads(read_body(self))
 
             submitted_password = data.get('password', '')
 
@@ -40,16 +45,25 @@ class handler(BaseHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Content-Encoding')
         self.end_headers()
 
     def send_json_response(self, data, status_code):
-        """Send JSON response with CORS headers"""
+        """Send JSON response with CORS and Server-Timing headers"""
+        with self.timings.span('serialize'):
+            body = dumps(data)
+        with self.timings.span('compress'):
+            body, encoding = compress(body, self.headers.get('Accept-Encoding'))
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept-Encoding')
         self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Server-Timing', self.timings.header())
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+        self.wfile.write(body)
+        self.timings.finish(status_code)
 
     def send_error_response(self, error_data, status_code):
         """Send error response"""
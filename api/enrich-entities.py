@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Entity enrichment endpoint for Handenheit
+Resolves the companies and schools of synced profiles to canonical facts
+(location, industry, type) once, caches them, and refreshes the derived
+industry / org_location facets
+
+POST {"limit": 200} -> resolves up to limit uncached names per call; call
+again until "remaining" is 0
+"""
+
+import os
+import sys
+from http.server import BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _lib.encoding import compress, read_body
+from _lib.entities import ENTITY_KINDS, get_entities
+from _lib.facets import current_facets, get_facets
+from _lib.metrics import Timings
+from _lib.serialize import dumps, loads
+
+# Enough batches to finish well inside the function's time limit
+DEFAULT_LIMIT = 200
+
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        """Handle entity enrichment requests"""
+        self.timings = Timings('enrich-entities')
+        try:
+            body = read_body(self)
+            data = loads(body) if body else {}
+
+            limit = int(data.get('limit', DEFAULT_LIMIT))
+            google_api_key = os.environ.get('GOOGLE_API_KEY', '')
+
+            if not google_api_key:
+                self.send_error_response({'error': 'Google API key not configured'}, 500)
+                return
+
+            entities = get_entities()
+            # The names of everything synced, not just what this instance synced
+            labels = current_facets(entities).labels
+
+            resolved = {}
+            remaining = 0
+            for kind in ENTITY_KINDS:
+                names = list(labels[kind].values())
+                resolved[kind] = entities.resolve(kind, names, google_api_key, limit=max(0, limit - sum(resolved.values())))
+                remaining += len(entities.unresolved(kind, names))
+
+            if any(resolved.values()):
+                entities.save()
+                facets = get_facets()
+                facets.index.apply_entities(entities)
+                facets.save()
+
+            self.send_json_response({
+                'resolved': resolved,
+                'remaining': remaining,
+                'cached': len(entities)
+            }, 200)
+
+        except Exception as e:
+            self.send_error_response({'error': str(e)}, 500)
+
+    def do_OPTIONS(self):
+        """Handle CORS preflight"""
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Content-Encoding')
+        self.end_headers()
+
+    def send_json_response(self, data, status_code):
+        """Send JSON response with CORS and Server-Timing headers"""
+        with self.timings.span('serialize'):
+            body = dumps(data)
+        with self.timings.span('compress'):
+            body, encoding = compress(body, self.headers.get('Accept-Encoding'))
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Server-Timing', self.timings.header())
+        self.end_headers()
+        self.wfile.write(body)
+        self.timings.finish(status_code)
+
+    def send_error_response(self, error_data, status_code):
+        """Send error response"""
+        self.send_json_response(error_data, status_code)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Facet endpoint for Handenheit
+Counts and attendee ids by company, school and location for synced profiles
+
+POST {}                                      -> top values of every facet
+POST {"facet": "school", "limit": 20}        -> top values of one facet
+POST {"facet": "school", "value": "UPenn"}   -> count and ids for one value
+POST {"filters": {"school": "UPenn", "location": "PA"}} -> ids matching all
+POST {"suggestions": true}                   -> likely searches, warmed after sync
+"""
+
+import os
+import sys
+from http.server import BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _lib.encoding import compress, read_body
+from _lib.entities import get_entities
+from _lib.facets import FACETS, current_facets
+from _lib.metrics import Timings
+from _lib.serialize import dumps, loads
+from _lib.warmup import WARMUP_QUERIES, suggest_queries
+
+DEFAULT_LIMIT = 50
+
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        """Handle facet count and lookup requests"""
+        self.timings = Timings('facets')
+        try:
+            body = read_body(self)
+            data = loads(body) if body else {}
+
+            facet = data.get('facet')
+            value = data.get('value')
+            filters = data.get('filters')
+            limit = int(data.get('limit', DEFAULT_LIMIT))
+
+            index = current_facets(get_entities())
+
+            if data.get('suggestions'):
+                self.send_json_response({'suggestions': suggest_queries(int(data.get('limit', WARMUP_QUERIES)))}, 200)
+                return
+
+            if filters:
+                if not isinstance(filters, dict) or any(f not in FACETS for f in filters):
+                    self.send_error_response({'error': f'Invalid filters: facets are {", ".join(FACETS)}'}, 400)
+                    return
+                ids = index.filter_ids(filters)
+                self.send_json_response({'filters': filters, 'count': len(ids), 'ids': sorted(ids)}, 200)
+                return
+
+            if facet and facet not in FACETS:
+                self.send_error_response({'error': f'Invalid facet: {facet}'}, 400)
+                return
+
+            if facet and value:
+                ids = index.ids(facet, value)
+                self.send_json_response({'facet': facet, 'value': value, 'count': len(ids), 'ids': sorted(ids)}, 200)
+                return
+
+            facets = [facet] if facet else FACETS
+            self.send_json_response({
+                'total': len(index),
+                'facets': {f: index.counts(f, limit) for f in facets}
+            }, 200)
+
+        except Exception as e:
+            self.send_error_response({'error': str(e)}, 500)
+
+    def do_OPTIONS(self):
+        """Handle CORS preflight"""
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Content-Encoding')
+        self.end_headers()
+
+    def send_json_response(self, data, status_code):
+        """Send JSON response with CORS and Server-Timing headers"""
+        with self.timings.span('serialize'):
+            body = dumps(data)
+        with self.timings.span('compress'):
+            body, encoding = compress(body, self.headers.get('Accept-Encoding'))
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Server-Timing', self.timings.header())
+        self.end_headers()
+        self.wfile.write(body)
+        self.timings.finish(status_code)
+
+    def send_error_response(self, error_data, status_code):
+        """Send error response"""
+        self.send_json_response(error_data, status_code)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Background job endpoint for Handenheit
+Queues long-running syncs and PDF extractions and reports their progress
+
+POST {"action": "submit", "kind": "sync", "items": [attendee, ...], "options": {"force": false}}
+POST {"action": "submit", "kind": "extract", "items": [{"pdf": "<base64>", "school": "..."}, ...]}
+POST {"action": "append", "job_id": "...", "items": [...]}        -> add items to a job in chunks
+POST {"action": "status", "job_id": "...", "run": true}           -> progress, after a worker slice
+POST {"action": "status", "job_id": "...", "include_results": true}
+POST {"action": "cancel", "job_id": "..."}
+
+A status poll with "run": true processes the job for up to
+JOB_SLICE_SECONDS before answering; the proxy server also drains the queue
+in a background thread. The job store is local to one machine, so on Vercel,
+where polls land on any instance, every request is refused with 501.
+"""
+
+import os
+import sys
+from http.server import BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _lib.encoding import compress, read_body
+from _lib.jobs import handle_job_request
+from _lib.metrics import Timings
+from _lib.serialize import dumps, loads
+
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        """Handle job submit, append, status and cancel requests"""
+        self.timings = Timings('jobs')
+        try:
+            body = read_body(self)
+            data = loads(body) if body else {}
+
+            response, status_code = handle_job_request(data)
+            self.send_json_response(response, status_code)
+
+        except Exception as e:
+            self.send_error_response({'error': str(e)}, 500)
+
+    def do_OPTIONS(self):
+        """Handle CORS preflight"""
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Content-Encoding')
+        self.end_headers()
+
+    def send_json_response(self, data, status_code):
+        """Send JSON response with CORS and Server-Timing headers"""
+        with self.timings.span('serialize'):
+            body = dumps(data)
+        with self.timings.span('compress'):
+            body, encoding = compress(body, self.headers.get('Accept-Encoding'))
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Server-Timing', self.timings.header())
+        self.end_headers()
+        self.wfile.write(body)
+        self.timings.finish(status_code)
+
+    def send_error_response(self, error_data, status_code):
+        """Send error response"""
+        self.send_json_response(error_data, status_code)
@@ -1,137 +1,38 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
+import sys
+import time
 import urllib.request
 import urllib.error
-
-def get_base_prompt():
-    """Returns the base prompt text used for all models"""
-    return """SCORING RULES (score field is REQUIRED):
-Assign scores based on how well they satisfy the search criteria:
-- 95-100: Perfect match - directly and explicitly meets the search criteria (e.g., currently works at the company being searched for)
-- 85-94: Exceptional match - meets all or nearly all criteria with strong, direct evidence
-- 75-84: Strong match - meets most criteria with good evidence
-- 60-74: Good match - meets several criteria or partially meets many criteria
-- 40-59: Moderate match - meets some criteria or weakly meets several criteria
-- 20-39: Weak match - barely meets criteria or only tangentially related
-- 0-19: Very weak match - minimal relevance
-
-SCORING EXAMPLES:
-- Searching for "connection to Company X" + person currently works at Company X = 95-100
-- Searching for "connection to Company X" + person previously worked at Company X = 85-94
-- Searching for "experience in field Y" + person has 3+ years direct experience = 90-100
-- Searching for "experience in field Y" + person has 1 year direct experience = 75-85
-
-MATCHING GUIDELINES:
-- Direct matches: The search term appears explicitly in the text (e.g., searching "Boston" and finding "Boston University")
-- Inferred matches: Requires factual knowledge (e.g., searching "Maine" and finding "Berwick Academy" which is actually located in Maine)
-- For INFERRED matches, you MUST be certain of the connection - do NOT guess or make assumptions
-- For INFERRED matches, always provide the factual context in the reason field
-- Partial matches: The profile satisfies some but not all of the search parameters
-
-SCORING CRITERIA:
-- Weight matches based on relevance and directness
-- Consider the strength of evidence for each criterion
-- Account for multiple parameters in complex queries
-- Penalize profiles that only weakly satisfy criteria
-- Reward profiles that exceed expectations
-
-CRITICAL RULES FOR HIGHLIGHTS:
-- ONLY highlight experiences/sections that DIRECTLY relate to the search query
-- If searching for "investing experience", ONLY highlight roles explicitly involving investing (e.g., "Investor", "Investment Analyst")
-- Do NOT highlight "Co-Founder" just because the person is an investor elsewhere
-- If searching for a location like "Maine or New Hampshire":
-  * ONLY highlight schools/companies actually located in those states
-  * Do NOT highlight schools just because they're in the same region (e.g., Boston University is NOT in Maine/New Hampshire)
-  * You MUST know the actual location - if uncertain, do NOT highlight it
-- If searching for "connection to Company X" or "experience at Company X":
-  * ONLY highlight experiences at Company X itself
-  * Do NOT highlight other companies, even if they're in the same industry
-  * Do NOT highlight unrelated experiences just because the person worked at Company X elsewhere
-  * Example: If searching for "Twitch experience", only highlight the Twitch role, NOT MongoDB roles
-- If searching for "experience with Technology Y":
-  * ONLY highlight experiences explicitly involving Technology Y
-  * Do NOT highlight unrelated roles at companies that use Technology Y
-- Be PRECISE and CONSERVATIVE with highlights - when in doubt, don't highlight it
-- Be rigorous with scoring - don't inflate scores without strong justification
-
-Return a JSON object with this EXACT structure:
-{
-  "summary": "string",
-  "matches": [
-    {
-      "id": number,
-      "score": number (REQUIRED - 0 to 100),
-      "relevance": "string",
-      "highlights": [
-        {
-          "section": "string (experience/education/skills/languages/headline/organizations/volunteering/projects/awards/interests)",
-          "index": number (the array index of the item to highlight, e.g., 0 for first experience, 2 for third education),
-          "field": "string (optional - which specific field: title/company/school/degree/name/role/organization)",
-          "reason": "string (why this specific item matches)",
-          "weight": "low/medium/high"
-        }
-      ]
-    }
-  ]
-}
-
-CRITICAL: For highlights with section="experience", "education", "organizations", "volunteering", "projects", or "awards":
-- You MUST provide the "index" field specifying which array item (0-indexed)
-- You MUST provide the "field" to specify what to highlight (e.g., "title", "company", "school", "role", "name", "description")
-- Do NOT use vague text matching - be explicit about the exact array index
-- Example: {"section": "experience", "index": 2, "field": "company", "reason": "Worked at Twitch"} means highlight the company field of the 3rd experience entry
-
-Return ONLY the JSON, nothing else. THE "score" FIELD IS MANDATORY FOR EVERY MATCH.
-
-Example format:
-{
-  "summary": "Found 2 people with connection to Palantir (1 perfect match, 1 good match)",
-  "matches": [
-    {
-      "id": "123",
-      "score": 98,
-      "relevance": "Perfect match: Currently employed at Palantir Technologies as Tech Lead",
-      "highlights": [
-        {
-          "section": "experience",
-          "index": 0,
-          "field": "title",
-          "reason": "Currently works at Palantir as Tech Lead",
-          "weight": "high"
-        },
-        {
-          "section": "headline",
-          "reason": "Headline mentions Palantir",
-          "weight": "high"
-        }
-      ]
-    },
-    {
-      "id": "456",
-      "score": 88,
-      "relevance": "Exceptional match: Previously worked at Palantir as Software Engineer for 2 years",
-      "highlights": [
-        {
-          "section": "experience",
-          "index": 1,
-          "field": "company",
-          "reason": "Past employment at Palantir",
-          "weight": "high"
-        }
-      ]
-    }
-  ]
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _lib.cascade import COARSE_MODEL_IDS, DEFAULT_CASCADE_K, select_candidates
+from _lib.coalesce import flight_key, join_flight, normalize_query
+from _lib.compact import DEFAULT_REASON_TOP_N, expand_compact_result
+from _lib.encoding import compress, read_body
+from _lib.entities import get_entities
+from _lib.facets import FACETS, FacetIndex
+from _lib.fast import rank_lexical
+from _lib.lexical import LexicalIndex
+from _lib.metrics import Timings, record_usage
+from _lib.prompts import get_base_prompt, score_reminder, system_instruction
+from _lib.providers import ANTHROPIC_BASE_URL, GEMINI_BASE_URL, OPENAI_BASE_URL
+from _lib.resilience import MIN_GENERATION_SECONDS, CircuitOpenError, Deadline, is_timeout, urlopen
+from _lib.serialize import dumps, loads, search_response, strip_code_fence
+from _lib.tokens import plan_prompt
+
+# Gemini models /api/search accepts, and the API model each one calls
+GEMINI_MODEL_IDS = {
+    'gemini-3-flash': 'gemini-3-flash-preview',
+    'gemini-3-pro': 'gemini-3-pro-preview'
 }
 
-CRITICAL SCORING REMINDER:
-- If someone CURRENTLY works at a company being searched = score 95-100 (PERFECT MATCH)
-- If someone PREVIOUSLY worked at a company being searched = score 85-94 (EXCEPTIONAL MATCH)
-- DO NOT give scores below 95 for current employees of companies being explicitly searched for"""
-
-def call_anthropic_api(api_key, search_query, attendees_data):
+def call_anthropic_api(api_key, search_query, attendees_data, compact=False, reason_top_n=DEFAULT_REASON_TOP_N, deadline=None):
     """Call Anthropic API with prompt caching"""
-    base_prompt = get_base_prompt()
+    base_prompt = get_base_prompt(compact, reason_top_n)
 
     req_data = {
         'model': 'claude-sonnet-4-20250514',
@@ -139,7 +40,7 @@ def call_anthropic_api(api_key, search_query, attendees_data):
         'temperature': 0.5,
         'system': [{
             'type': 'text',
-            'text': 'You are a precise JSON generator. You MUST include a "score" field (integer 0-100) for every match object. This field is absolutely mandatory and cannot be omitted under any circumstances.',
+            'text': system_instruction(compact),
             'cache_control': {'type': 'ephemeral'}
         }],
         'messages': [{
@@ -147,7 +48,7 @@ def call_anthropic_api(api_key, search_query, attendees_data):
             'content': [
                 {
                     'type': 'text',
-                    'text': f"""*** CRITICAL: Every match object MUST include a "score" field (integer 0-100). DO NOT OMIT THIS FIELD. ***
+                    'text': f"""{score_reminder(compact)}
 
 Attendee database:
 {attendees_data}
@@ -164,7 +65,7 @@ Attendee database:
     }
 
     req = urllib.request.Request(
-        'https://api.anthropic.com/v1/messages',
+        f'{ANTHROPIC_BASE_URL}/v1/messages',
         data=json.dumps(req_data).encode('utf-8'),
         headers={
             'Content-Type': 'application/json',
@@ -173,28 +74,28 @@ Attendee database:
         }
     )
 
-    return urllib.request.urlopen(req, timeout=55)
+    return urlopen(req, timeout=55, deadline=deadline)
 
-def call_gemini_api(api_key, search_query, attendees_data, model_id):
+def call_gemini_api(api_key, search_query, attendees_data, model_id, compact=False, reason_top_n=DEFAULT_REASON_TOP_N, deadline=None):
     """Call Google Gemini API
 
     Note: Gemini's automatic caching works when the same prompt prefix is used.
     Google caches content automatically when it detects repeated patterns.
     The cache duration is 5 minutes for free tier, up to 1 hour for paid.
     """
-    base_prompt = get_base_prompt()
+    base_prompt = get_base_prompt(compact, reason_top_n)
 
-    url = f'https://generativelanguage.googleapis.com/v1beta/models/{model_id}:generateContent?key={api_key}'
+    url = f'{GEMINI_BASE_URL}/v1beta/models/{model_id}:generateContent?key={api_key}'
 
     req_data = {
         'systemInstruction': {
             'parts': [{
-                'text': 'You are a precise JSON generator. You MUST include a "score" field (integer 0-100) for every match object. This field is absolutely mandatory and cannot be omitted under any circumstances.'
+                'text': system_instruction(compact)
             }]
         },
         'contents': [{
             'parts': [{
-                'text': f"""*** CRITICAL: Every match object MUST include a "score" field (integer 0-100). DO NOT OMIT THIS FIELD. ***
+                'text': f"""{score_reminder(compact)}
 
 Attendee database:
 {attendees_data}
@@ -218,9 +119,9 @@ Search query: "{search_query}"
         headers={'Content-Type': 'application/json'}
     )
 
-    return urllib.request.urlopen(req, timeout=55)
+    return urlopen(req, timeout=55, deadline=deadline)
 
-def call_openai_api(api_key, search_query, attendees_data, model_id):
+def call_openai_api(api_key, search_query, attendees_data, model_id, deadline=None):
     """Call OpenAI API with prompt caching
 
     OpenAI's prompt caching automatically caches the system message and
@@ -254,7 +155,7 @@ Search query: "{search_query}"
     }
 
     req = urllib.request.Request(
-        'https://api.openai.com/v1/chat/completions',
+        f'{OPENAI_BASE_URL}/v1/chat/completions',
         data=json.dumps(req_data).encode('utf-8'),
         headers={
             'Content-Type': 'application/json',
@@ -262,10 +163,57 @@ Search query: "{search_query}"
         }
     )
 
-    return urllib.request.urlopen(req, timeout=55)
+    return urlopen(req, timeout=55, deadline=deadline)
+
+def score_attendees(model, api_key, search_query, attendees_data, compact, reason_top_n, deadline):
+    """One scoring call; returns (provider response, seconds to the response headers)"""
+    started = time.perf_counter()
+    if model == 'claude-sonnet':
+        response = call_anthropic_api(api_key, search_query, attendees_data, compact, reason_top_n, deadline=deadline)
+    else:  # A GEMINI_MODEL_IDS key; the handler rejects other models
+        response = call_gemini_api(api_key, search_query, attendees_data, GEMINI_MODEL_IDS[model], compact, reason_top_n, deadline=deadline)
+    ttfb = time.perf_counter() - started
+    result = loads(response.read())
+    record_usage('anthropic' if model == 'claude-sonnet' else 'gemini', model, result)
+    return result, ttfb
+
+def merge_results(results):
+    """Combine the (result, usage) pairs of a sharded search, best matches first"""
+    matches = []
+    usage = {}
+    for result, result_usage in results:
+        matches.extend(result.get('matches', []))
+
+        for key, value in (result_usage or {}).items():
+            if isinstance(value, (int, float)):
+                usage[key] = usage.get(key, 0) + value
+
+    matches.sort(key=lambda m: m.get('score', 0), reverse=True)
+    return {
+        'summary': f'Found {len(matches)} matches (searched in {len(results)} batches)',
+        'matches': matches
+    }, usage
+
+def load_attendees(attendees_data):
+    """Decode the attendee payload, which the frontend sends as a JSON string"""
+    if isinstance(attendees_data, str):
+        try:
+            return loads(attendees_data)
+        except ValueError:
+            return []
+    return attendees_data or []
+
+def parse_anthropic_response(response_json):
+    """Parse Anthropic API response into (result, usage)"""
+    try:
+        # With extended thinking the text block is not necessarily the first
+        text = next(block['text'] for block in response_json['content'] if block.get('type') == 'text')
+        return loads(strip_code_fence(text)), response_json.get('usage', {})
+    except Exception as e:
+        raise Exception(f"Failed to parse Anthropic response: {str(e)}")
 
 def parse_gemini_response(response_json):
-    """Parse Gemini API response to match Anthropic format"""
+    """Parse Gemini API response into (result, usage)"""
     try:
         # Check if we have candidates at all
         if 'candidates' not in response_json or len(response_json['candidates']) == 0:
@@ -302,19 +250,12 @@ def parse_gemini_response(response_json):
             raise Exception(f"Gemini returned an error message instead of JSON: {text[:200]}...")
 
         # Remove markdown code blocks if present
-        text = text.strip()
-        if text.startswith('```json'):
-            text = text[7:]
-        if text.startswith('```'):
-            text = text[3:]
-        if text.endswith('```'):
-            text = text[:-3]
-        text = text.strip()
+        text = strip_code_fence(text)
 
         # Try to parse JSON, with fallback repairs for common issues
         try:
-            result_json = json.loads(text)
-        except json.JSONDecodeError as parse_error:
+            result_json = loads(text)
+        except ValueError as parse_error:
             # Try to fix common JSON issues from LLM responses
             import re
 
@@ -336,57 +277,44 @@ def parse_gemini_response(response_json):
                 else:
                     raise parse_error
 
-        # Return in Anthropic format
-        return {
-            'content': [{
-                'type': 'text',
-                'text': json.dumps(result_json)
-            }],
-            'usage': response_json.get('usageMetadata', {})
-        }
+        return result_json, response_json.get('usageMetadata', {})
     except Exception as e:
         raise Exception(f"Failed to parse Gemini response: {str(e)}")
 
 def parse_openai_response(response_json):
-    """Parse OpenAI API response to match Anthropic format"""
+    """Parse OpenAI API response into (result, usage)"""
     try:
         text = response_json['choices'][0]['message']['content']
-
-        # Remove markdown code blocks if present
-        text = text.strip()
-        if text.startswith('```json'):
-            text = text[7:]
-        if text.startswith('```'):
-            text = text[3:]
-        if text.endswith('```'):
-            text = text[:-3]
-        text = text.strip()
-
-        result_json = json.loads(text)
-
-        # Return in Anthropic format
-        return {
-            'content': [{
-                'type': 'text',
-                'text': json.dumps(result_json)
-            }],
-            'usage': response_json.get('usage', {})
-        }
+        return loads(strip_code_fence(text)), response_json.get('usage', {})
     except Exception as e:
         raise Exception(f"Failed to parse OpenAI response: {str(e)}")
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         """Handle POST requests for AI search"""
+        self.timings = Timings('search')
+        self.flight = None
+        # Everything, provider retries included, must finish within maxDuration
+        deadline = Deadline()
         try:
             # Read request body
-            content_length = int(self.headers['Content-Length'])
-            body = self.rfile.read(content_length)
-            data = json.loads(body.decode('utf-8'))
+            with self.timings.span('parse'):
+                data = loads(read_body(self))
 
             search_query = data.get('query')
             attendees_data = data.get('attendees')
             model = data.get('model', 'gemini-3-flash')  # Default to Gemini 3 Flash
+            compact = data.get('compact', True)  # Short-key output schema, expanded below
+            reason_top_n = int(data.get('reason_top_n', DEFAULT_REASON_TOP_N))
+            structured = data.get('structured', False)  # Result as an object, not JSON text
+
+            # Cascade: a cheap coarse pass picks cascade_k candidates for the chosen model
+            cascade = data.get('cascade', False)
+            cascade_k = int(data.get('cascade_k', DEFAULT_CASCADE_K))
+            coarse_model = data.get('coarse_model', 'gemini-3-flash')  # gemini-3-flash, gemini-flash, or lexical
+
+            # Facet pre-filter, e.g. {"school": "UPenn", "location": ["NY", "PA"]}
+            filters = data.get('filters')
 
             # Get API keys from environment variables
             google_api_key = os.environ.get('GOOGLE_API_KEY', '')
@@ -402,7 +330,7 @@ class handler(BaseHTTPRequestHandler):
                     self.send_error_response({'error': 'Anthropic API key not configured on server'}, 500)
                     return
                 api_key = anthropic_api_key
-            elif model.startswith('gemini'):
+            elif model in GEMINI_MODEL_IDS:
                 if not google_api_key:
                     self.send_error_response({'error': 'Google API key not configured on server'}, 500)
                     return
@@ -411,24 +339,135 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error_response({'error': f'Invalid model: {model}'}, 400)
                 return
 
-            # Call the appropriate API based on model
-            if model == 'claude-sonnet':
-                response = call_anthropic_api(api_key, search_query, attendees_data)
-            elif model == 'gemini-3-pro':
-                response = call_gemini_api(api_key, search_query, attendees_data, 'gemini-3-pro-preview')
-            elif model == 'gemini-3-flash':
-                response = call_gemini_api(api_key, search_query, attendees_data, 'gemini-3-flash-preview')
+            # Identical searches over the same attendees already running: wait for
+            # their answer instead of repeating the work
+            options = {k: v for k, v in data.items() if k not in ('query', 'model')}
+            flight = join_flight(flight_key('search', normalize_query(search_query), model, options), 'search')
+            if flight.leader:
+                self.flight = flight
             else:
-                self.send_error_response({'error': f'Invalid model: {model}'}, 400)
+                with self.timings.span('coalesced'):
+                    shared = flight.wait(deadline.remaining())
+                if shared is not None:
+                    self.send_json_response(*shared)
+                    return
+
+            attendees = None
+            filter_info = None
+            if filters:
+                if not isinstance(filters, dict) or any(facet not in FACETS for facet in filters):
+                    self.send_error_response({'error': f'Invalid filters: facets are {", ".join(FACETS)}'}, 400)
+                    return
+
+                with self.timings.span('filter'):
+                    loaded = load_attendees(attendees_data)
+                    allowed = FacetIndex.from_attendees(loaded, get_entities()).filter_ids(filters)
+                    attendees = [a for a in loaded if str(a.get('id')) in allowed]
+                filter_info = {'filters': filters, 'total': len(loaded), 'matched': len(attendees)}
+                if not attendees:
+                    self.send_json_response(search_response(
+                        {'summary': 'No attendees match the selected filters.', 'matches': []}, structured, filter=filter_info
+                    ), 200)
+                    return
+                attendees_data = json.dumps(attendees, indent=2)
+
+            cascade_info = None
+            if cascade:
+                if coarse_model != 'lexical' and coarse_model not in COARSE_MODEL_IDS:
+                    self.send_error_response({'error': f'Invalid coarse model: {coarse_model}'}, 400)
+                    return
+                if coarse_model != 'lexical' and not google_api_key:
+                    self.send_error_response({'error': 'Google API key not configured on server'}, 500)
+                    return
+
+                with self.timings.span('cascade'):
+                    attendees, cascade_info = select_candidates(
+                        search_query, attendees if attendees is not None else load_attendees(attendees_data),
+                        cascade_k, coarse_model, google_api_key, deadline
+                    )
+                if not attendees:
+                    self.send_json_response(search_response(
+                        {'summary': 'No matching attendees found for your query.', 'matches': []}, structured, cascade=cascade_info
+                    ), 200)
+                    return
+                attendees_data = json.dumps(attendees, indent=2)
+
+            # Known company/school facts, so the model reads them instead of inferring
+            with self.timings.span('prompt'):
+                entities = get_entities()
+                if len(entities):
+                    attendees = entities.attach(attendees if attendees is not None else load_attendees(attendees_data))
+                    attendees_data = json.dumps(attendees, indent=2)
+
+            # Estimate tokens, and split the attendees into several calls if one
+            # would overflow the model's context or output limit
+            with self.timings.span('budget'):
+                if attendees is None:
+                    attendees = load_attendees(attendees_data)
+                instructions = get_base_prompt(compact, reason_top_n) + search_query
+                shards, token_estimate = plan_prompt(model, instructions, attendees, compact, reason_top_n)
+                if token_estimate.get('dropped'):
+                    # Too many even for the most calls allowed: keep the
+                    # attendees that best match the query's keywords
+                    order = {str(i): rank for rank, (i, _) in enumerate(LexicalIndex(attendees).search(search_query))}
+                    attendees = sorted(attendees, key=lambda a: order.get(str(a.get('id')), len(order)))
+                    shards, token_estimate = plan_prompt(model, instructions, attendees, compact, reason_top_n)
+                    attendees = [a for shard in shards for a in shard]
+
+            # Call the appropriate API based on model, if the coarse stage left
+            # enough time; otherwise (or if the call times out) rank by keywords
+            degraded = None if deadline.allows(MIN_GENERATION_SECONDS) else 'AI review skipped: out of time'
+            if not degraded:
+                try:
+                    started = time.perf_counter()
+                    if len(shards) == 1:
+                        result, ttfb = score_attendees(model, api_key, search_query, attendees_data, compact, reason_top_n, deadline)
+                        results = [result]
+                    else:
+                        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+                            scored = list(pool.map(
+                                lambda shard: score_attendees(model, api_key, search_query, json.dumps(shard, indent=2), compact, reason_top_n, deadline),
+                                shards
+                            ))
+                        results = [r for r, _ in scored]
+                        ttfb = min(t for _, t in scored)
+                    self.timings.add('llm_ttfb', ttfb)
+                    self.timings.add('llm', time.perf_counter() - started)
+                except Exception as e:
+                    if not is_timeout(e):
+                        raise
+                    degraded = 'AI review timed out'
+
+            if degraded:
+                result = rank_lexical(search_query, attendees)
+                result['summary'] = f"{result['summary']}. {degraded}"
+                response = search_response(result, structured, tier='retrieval', degraded=degraded)
+                if cascade_info:
+                    response['cascade'] = cascade_info
+                if filter_info:
+                    response['filter'] = filter_info
+                self.send_json_response(response, 200)
                 return
 
-            result = json.loads(response.read().decode('utf-8'))
+            with self.timings.span('parse_response'):
+                parsed = []
+                for result, shard in zip(results, shards):
+                    # Parse response based on provider
+                    result, usage = parse_gemini_response(result) if model.startswith('gemini') else parse_anthropic_response(result)
 
-            # Parse response based on provider
-            if model.startswith('gemini'):
-                result = parse_gemini_response(result)
+                    # Expand compact output back into the shape the frontend expects
+                    if compact:
+                        result = expand_compact_result(result, shard)
+                    parsed.append((result, usage))
+                result, usage = parsed[0] if len(parsed) == 1 else merge_results(parsed)
 
-            self.send_json_response(result, 200)
+            response = search_response(result, structured, usage=usage, tokens=token_estimate)
+            if cascade_info:
+                response['cascade'] = cascade_info
+            if filter_info:
+                response['filter'] = filter_info
+
+            self.send_json_response(response, 200)
 
         except urllib.error.HTTPError as e:
             error_body = e.read().decode('utf-8')
@@ -462,19 +501,38 @@ class handler(BaseHTTPRequestHandler):
                     'details': error_body
                 }, e.code)
 
+        except CircuitOpenError as e:
+            self.send_error_response({'error': 'AI provider unavailable', 'details': str(e)}, 503)
+
         except Exception as e:
+            if is_timeout(e):
+                self.send_error_response({'error': 'Search timed out', 'details': str(e)}, 504)
+                return
             self.send_error_response({'error': str(e)}, 500)
 
+        finally:
+            if self.flight:
+                self.flight.finish()
+
     def send_json_response(self, data, status_code):
+        """Send JSON response with CORS and Server-Timing headers"""
+        if self.flight and status_code == 200:
+            self.flight.publish(data, status_code)
+        with self.timings.span('serialize'):
+            body = dumps(data)
+        with self.timings.span('compress'):
+            body, encoding = compress(body, self.headers.get('Accept-Encoding'))
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept-Encoding')
         self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Server-Timing', self.timings.header())
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+        self.wfile.write(body)
+        self.timings.finish(status_code)
 
     def send_error_response(self, error_data, status_code):
-        self.send_response(status_code)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(error_data).encode('utf-8'))
+        """Send error response"""
+        self.send_json_response(error_data, status_code)
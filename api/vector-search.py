@@ -1,47 +1,88 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
+import sys
+import threading
+import time
+import urllib.parse
 import urllib.request
 import urllib.error
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _lib.chunks import CHUNKS_ENABLED, matched_sections, search_chunks
+from _lib.coalesce import flight_key, join_flight, normalize_query
+from _lib.compact import DEFAULT_REASON_TOP_N, expand_compact_result
+from _lib.embeddings import cosine_similarity, embed_query, requires_google_key
+from _lib.encoding import compress, read_body
+from _lib.entities import get_entities
+from _lib.facets import FACETS, current_facets
+from _lib.fast import FAST_RESULT_COUNT, chunk_scores, rank_fast, score_sections
+from _lib.metrics import REGISTRY, Timings, record_usage
+from _lib.projection import SUPABASE_PROJECTION, search_projected
+from _lib.prompts import get_base_prompt, score_reminder, system_instruction
+from _lib.providers import ANTHROPIC_BASE_URL, GEMINI_BASE_URL
+from _lib.query_cache import SEMANTIC_CACHE_THRESHOLD, get_query_cache
+from _lib.records import row_record
+from _lib.resilience import MIN_GENERATION_SECONDS, CircuitOpenError, Deadline, is_timeout, urlopen
+from _lib.selection import DEFAULT_MIN_CANDIDATES, select_candidates
+from _lib.serialize import dumps, loads, search_response, strip_code_fence
+from _lib.shared import dataset_version as shared_dataset_version
+from _lib.sync_state import get_sync_state
+from _lib.tokens import plan_prompt
+from _lib.vector_store import LOCAL_BACKENDS, QUANTIZED_RESCORE_FACTOR, VECTOR_BACKEND, get_store
+from _lib.warmup import record_query
+
 # Supabase configuration
 SUPABASE_URL = os.environ.get('SUPABASE_URL', '')
 SUPABASE_KEY = os.environ.get('SUPABASE_SERVICE_KEY', '')
 
-def get_embedding(text, api_key):
-    """Generate embedding using Gemini text-embedding-004 model"""
-    url = f'https://generativelanguage.googleapis.com/v1beta/models/text-embedding-004:embedContent?key={api_key}'
+# Facet-filtered searches score up to this many attendees directly; larger
+# filtered sets go through the normal vector search and are filtered after
+PREFILTER_FETCH_LIMIT = 500
+
+# Lowest similarity a candidate needs to reach the AI; requests can override
+MATCH_THRESHOLD = 0.2
+
+def search_supabase(query_embedding, match_count=50, match_threshold=0.3, deadline=None):
+    """Search Supabase for similar attendees using vector similarity
+
+    Using a low threshold (0.3) to cast a wide net - the AI will do the real filtering.
+    Fetching up to 50 candidates to ensure we don't miss relevant matches.
+    """
+    url = f'{SUPABASE_URL}/rest/v1/rpc/match_attendees'
 
     req_data = {
-        'model': 'models/text-embedding-004',
-        'content': {
-            'parts': [{'text': text}]
-        }
+        'query_embedding': query_embedding,
+        'match_threshold': match_threshold,
+        'match_count': match_count
     }
 
     req = urllib.request.Request(
         url,
         data=json.dumps(req_data).encode('utf-8'),
-        headers={'Content-Type': 'application/json'}
+        headers={
+            'Content-Type': 'application/json',
+            'apikey': SUPABASE_KEY,
+            'Authorization': f'Bearer {SUPABASE_KEY}'
+        }
     )
 
-    response = urllib.request.urlopen(req, timeout=30)
-    result = json.loads(response.read().decode('utf-8'))
+    response = urlopen(req, timeout=30, deadline=deadline)
+    return loads(response.read())
 
-    return result['embedding']['values']
+def search_supabase_binary(query_embedding, match_count=50, match_threshold=0.3, deadline=None):
+    """Search with the binary-quantized index (supabase/binary-quantized-search.sql)
 
-def search_supabase(query_embedding, match_count=50, match_threshold=0.3):
-    """Search Supabase for similar attendees using vector similarity
-
-    Using a low threshold (0.3) to cast a wide net - the AI will do the real filtering.
-    Fetching up to 50 candidates to ensure we don't miss relevant matches.
+    Returns rows in the same shape as search_supabase().
     """
-    url = f'{SUPABASE_URL}/rest/v1/rpc/match_attendees'
+    url = f'{SUPABASE_URL}/rest/v1/rpc/match_attendees_binary'
 
     req_data = {
         'query_embedding': query_embedding,
         'match_threshold': match_threshold,
-        'match_count': match_count
+        'match_count': match_count,
+        'rescore_factor': QUANTIZED_RESCORE_FACTOR
     }
 
     req = urllib.request.Request(
@@ -54,173 +95,50 @@ def search_supabase(query_embedding, match_count=50, match_threshold=0.3):
         }
     )
 
-    response = urllib.request.urlopen(req, timeout=30)
-    return json.loads(response.read().decode('utf-8'))
-
-def get_base_prompt():
-    """Returns the base prompt text - same as search.py for consistency"""
-    return """SCORING RULES (score field is REQUIRED):
-Assign scores based on how well they satisfy the search criteria:
-- 95-100: Perfect match - directly and explicitly meets the search criteria (e.g., currently works at the company being searched for)
-- 85-94: Exceptional match - meets all or nearly all criteria with strong, direct evidence
-- 75-84: Strong match - meets most criteria with good evidence
-- 60-74: Good match - meets several criteria or partially meets many criteria
-- 40-59: Moderate match - meets some criteria or weakly meets several criteria
-- 20-39: Weak match - barely meets criteria or only tangentially related
-- 0-19: Very weak match - minimal relevance
-
-SCORING EXAMPLES:
-- Searching for "connection to Company X" + person currently works at Company X = 95-100
-- Searching for "connection to Company X" + person previously worked at Company X = 85-94
-- Searching for "experience in field Y" + person has 3+ years direct experience = 90-100
-- Searching for "experience in field Y" + person has 1 year direct experience = 75-85
-
-MATCHING GUIDELINES:
-- Direct matches: The search term appears explicitly in the text (e.g., searching "Boston" and finding "Boston University")
-- Inferred matches: Requires factual knowledge (e.g., searching "Maine" and finding "Berwick Academy" which is actually located in Maine)
-- For INFERRED matches, you MUST be certain of the connection - do NOT guess or make assumptions
-- For INFERRED matches, always provide the factual context in the reason field
-- Partial matches: The profile satisfies some but not all of the search parameters
-
-SCORING CRITERIA:
-- Weight matches based on relevance and directness
-- Consider the strength of evidence for each criterion
-- Account for multiple parameters in complex queries
-- Penalize profiles that only weakly satisfy criteria
-- Reward profiles that exceed expectations
-
-CRITICAL RULES FOR HIGHLIGHTS:
-- ONLY highlight experiences/sections that DIRECTLY relate to the search query
-- If searching for "investing experience", ONLY highlight roles explicitly involving investing (e.g., "Investor", "Investment Analyst")
-- Do NOT highlight "Co-Founder" just because the person is an investor elsewhere
-- If searching for a location like "Maine or New Hampshire":
-  * ONLY highlight schools/companies actually located in those states
-  * Do NOT highlight schools just because they're in the same region (e.g., Boston University is NOT in Maine/New Hampshire)
-  * You MUST know the actual location - if uncertain, do NOT highlight it
-- If searching for "connection to Company X" or "experience at Company X":
-  * ONLY highlight experiences at Company X itself
-  * Do NOT highlight other companies, even if they're in the same industry
-  * Do NOT highlight unrelated experiences just because the person worked at Company X elsewhere
-  * Example: If searching for "Twitch experience", only highlight the Twitch role, NOT MongoDB roles
-- If searching for "experience with Technology Y":
-  * ONLY highlight experiences explicitly involving Technology Y
-  * Do NOT highlight unrelated roles at companies that use Technology Y
-- Be PRECISE and CONSERVATIVE with highlights - when in doubt, don't highlight it
-- Be rigorous with scoring - don't inflate scores without strong justification
-
-Return a JSON object with this EXACT structure:
-{
-  "summary": "string",
-  "matches": [
-    {
-      "id": number,
-      "score": number (REQUIRED - 0 to 100),
-      "relevance": "string",
-      "highlights": [
-        {
-          "section": "string (experience/education/skills/languages/headline/organizations/volunteering/projects/awards/interests)",
-          "index": number (the array index of the item to highlight, e.g., 0 for first experience, 2 for third education),
-          "field": "string (optional - which specific field: title/company/school/degree/name/role/organization)",
-          "reason": "string (why this specific item matches)",
-          "weight": "low/medium/high"
-        }
-      ]
-    }
-  ]
-}
-
-CRITICAL: For highlights with section="experience", "education", "organizations", "volunteering", "projects", or "awards":
-- You MUST provide the "index" field specifying which array item (0-indexed)
-- You MUST provide the "field" to specify what to highlight (e.g., "title", "company", "school", "role", "name", "description")
-- Do NOT use vague text matching - be explicit about the exact array index
-- Example: {"section": "experience", "index": 2, "field": "company", "reason": "Worked at Twitch"} means highlight the company field of the 3rd experience entry
-
-Return ONLY the JSON, nothing else. THE "score" FIELD IS MANDATORY FOR EVERY MATCH.
-
-Example format:
-{
-  "summary": "Found 2 people with connection to Palantir (1 perfect match, 1 good match)",
-  "matches": [
-    {
-      "id": "123",
-      "score": 98,
-      "relevance": "Perfect match: Currently employed at Palantir Technologies as Tech Lead",
-      "highlights": [
-        {
-          "section": "experience",
-          "index": 0,
-          "field": "title",
-          "reason": "Currently works at Palantir as Tech Lead",
-          "weight": "high"
-        },
-        {
-          "section": "headline",
-          "reason": "Headline mentions Palantir",
-          "weight": "high"
-        }
-      ]
-    },
-    {
-      "id": "456",
-      "score": 88,
-      "relevance": "Exceptional match: Previously worked at Palantir as Software Engineer for 2 years",
-      "highlights": [
-        {
-          "section": "experience",
-          "index": 1,
-          "field": "company",
-          "reason": "Past employment at Palantir",
-          "weight": "high"
-        }
-      ]
-    }
-  ]
-}
+    response = urlopen(req, timeout=30, deadline=deadline)
+    rows = []
+    for r in loads(response.read()):
+        row = dict(r.get('attendee') or {})
+        row['similarity'] = r.get('similarity')
+        rows.append(row)
+    return rows
 
-CRITICAL SCORING REMINDER:
-- If someone CURRENTLY works at a company being searched = score 95-100 (PERFECT MATCH)
-- If someone PREVIOUSLY worked at a company being searched = score 85-94 (EXCEPTIONAL MATCH)
-- DO NOT give scores below 95 for current employees of companies being explicitly searched for"""
+def search_supabase_ids(query_embedding, attendee_ids, match_count=50, match_threshold=0.3, deadline=None):
+    """Score just the given attendees against the query, in the shape of search_supabase()"""
+    id_list = ','.join(f'"{i}"' for i in attendee_ids)
+    url = f'{SUPABASE_URL}/rest/v1/attendees?id=in.({urllib.parse.quote(id_list)})'
 
-def format_attendees_for_ai(attendees):
-    """Format Supabase attendees data for AI consumption"""
-    formatted = []
-    for a in attendees:
-        profile = {
-            'id': a.get('id'),
-            'name': a.get('name'),
-            'headline': a.get('headline'),
-            'location': a.get('location'),
-            'school': a.get('school'),
-            'url': a.get('url'),
-            'image': a.get('image'),
-            'about': a.get('about'),
+    req = urllib.request.Request(
+        url,
+        headers={
+            'apikey': SUPABASE_KEY,
+            'Authorization': f'Bearer {SUPABASE_KEY}'
         }
+    )
 
-        # Parse JSON fields
-        for field in ['experience', 'education', 'organizations', 'volunteering', 'projects', 'awards']:
-            val = a.get(field)
-            if val:
-                if isinstance(val, str):
-                    try:
-                        profile[field] = json.loads(val)
-                    except:
-                        profile[field] = val
-                else:
-                    profile[field] = val
-
-        # Array fields
-        for field in ['skills', 'languages', 'interests']:
-            if a.get(field):
-                profile[field] = a.get(field)
-
-        formatted.append(profile)
+    response = urlopen(req, timeout=30, deadline=deadline)
+    rows = []
+    for row in loads(response.read()):
+        embedding = row.pop('embedding', None)
+        if isinstance(embedding, str):
+            embedding = loads(embedding)
+        if not embedding:
+            continue
+        row['similarity'] = cosine_similarity(query_embedding, embedding)
+        if row['similarity'] > match_threshold:
+            rows.append(row)
+
+    rows.sort(key=lambda r: r['similarity'], reverse=True)
+    return rows[:match_count]
 
-    return formatted
+def format_attendees_for_ai(attendees):
+    """Format retrieved attendee rows for AI consumption"""
+    # Chunk retrieval says which entries matched best - a hint for highlight indexes
+    return [row_record(a).to_prompt(matched_sections(a) if a.get('chunks') else None) for a in attendees]
 
-def call_gemini_api(api_key, search_query, attendees_data, model='gemini-flash'):
+def call_gemini_api(api_key, search_query, attendees_data, model='gemini-flash', compact=False, reason_top_n=DEFAULT_REASON_TOP_N, deadline=None):
     """Call Gemini API with the pre-filtered attendees from vector search"""
-    base_prompt = get_base_prompt()
+    base_prompt = get_base_prompt(compact, reason_top_n)
 
     # Map model names to Gemini model IDs
     model_map = {
@@ -229,19 +147,19 @@ def call_gemini_api(api_key, search_query, attendees_data, model='gemini-flash')
     }
     model_id = model_map.get(model, 'gemini-2.0-flash')
 
-    url = f'https://generativelanguage.googleapis.com/v1beta/models/{model_id}:generateContent?key={api_key}'
+    url = f'{GEMINI_BASE_URL}/v1beta/models/{model_id}:generateContent?key={api_key}'
 
     req_data = {
         'systemInstruction': {
             'parts': [{
-                'text': 'You are a precise JSON generator. You MUST include a "score" field (integer 0-100) for every match object. This field is absolutely mandatory and cannot be omitted under any circumstances.'
+                'text': system_instruction(compact)
             }]
         },
         'contents': [{
             'parts': [{
-                'text': f"""*** CRITICAL: Every match object MUST include a "score" field (integer 0-100). DO NOT OMIT THIS FIELD. ***
+                'text': f"""{score_reminder(compact)}
 
-These attendees were pre-filtered by vector similarity search. Analyze them carefully for the search query.
+These attendees were pre-filtered by vector similarity search. Analyze them carefully for the search query. Where present, "matched_sections" lists the profile entries closest to the query by embedding similarity - a hint, not a verdict.
 
 Attendee database:
 {json.dumps(attendees_data, indent=2)}
@@ -265,11 +183,11 @@ Search query: "{search_query}"
         headers={'Content-Type': 'application/json'}
     )
 
-    return urllib.request.urlopen(req, timeout=55)
+    return urlopen(req, timeout=55, deadline=deadline)
 
-def call_anthropic_api(api_key, search_query, attendees_data):
+def call_anthropic_api(api_key, search_query, attendees_data, compact=False, reason_top_n=DEFAULT_REASON_TOP_N, deadline=None):
     """Call Anthropic Claude API with the pre-filtered attendees"""
-    base_prompt = get_base_prompt()
+    base_prompt = get_base_prompt(compact, reason_top_n)
 
     req_data = {
         'model': 'claude-sonnet-4-20250514',
@@ -277,15 +195,15 @@ def call_anthropic_api(api_key, search_query, attendees_data):
         'temperature': 0.5,
         'system': [{
             'type': 'text',
-            'text': 'You are a precise JSON generator. You MUST include a "score" field (integer 0-100) for every match object. This field is absolutely mandatory and cannot be omitted under any circumstances.'
+            'text': system_instruction(compact)
         }],
         'messages': [{
             'role': 'user',
             'content': [{
                 'type': 'text',
-                'text': f"""*** CRITICAL: Every match object MUST include a "score" field (integer 0-100). DO NOT OMIT THIS FIELD. ***
+                'text': f"""{score_reminder(compact)}
 
-These attendees were pre-filtered by vector similarity search. Analyze them carefully for the search query.
+These attendees were pre-filtered by vector similarity search. Analyze them carefully for the search query. Where present, "matched_sections" lists the profile entries closest to the query by embedding similarity - a hint, not a verdict.
 
 Attendee database:
 {json.dumps(attendees_data, indent=2)}
@@ -299,7 +217,7 @@ Search query: "{search_query}"
     }
 
     req = urllib.request.Request(
-        'https://api.anthropic.com/v1/messages',
+        f'{ANTHROPIC_BASE_URL}/v1/messages',
         data=json.dumps(req_data).encode('utf-8'),
         headers={
             'Content-Type': 'application/json',
@@ -308,37 +226,18 @@ Search query: "{search_query}"
         }
     )
 
-    return urllib.request.urlopen(req, timeout=55)
+    return urlopen(req, timeout=55, deadline=deadline)
 
 def parse_anthropic_response(response_json):
-    """Parse Anthropic API response"""
+    """Parse Anthropic API response into (result, usage)"""
     try:
         text = response_json['content'][0]['text']
-
-        # Clean markdown
-        text = text.strip()
-        if text.startswith('```json'):
-            text = text[7:]
-        if text.startswith('```'):
-            text = text[3:]
-        if text.endswith('```'):
-            text = text[:-3]
-        text = text.strip()
-
-        result_json = json.loads(text)
-
-        return {
-            'content': [{
-                'type': 'text',
-                'text': json.dumps(result_json)
-            }],
-            'usage': response_json.get('usage', {})
-        }
+        return loads(strip_code_fence(text)), response_json.get('usage', {})
     except Exception as e:
         raise Exception(f"Failed to parse Anthropic response: {str(e)}")
 
 def parse_gemini_response(response_json):
-    """Parse Gemini API response"""
+    """Parse Gemini API response into (result, usage)"""
     try:
         if 'candidates' not in response_json or len(response_json['candidates']) == 0:
             if 'error' in response_json:
@@ -367,41 +266,43 @@ def parse_gemini_response(response_json):
         if text_lower.startswith('an error') or text_lower.startswith('i apologize') or text_lower.startswith('i cannot'):
             raise Exception(f"Gemini returned an error: {text[:200]}...")
 
-        # Clean markdown
-        text = text.strip()
-        if text.startswith('```json'):
-            text = text[7:]
-        if text.startswith('```'):
-            text = text[3:]
-        if text.endswith('```'):
-            text = text[:-3]
-        text = text.strip()
-
-        result_json = json.loads(text)
-
-        return {
-            'content': [{
-                'type': 'text',
-                'text': json.dumps(result_json)
-            }],
-            'usage': response_json.get('usageMetadata', {})
-        }
-    except json.JSONDecodeError as e:
+        return loads(strip_code_fence(text)), response_json.get('usageMetadata', {})
+    except ValueError as e:
         raise Exception(f"Failed to parse JSON: {str(e)}")
     except Exception as e:
         raise Exception(f"Failed to parse Gemini response: {str(e)}")
 
+def retrieval_only(search_query, formatted_attendees, similar_attendees, selection, reason, structured=False):
+    """Fast-tier ranking of the retrieved candidates, for when the AI stage cannot run in time"""
+    candidates = list(zip(formatted_attendees, [a.get('similarity') for a in similar_attendees]))[:FAST_RESULT_COUNT]
+    result = rank_fast(search_query, candidates, chunk_scores(similar_attendees))
+    result['summary'] = f"{result['summary']}. {reason}"
+    return search_response(result, structured, tier='retrieval', degraded=reason, selection=selection)
+
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         """Handle POST requests for vector search"""
+        self.timings = Timings('vector-search')
+        self.flight = None
+        # Everything, provider retries included, must finish within maxDuration
+        deadline = Deadline()
         try:
-            content_length = int(self.headers['Content-Length'])
-            body = self.rfile.read(content_length)
-            data = json.loads(body.decode('utf-8'))
+            with self.timings.span('parse'):
+                data = loads(read_body(self))
 
             search_query = data.get('query')
-            match_count = data.get('match_count', 50)
-            ai_model = data.get('model', 'gemini-flash')  # gemini-flash, gemini-pro, or claude
+            match_count = data.get('match_count', 50)  # Upper bound on candidates sent to the AI
+            match_threshold = float(data.get('match_threshold', MATCH_THRESHOLD))
+            adaptive = data.get('adaptive', True)  # Cut the candidate list at the similarity knee/gap
+            min_candidates = int(data.get('min_candidates', DEFAULT_MIN_CANDIDATES))
+            score_gap = data.get('score_gap')  # Optional absolute similarity gap that ends the list
+            ai_model = data.get('model', 'gemini-flash')  # gemini-flash, gemini-pro, claude, or fast (no AI)
+            fast_count = int(data.get('fast_count', FAST_RESULT_COUNT))
+            compact = data.get('compact', True)  # Short-key output schema, expanded below
+            reason_top_n = int(data.get('reason_top_n', DEFAULT_REASON_TOP_N))
+            filters = data.get('filters')  # Facet pre-filter, e.g. {"school": "UPenn"}
+            structured = data.get('structured', False)  # Result as an object, not JSON text
+            cache_threshold = float(data.get('cache_threshold', SEMANTIC_CACHE_THRESHOLD))  # Above 1 skips the cache
 
             google_api_key = os.environ.get('GOOGLE_API_KEY', '')
             anthropic_api_key = os.environ.get('ANTHROPIC_API_KEY', '')
@@ -410,11 +311,11 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error_response({'error': 'Search query is required'}, 400)
                 return
 
-            if not SUPABASE_URL or not SUPABASE_KEY:
+            if VECTOR_BACKEND not in LOCAL_BACKENDS and (not SUPABASE_URL or not SUPABASE_KEY):
                 self.send_error_response({'error': 'Supabase not configured'}, 500)
                 return
 
-            if not google_api_key:
+            if not google_api_key and (requires_google_key() or ai_model.startswith('gemini')):
                 self.send_error_response({'error': 'Google API key not configured'}, 500)
                 return
 
@@ -422,38 +323,166 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error_response({'error': 'Anthropic API key not configured'}, 500)
                 return
 
+            # Identical searches of the same dataset version already running: wait
+            # for their answer instead of repeating the work
+            normalized_query = normalize_query(search_query)
+            dataset_version = shared_dataset_version(deadline)
+            if dataset_version is None:
+                dataset_version = get_sync_state().version
+            options = {k: v for k, v in data.items() if k not in ('query', 'model', 'warmup')}
+            if not data.get('warmup'):
+                # Only suggestions depend on the log: count the search without
+                # making it wait for the write
+                threading.Thread(target=record_query, args=(search_query,), daemon=True).start()
+
+            flight = join_flight(flight_key('vector-search', normalized_query, ai_model, options, dataset_version), 'vector-search')
+            if flight.leader:
+                self.flight = flight
+            else:
+                with self.timings.span('coalesced'):
+                    shared = flight.wait(deadline.remaining())
+                if shared is not None:
+                    self.send_json_response(*shared)
+                    return
+
+            # Step 0: Facet pre-filter, before any embedding or LLM call
+            allowed_ids = None
+            if filters:
+                if not isinstance(filters, dict) or any(facet not in FACETS for facet in filters):
+                    self.send_error_response({'error': f'Invalid filters: facets are {", ".join(FACETS)}'}, 400)
+                    return
+
+                with self.timings.span('filter'):
+                    allowed_ids = current_facets(get_entities(), deadline).filter_ids(filters)
+                if not allowed_ids:
+                    self.send_json_response(search_response(
+                        {'summary': 'No attendees match the selected filters.', 'matches': []}, structured
+                    ), 200)
+                    return
+
             # Step 1: Generate embedding for the search query
-            query_embedding = get_embedding(search_query, google_api_key)
+            with self.timings.span('embed'):
+                # Reuse the embedding of the same query answered before (a
+                # warm-up search, or the same search with other options)
+                query_embedding = get_query_cache().embedding(normalized_query) or embed_query(search_query, google_api_key, deadline)
+
+            # Step 1b: A query close enough to one already answered for this
+            # dataset version, model and options gets that answer
+            cache_scope = flight_key(ai_model, {k: v for k, v in options.items() if k != 'cache_threshold'})
+            with self.timings.span('cache'):
+                cached = get_query_cache().lookup(cache_scope, normalized_query, query_embedding, dataset_version, cache_threshold)
+            REGISTRY.increment('handenheit_query_cache_total', {'result': 'hit' if cached else 'miss'})
+            if cached is not None:
+                response, cached_query, similarity = cached
+                self.send_json_response(dict(response, cached={
+                    'query': cached_query,
+                    'similarity': round(similarity, 4),
+                    'approximate': cached_query != normalized_query
+                }), 200)
+                return
 
             # Step 2: Search Supabase for similar attendees (wide net with low threshold)
-            similar_attendees = search_supabase(query_embedding, match_count, match_threshold=0.2)
+            with self.timings.span('retrieval'):
+                if VECTOR_BACKEND in LOCAL_BACKENDS:
+                    similar_attendees = get_store().search(
+                        query_embedding, match_count, match_threshold=match_threshold, ef_search=data.get('ef_search'), allowed_ids=allowed_ids
+                    )
+                elif allowed_ids is not None and len(allowed_ids) <= PREFILTER_FETCH_LIMIT:
+                    similar_attendees = search_supabase_ids(query_embedding, sorted(allowed_ids), match_count, match_threshold=match_threshold, deadline=deadline)
+                elif CHUNKS_ENABLED:
+                    similar_attendees = search_chunks(query_embedding, match_count, match_threshold=match_threshold, deadline=deadline)
+                elif VECTOR_BACKEND == 'supabase-binary':
+                    similar_attendees = search_supabase_binary(query_embedding, match_count, match_threshold=match_threshold, deadline=deadline)
+                elif SUPABASE_PROJECTION != 'off':
+                    similar_attendees = search_projected(query_embedding, match_count, match_threshold=match_threshold, deadline=deadline)
+                else:
+                    similar_attendees = search_supabase(query_embedding, match_count, match_threshold=match_threshold, deadline=deadline)
+
+                if allowed_ids is not None:
+                    similar_attendees = [a for a in similar_attendees if str(a.get('id')) in allowed_ids]
 
             if not similar_attendees:
-                self.send_json_response({
-                    'content': [{
-                        'type': 'text',
-                        'text': json.dumps({
-                            'summary': 'No matching attendees found in cloud database. Make sure you have synced your profiles.',
-                            'matches': []
-                        })
-                    }]
-                }, 200)
+                self.send_json_response(search_response({
+                    'summary': 'No matching attendees found in cloud database. Make sure you have synced your profiles.',
+                    'matches': []
+                }, structured), 200)
                 return
 
-            # Step 3: Format attendees for AI
-            formatted_attendees = format_attendees_for_ai(similar_attendees)
+            # Step 3: Keep only the candidates above the knee of the similarity curve
+            selection = None
+            if adaptive:
+                with self.timings.span('select'):
+                    similar_attendees, selection = select_candidates(similar_attendees, min_candidates, match_count, score_gap)
+
+            # Step 4: Format attendees for AI, with known company/school facts attached
+            with self.timings.span('prompt'):
+                formatted_attendees = get_entities().attach(format_attendees_for_ai(similar_attendees))
+
+            # Fast tier: rank from retrieval scores and section embeddings, no LLM call
+            if ai_model == 'fast':
+                with self.timings.span('rank'):
+                    candidates = list(zip(formatted_attendees, [a.get('similarity') for a in similar_attendees]))[:fast_count]
+                    if any(a.get('chunks') for a in similar_attendees):
+                        section_similarities = chunk_scores(similar_attendees)
+                    else:
+                        try:
+                            section_similarities = score_sections([p for p, _ in candidates], query_embedding, google_api_key, deadline)
+                        except Exception as e:
+                            if not is_timeout(e):
+                                raise
+                            # Out of time: rank without section highlights
+                            section_similarities = {}
+                    result = rank_fast(search_query, candidates, section_similarities, fast_count)
+
+                response = search_response(result, structured, tier='fast', selection=selection)
+                get_query_cache().store(cache_scope, normalized_query, query_embedding, dataset_version, response)
+                self.send_json_response(response, 200)
+                return
 
-            # Step 4: Use AI to analyze and score the results
-            if ai_model == 'claude':
-                response = call_anthropic_api(anthropic_api_key, search_query, formatted_attendees)
-                result = json.loads(response.read().decode('utf-8'))
-                parsed = parse_anthropic_response(result)
-            else:
-                response = call_gemini_api(google_api_key, search_query, formatted_attendees, ai_model)
-                result = json.loads(response.read().decode('utf-8'))
-                parsed = parse_gemini_response(result)
+            # Drop the least similar candidates if the prompt would overflow
+            # the model's context or output limit
+            with self.timings.span('budget'):
+                instructions = get_base_prompt(compact, reason_top_n) + search_query
+                shards, token_estimate = plan_prompt(ai_model, instructions, formatted_attendees, compact, reason_top_n, max_shards=1)
+                if token_estimate.get('dropped'):
+                    formatted_attendees = shards[0]
+                    similar_attendees = similar_attendees[:len(formatted_attendees)]
+
+            # Step 5: Use AI to analyze and score the results, if the earlier
+            # stages left enough time; otherwise answer from retrieval alone
+            if not deadline.allows(MIN_GENERATION_SECONDS):
+                self.send_json_response(retrieval_only(search_query, formatted_attendees, similar_attendees, selection, 'AI review skipped: out of time', structured), 200)
+                return
+
+            try:
+                started = time.perf_counter()
+                if ai_model == 'claude':
+                    response = call_anthropic_api(anthropic_api_key, search_query, formatted_attendees, compact, reason_top_n, deadline=deadline)
+                else:
+                    response = call_gemini_api(google_api_key, search_query, formatted_attendees, ai_model, compact, reason_top_n, deadline=deadline)
+                self.timings.add('llm_ttfb', time.perf_counter() - started)
+                result = loads(response.read())
+                self.timings.add('llm', time.perf_counter() - started)
+                record_usage('anthropic' if ai_model == 'claude' else 'gemini', ai_model, result)
+            except Exception as e:
+                if not is_timeout(e):
+                    raise
+                self.send_json_response(retrieval_only(search_query, formatted_attendees, similar_attendees, selection, 'AI review timed out', structured), 200)
+                return
+
+            with self.timings.span('parse_response'):
+                result, usage = parse_anthropic_response(result) if ai_model == 'claude' else parse_gemini_response(result)
 
-            self.send_json_response(parsed, 200)
+                # Expand compact output back into the shape the frontend expects
+                if compact:
+                    result = expand_compact_result(result, formatted_attendees)
+
+            response = search_response(result, structured, usage=usage, tokens=token_estimate)
+            if selection:
+                response['selection'] = selection
+
+            get_query_cache().store(cache_scope, normalized_query, query_embedding, dataset_version, response)
+            self.send_json_response(response, 200)
 
         except urllib.error.HTTPError as e:
             error_body = e.read().decode('utf-8')
@@ -462,27 +491,47 @@ class handler(BaseHTTPRequestHandler):
                 'details': error_body
             }, e.code)
 
+        except CircuitOpenError as e:
+            self.send_error_response({'error': 'AI provider unavailable', 'details': str(e)}, 503)
+
         except Exception as e:
+            if is_timeout(e):
+                # Retrieval itself ran out of time; there is nothing to degrade to
+                self.send_error_response({'error': 'Search timed out', 'details': str(e)}, 504)
+                return
             self.send_error_response({'error': str(e)}, 500)
 
+        finally:
+            if self.flight:
+                self.flight.finish()
+
     def do_OPTIONS(self):
         """Handle CORS preflight"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Content-Encoding')
         self.end_headers()
 
     def send_json_response(self, data, status_code):
+        """Send JSON response with CORS and Server-Timing headers"""
+        if self.flight and status_code == 200:
+            self.flight.publish(data, status_code)
+        with self.timings.span('serialize'):
+            body = dumps(data)
+        with self.timings.span('compress'):
+            body, encoding = compress(body, self.headers.get('Accept-Encoding'))
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept-Encoding')
         self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Server-Timing', self.timings.header())
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+        self.wfile.write(body)
+        self.timings.finish(status_code)
 
     def send_error_response(self, error_data, status_code):
-        self.send_response(status_code)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(error_data).encode('utf-8'))
+        """Send error response"""
+        self.send_json_response(error_data, status_code)
@@ -30,6 +30,7 @@ class AttendeesDatabase {
         this.updateStats();
         this.renderAttendees();
         this.updateModelInfo();
+        this.loadSearchSuggestions();
     }
 
     async loadInitialProfiles() {
@@ -129,6 +130,11 @@ class AttendeesDatabase {
         const speedSpan = document.getElementById('modelSpeed');
 
         const modelInfo = {
+            'vector-fast': {
+                quality: '⭐⭐⭐ Good (Vector + keyword ranking, no AI review)',
+                cost: '~$0.0001 per search (embeddings only)',
+                speed: 'Instant (<1s)'
+            },
             'vector-gemini-flash': {
                 quality: '⭐⭐⭐⭐ Great (Vector pre-filter + Gemini Flash)',
                 cost: '~$0.01 per search (50 candidates)',
@@ -1375,6 +1381,7 @@ class AttendeesDatabase {
 
         this.showDeleteModal(name, () => {
             this.attendees = this.attendees.filter(a => a.id != attendeeId);
+            this.addSyncTombstones([attendeeId]);
             this.saveToLocalStorage();
             this.updateStats();
             this.renderAttendees();
@@ -1440,11 +1447,45 @@ class AttendeesDatabase {
     }
 
     // Cloud Sync Methods
+    // Canonical JSON (sorted keys, no whitespace) - must match canonical_json() in api/_lib/sync_state.py
+    canonicalJSON(value) {
+        if (Array.isArray(value)) {
+            return `[${value.map(v => this.canonicalJSON(v === undefined ? null : v)).join(',')}]`;
+        }
+        if (value && typeof value === 'object') {
+            const keys = Object.keys(value).filter(k => value[k] !== undefined).sort();
+            return `{${keys.map(k => `${JSON.stringify(k)}:${this.canonicalJSON(value[k])}`).join(',')}}`;
+        }
+        return JSON.stringify(value);
+    }
+
+    async contentHash(attendee) {
+        const bytes = new TextEncoder().encode(this.canonicalJSON(attendee));
+        const digest = await crypto.subtle.digest('SHA-256', bytes);
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    // Ids deleted locally that the server has not been told about yet
+    loadSyncTombstones() {
+        try {
+            return JSON.parse(localStorage.getItem('syncTombstones') || '[]');
+        } catch (e) {
+            return [];
+        }
+    }
+
+    addSyncTombstones(ids) {
+        const tombstones = new Set(this.loadSyncTombstones());
+        ids.forEach(id => tombstones.add(String(id)));
+        localStorage.setItem('syncTombstones', JSON.stringify([...tombstones]));
+    }
+
     async syncToCloud() {
         const statusDiv = document.getElementById('syncStatus');
         const syncBtn = document.getElementById('syncToCloudBtn');
+        const tombstones = this.loadSyncTombstones();
 
-        if (this.attendees.length === 0) {
+        if (this.attendees.length === 0 && tombstones.length === 0) {
             statusDiv.className = 'sync-status error';
             statusDiv.textContent = 'No attendees to sync. Add some profiles first.';
             return;
@@ -1453,21 +1494,71 @@ class AttendeesDatabase {
         syncBtn.disabled = true;
         syncBtn.textContent = 'Syncing...';
         statusDiv.className = 'sync-status syncing';
-        statusDiv.textContent = `Syncing ${this.attendees.length} profiles to cloud (this may take a few minutes)...`;
+        statusDiv.textContent = `Comparing ${this.attendees.length} profiles with the cloud...`;
 
         try {
+            // Delta sync: send content hashes and deletions, upload only what changed
+            const manifest = {};
+            for (const attendee of this.attendees) {
+                manifest[String(attendee.id)] = await this.contentHash(attendee);
+            }
+
+            const clientVersion = Number(localStorage.getItem('syncVersion') || 0);
+            const diffResponse = await fetch('/api/sync-attendees', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    manifest: manifest,
+                    deleted: tombstones,
+                    version: clientVersion
+                })
+            });
+
+            const diff = await diffResponse.json();
+
+            if (!diffResponse.ok) {
+                throw new Error(diff.error || 'Sync failed');
+            }
+
+            // Keep tombstones the server failed to apply for the next sync
+            const failedDeletes = new Set((diff.errors || []).map(e => String(e.id)));
+            localStorage.setItem('syncTombstones', JSON.stringify(tombstones.filter(id => failedDeletes.has(String(id)))));
+
+            // Profiles deleted from the cloud elsewhere since our last sync. Our
+            // version only counts against the state (epoch) it came from: a
+            // server without shared sync state has one per instance
+            const sameState = diff.epoch === localStorage.getItem('syncEpoch') && diff.version >= clientVersion;
+            const remoteDeletes = new Set(sameState ? (diff.deleted_since || []).map(String) : []);
+            const before = this.attendees.length;
+            this.attendees = this.attendees.filter(a => !remoteDeletes.has(String(a.id)));
+            const removed = before - this.attendees.length;
+            if (removed > 0) {
+                this.saveToLocalStorage();
+                this.updateStats();
+                this.renderAttendees();
+                this.updateSchoolFilter();
+            }
+
+            const uploadIds = new Set(diff.upload.map(String));
+            const toUpload = this.attendees.filter(a => uploadIds.has(String(a.id)));
+            let version = diff.version;
+            let epoch = diff.epoch;
+
             // Sync in batches of 10 to avoid timeout
             const batchSize = 10;
             let synced = 0;
             let failed = 0;
 
-            for (let i = 0; i < this.attendees.length; i += batchSize) {
-                const batch = this.attendees.slice(i, i + batchSize);
+            statusDiv.textContent = `Syncing ${toUpload.length} changed profiles to cloud (${diff.unchanged} already up to date)...`;
 
+            for (let i = 0; i < toUpload.length; i += batchSize) {
+                const batch = toUpload.slice(i, i + batchSize);
+
+                const encoded = await this.compressBody(JSON.stringify({ attendees: batch }));
                 const response = await fetch('/api/sync-attendees', {
                     method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ attendees: batch })
+                    headers: { 'Content-Type': 'application/json', ...encoded.headers },
+                    body: encoded.body
                 });
 
                 const result = await response.json();
@@ -1476,14 +1567,39 @@ class AttendeesDatabase {
                     throw new Error(result.error || 'Sync failed');
                 }
 
-                synced += result.success;
+                synced += result.success + result.skipped;
                 failed += result.failed;
 
-                statusDiv.textContent = `Syncing... ${synced}/${this.attendees.length} profiles complete`;
+                // Profiles the server ran out of time for go round again
+                const retryIds = new Set((result.retry || []).map(String));
+                if (retryIds.size === batch.length) {
+                    throw new Error('The server ran out of time; try syncing again');
+                }
+                toUpload.push(...batch.filter(a => retryIds.has(String(a.id))));
+                version = Math.max(version, result.version);
+                if (result.epoch !== epoch) {
+                    // Stored by another instance's state: no version to keep
+                    epoch = null;
+                }
+
+                statusDiv.textContent = `Syncing... ${synced}/${toUpload.length} changed profiles complete`;
             }
 
+            if (failed === 0 && epoch) {
+                localStorage.setItem('syncVersion', String(version));
+                localStorage.setItem('syncEpoch', epoch);
+            } else if (failed === 0) {
+                localStorage.removeItem('syncVersion');
+                localStorage.removeItem('syncEpoch');
+            }
+
+            // Warm the likely searches for the new data in the background
+            this.warmUpSearches();
+
+            const deleted = diff.deleted.length > 0 ? `, ${diff.deleted.length} deleted` : '';
+            const removedHere = removed > 0 ? `, ${removed} removed here after being deleted elsewhere` : '';
             statusDiv.className = 'sync-status success';
-            statusDiv.textContent = `Sync complete! ${synced} profiles synced${failed > 0 ? `, ${failed} failed` : ''}.`;
+            statusDiv.textContent = `Sync complete! ${synced} profiles updated, ${diff.unchanged} unchanged${deleted}${removedHere}${failed > 0 ? `, ${failed} failed` : ''}.`;
 
         } catch (error) {
             statusDiv.className = 'sync-status error';
@@ -1494,6 +1610,60 @@ class AttendeesDatabase {
         }
     }
 
+    async compressBody(text) {
+        // Profile JSON gzips 5-10x; browsers without CompressionStream send it as is
+        if (typeof CompressionStream === 'undefined') {
+            return { body: text, headers: {} };
+        }
+        const stream = new Blob([text]).stream().pipeThrough(new CompressionStream('gzip'));
+        return { body: await new Response(stream).blob(), headers: { 'Content-Encoding': 'gzip' } };
+    }
+
+    showSearchSuggestions(suggestions) {
+        const list = document.getElementById('aiSearchSuggestions');
+        list.innerHTML = '';
+        for (const suggestion of suggestions) {
+            const option = document.createElement('option');
+            option.value = suggestion;
+            list.appendChild(option);
+        }
+    }
+
+    async loadSearchSuggestions() {
+        try {
+            const response = await fetch('/api/facets', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ suggestions: true })
+            });
+            if (response.ok) {
+                this.showSearchSuggestions((await response.json()).suggestions || []);
+            }
+        } catch (error) {
+            // Suggestions are optional
+            console.error('Error loading search suggestions:', error);
+        }
+    }
+
+    async warmUpSearches() {
+        try {
+            const response = await fetch('/api/sync-attendees', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ finished: true })
+            });
+            const result = await response.json();
+            if (!response.ok) {
+                return;
+            }
+            // The server has run the suggested searches by the time it answers
+            this.showSearchSuggestions(result.suggestions || []);
+        } catch (error) {
+            // Warm-up only saves time on later searches
+            console.error('Error warming up searches:', error);
+        }
+    }
+
     async checkSyncStatus() {
         const statusDiv = document.getElementById('syncStatus');
         statusDiv.className = 'sync-status';
@@ -1543,13 +1713,16 @@ class AttendeesDatabase {
                     aiModel = 'gemini-pro';
                 } else if (this.selectedModel === 'vector-claude') {
                     aiModel = 'claude';
+                } else if (this.selectedModel === 'vector-fast') {
+                    aiModel = 'fast';
                 }
 
                 apiUrl = '/api/vector-search';
                 requestBody = JSON.stringify({
                     query: query,
                     match_count: 50,
-                    model: aiModel
+                    model: aiModel,
+                    structured: true
                 });
             } else {
                 apiUrl = window.location.hostname === 'localhost'
@@ -1558,16 +1731,19 @@ class AttendeesDatabase {
                 requestBody = JSON.stringify({
                     model: this.selectedModel,
                     query: query,
-                    attendees: JSON.stringify(this.attendees, null, 2)
+                    attendees: JSON.stringify(this.attendees, null, 2),
+                    structured: true
                 });
             }
 
+            const encoded = await this.compressBody(requestBody);
             const response = await fetch(apiUrl, {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json'
+                    'Content-Type': 'application/json',
+                    ...encoded.headers
                 },
-                body: requestBody
+                body: encoded.body
             });
 
             const data = await response.json();
@@ -1581,31 +1757,35 @@ class AttendeesDatabase {
             // Log full response to debug extended thinking mode
             console.log('Full API Response:', data);
 
-            // With extended thinking, response has multiple content blocks
-            // Find the text block (not thinking block)
-            const textContent = data.content.find(block => block.type === 'text');
-            const aiResponse = textContent ? textContent.text : data.content[0].text;
-            console.log('Raw AI Response:', aiResponse);
-
-            // Parse AI response
-            let result;
-            try {
-                // Try to extract JSON from the response
-                const jsonMatch = aiResponse.match(/\{[\s\S]*\}/);
-                if (jsonMatch) {
-                    result = JSON.parse(jsonMatch[0]);
-                    console.log('Parsed result:', result);
-                } else {
-                    throw new Error('No JSON found in response');
+            // Structured responses carry the result as an object; the proxy
+            // still nests it as JSON text in a content block
+            let result = data.result;
+            if (!result) {
+                // With extended thinking, response has multiple content blocks
+                // Find the text block (not thinking block)
+                const textContent = data.content.find(block => block.type === 'text');
+                const aiResponse = textContent ? textContent.text : data.content[0].text;
+                console.log('Raw AI Response:', aiResponse);
+
+                // Parse AI response
+                try {
+                    // Try to extract JSON from the response
+                    const jsonMatch = aiResponse.match(/\{[\s\S]*\}/);
+                    if (jsonMatch) {
+                        result = JSON.parse(jsonMatch[0]);
+                        console.log('Parsed result:', result);
+                    } else {
+                        throw new Error('No JSON found in response');
+                    }
+                } catch (e) {
+                    // Fallback: show raw response
+                    console.error('Parse error:', e);
+                    searchInput.classList.remove('searching');
+                    statusDiv.className = 'ai-search-status error';
+                    statusDiv.textContent = 'Error parsing AI response';
+                    resultsDiv.innerHTML = `<div class="ai-result-summary">${aiResponse}</div>`;
+                    return;
                 }
-            } catch (e) {
-                // Fallback: show raw response
-                console.error('Parse error:', e);
-                searchInput.classList.remove('searching');
-                statusDiv.className = 'ai-search-status error';
-                statusDiv.textContent = 'Error parsing AI response';
-                resultsDiv.innerHTML = `<div class="ai-result-summary">${aiResponse}</div>`;
-                return;
             }
 
             // Display results - hide loading state
@@ -1829,6 +2009,8 @@ class AttendeesDatabase {
             const doubleConfirm = window.confirm('Really delete? This is your last chance to cancel!');
 
             if (doubleConfirm) {
+                // Local only: the cloud copy is shared, so clearing this
+                // browser must not delete it on the next sync
                 this.attendees = [];
                 this.saveToLocalStorage();
                 this.updateStats();
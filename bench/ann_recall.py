@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Recall-vs-latency report for the local HNSW retrieval backend
+
+Builds an HNSWIndex and an ExactIndex over the same vectors, runs the same
+queries through both and reports recall@k and per-query latency for a range
+of ef_search values. Uses real embeddings when given --vectors (a JSON list
+of vectors, e.g. dumped from the attendees table) and clustered synthetic
+768-dim vectors otherwise.
+
+Usage: python bench/ann_recall.py [--n 5000] [--dim 768] [--queries 100] [--k 10]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+from _lib.ann import ExactIndex, HNSWIndex
+
+def synthetic_vectors(n, dim, clusters, rng):
+    """Gaussian clusters - closer to real profile embeddings than uniform noise"""
+    centers = [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(clusters)]
+    return [[c + rng.gauss(0, 0.8) for c in rng.choice(centers)] for _ in range(n)]
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--vectors', help='JSON file with a list of vectors')
+    parser.add_argument('--n', type=int, default=5000)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--clusters', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--m', type=int, default=16)
+    parser.add_argument('--ef-construction', type=int, default=100)
+    parser.add_argument('--ef-search', default='16,32,64,128,256')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.vectors:
+        with open(args.vectors) as f:
+            vectors = json.load(f)
+        rng.shuffle(vectors)
+        queries = vectors[:args.queries]
+        vectors = vectors[args.queries:]
+    else:
+        vectors = synthetic_vectors(args.n + args.queries, args.dim, args.clusters, rng)
+        queries = vectors[args.n:]
+        vectors = vectors[:args.n]
+
+    exact = ExactIndex()
+    hnsw = HNSWIndex(m=args.m, ef_construction=args.ef_construction, seed=args.seed)
+
+    start = time.perf_counter()
+    for i, v in enumerate(vectors):
+        hnsw.add(i, v)
+    build_seconds = time.perf_counter() - start
+    for i, v in enumerate(vectors):
+        exact.add(i, v)
+
+    truth = []
+    exact_times = []
+    for q in queries:
+        start = time.perf_counter()
+        truth.append({i for i, _ in exact.search(q, args.k)})
+        exact_times.append(time.perf_counter() - start)
+
+    print('# HNSW recall vs latency')
+    print()
+    print(f'- vectors: {len(vectors)} x {len(vectors[0])} ({"file " + args.vectors if args.vectors else f"synthetic, {args.clusters} clusters"})')
+    print(f'- queries: {len(queries)}, k = {args.k}')
+    print(f'- HNSW: M = {args.m}, ef_construction = {args.ef_construction}, max level = {hnsw.max_level}')
+    print(f'- HNSW build: {build_seconds:.1f} s ({1000 * build_seconds / len(vectors):.1f} ms per insert)')
+    print()
+    print(f'| search | ef_search | recall@{args.k} | mean ms | p95 ms | speedup |')
+    print('|---|---|---|---|---|---|')
+
+    exact_mean = sum(exact_times) / len(exact_times)
+    print(f'| exact | - | 1.000 | {1000 * exact_mean:.2f} | {1000 * percentile(exact_times, 95):.2f} | 1.0x |')
+
+    for ef in (int(x) for x in args.ef_search.split(',')):
+        times = []
+        hits = 0
+        for q, expected in zip(queries, truth):
+            start = time.perf_counter()
+            found = {i for i, _ in hnsw.search(q, args.k, ef_search=ef)}
+            times.append(time.perf_counter() - start)
+            hits += len(found & expected)
+        mean = sum(times) / len(times)
+        recall = hits / (args.k * len(queries))
+        print(f'| hnsw | {ef} | {recall:.3f} | {1000 * mean:.2f} | {1000 * percentile(times, 95):.2f} | {exact_mean / mean:.1f}x |')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Synthetic attendee datasets for the offline benchmarks
+
+Starts from the real profiles in dn-resumes.json and
+data/initial-profiles.json and scales them up by recombining their parts:
+every synthetic profile gets a headline, location and school from one
+source profile, one to four experience entries and up to two education
+entries drawn from the whole pool, and a sample of skills. The result has
+the field shapes and size distribution of real profiles, at any count.
+
+Usage: python bench/datasets.py [--n 10000] [--seed 1] > profiles.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SOURCES = (
+    os.path.join(ROOT, 'dn-resumes.json'),
+    os.path.join(ROOT, 'data', 'initial-profiles.json')
+)
+
+def load_sources():
+    profiles = []
+    for path in SOURCES:
+        with open(path, 'r', encoding='utf-8') as f:
+            profiles.extend(json.load(f))
+    return profiles
+
+def synthesize(n, seed=1):
+    """n profiles: the source profiles first, then recombinations of them"""
+    rng = random.Random(seed)
+    sources = load_sources()
+
+    first_names = [p['name'].split()[0] for p in sources if p.get('name')]
+    last_names = [p['name'].split()[-1] for p in sources if p.get('name') and len(p['name'].split()) > 1]
+    experience = [e for p in sources for e in p.get('experience') or []]
+    education = [e for p in sources for e in p.get('education') or []]
+    skills = sorted({s for p in sources for s in p.get('skills') or []})
+
+    profiles = []
+    for i in range(n):
+        if i < len(sources):
+            profile = dict(sources[i])
+        else:
+            base = rng.choice(sources)
+            profile = {
+                'name': f'{rng.choice(first_names)} {rng.choice(last_names)}',
+                'headline': base.get('headline'),
+                'location': rng.choice(sources).get('location'),
+                'school': base.get('school'),
+                'experience': rng.sample(experience, min(len(experience), rng.randint(1, 4))),
+                'education': rng.sample(education, min(len(education), rng.randint(0, 2))),
+                'skills': rng.sample(skills, min(len(skills), rng.randint(0, 12)))
+            }
+        profile['id'] = f'bench-{i}'
+        profiles.append(profile)
+    return profiles
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--n', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    json.dump(synthesize(args.n, args.seed), sys.stdout)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency, throughput and memory benchmark for the API handlers
+
+Runs api/search.py, api/vector-search.py, api/sync-attendees.py,
+api/extract-pdf.py and proxy-server.py (when Flask is installed) against the
+offline stand-in (bench/standin.py), which replays recorded provider
+responses with realistic latency. Each handler is served on a local port the
+way Vercel serves it, and driven with concurrent requests over synthetic
+profiles (bench/datasets.py).
+
+Reports p50/p95/p99 latency, throughput and peak Python memory per
+scenario. --json saves the results; --baseline compares against a saved run
+and exits non-zero when a scenario's p95 regressed by more than
+--tolerance, for use in PR checks. With --latency-scale 0 the providers
+answer instantly and the numbers are the handlers' own overhead, which is
+what a code change can regress.
+
+Usage: python bench/pipeline.py [--profiles 10000] [--search-profiles 300]
+       [--requests 20] [--concurrency 4] [--latency-scale 1.0]
+       [--scenarios search-gemini,vector-search-fast,...] [--json out.json]
+       [--baseline base.json] [--tolerance 0.2]
+"""
+
+import argparse
+import base64
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, '..')
+API_DIR = os.path.join(ROOT, 'api')
+
+sys.path.insert(0, BENCH_DIR)
+
+from datasets import synthesize
+
+QUERIES = [
+    'worked at Goldman Sachs',
+    'software engineers in New York',
+    'Dartmouth students interested in consulting',
+    'experience in machine learning research',
+    'people who worked at Citadel or Jane Street',
+    'founders of a startup',
+    'studied economics and speaks Spanish',
+    'connections to Palantir'
+]
+
+# Smallest well-formed PDF; the stand-in never reads it
+PDF_BYTES = b'%PDF-1.1\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n2 0 obj<</Type/Pages/Kids[]/Count 0>>endobj\ntrailer<</Root 1 0 R>>\n%%EOF\n'
+
+SYNC_BATCH_SIZE = 10
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+def start_standin(profiles, latency_scale):
+    """Run bench/standin.py in its own process so its memory is not counted"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, 'standin.py'), '--port', '0',
+         '--profiles', str(profiles), '--latency-scale', str(latency_scale)],
+        stdout=subprocess.PIPE, text=True
+    )
+    line = process.stdout.readline()
+    if 'http://' not in line:
+        process.kill()
+        raise SystemExit('Stand-in failed to start')
+    return process, line.strip().split()[-1]
+
+def load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def serve_handler(filename):
+    """Serve an api/*.py handler class on a local port; returns its URL"""
+    module = load_module(os.path.join(API_DIR, filename), filename[:-3].replace('-', '_'))
+    quiet = type('handler', (module.handler,), {'log_message': lambda self, format, *args: None})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), quiet)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}/'
+
+def post(url, payload):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'), headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=300) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+def proxy_poster():
+    """POST function for proxy-server.py through Flask's test client, or a reason it cannot run"""
+    try:
+        module = load_module(os.path.join(ROOT, 'proxy-server.py'), 'proxy_server')
+    except ImportError as e:
+        return None, f'proxy-server.py not importable ({e})'
+
+    def post_proxy(_url, payload):
+        return module.app.test_client().post('/api/search', json=payload).status_code
+    return post_proxy, None
+
+def build_scenarios(profiles, search_profiles):
+    """name -> (handler file or None for the proxy, payload factory)"""
+    attendees = json.dumps(profiles[:search_profiles])
+    pdf = base64.b64encode(PDF_BYTES).decode('ascii')
+
+    def sync_payload(i):
+        start = (i * SYNC_BATCH_SIZE) % len(profiles)
+        return {'attendees': profiles[start:start + SYNC_BATCH_SIZE], 'force': True}
+
+    return {
+        'search-gemini': ('search.py', lambda i: {'query': QUERIES[i % len(QUERIES)], 'attendees': attendees, 'model': 'gemini-3-flash'}),
+        'search-claude': ('search.py', lambda i: {'query': QUERIES[i % len(QUERIES)], 'attendees': attendees, 'model': 'claude-sonnet'}),
+        'search-cascade': ('search.py', lambda i: {'query': QUERIES[i % len(QUERIES)], 'attendees': attendees, 'model': 'gemini-3-flash', 'cascade': True}),
+        'vector-search-gemini': ('vector-search.py', lambda i: {'query': QUERIES[i % len(QUERIES)], 'model': 'gemini-flash'}),
+        'vector-search-fast': ('vector-search.py', lambda i: {'query': QUERIES[i % len(QUERIES)], 'model': 'fast'}),
+        'sync-attendees': ('sync-attendees.py', sync_payload),
+        'extract-pdf': ('extract-pdf.py', lambda i: {'pdf': pdf, 'school': 'Dartmouth College'}),
+        'proxy-search': (None, lambda i: {'query': QUERIES[i % len(QUERIES)], 'attendees': attendees, 'model': 'gemini-3-flash'})
+    }
+
+def run_scenario(send, url, payload, requests, concurrency):
+    """Drive one scenario; returns its measurements"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        body = payload(i)
+        started = time.perf_counter()
+        status = send(url, body)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed * 1000)
+            if status != 200:
+                errors += 1
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'throughput_rps': round(requests / wall, 2),
+        'peak_mb': round(peak / 1e6, 1)
+    }
+
+def compare(results, baseline, tolerance):
+    """Scenarios whose p95 grew by more than tolerance over the baseline"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before or 'p95_ms' not in result or not before.get('p95_ms'):
+            continue
+        change = result['p95_ms'] / before['p95_ms'] - 1
+        if change > tolerance:
+            regressions.append(f'{name}: p95 {before["p95_ms"]} ms -> {result["p95_ms"]} ms (+{change:.0%})')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', type=int, default=10000, help='Profiles in the stand-in database and the sync workload')
+    parser.add_argument('--search-profiles', type=int, default=300, help='Profiles the client sends to /api/search')
+    parser.add_argument('--requests', type=int, default=20, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='0 measures handler overhead only')
+    parser.add_argument('--scenarios', help='Comma-separated subset of scenarios')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--baseline', help='Results file of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95 increase over the baseline')
+    args = parser.parse_args()
+
+    standin, standin_url = start_standin(args.profiles, args.latency_scale)
+    data_dir = tempfile.mkdtemp(prefix='handenheit-bench-')
+    # Read by the api modules at import time, so set before any is loaded
+    os.environ.update({
+        'GEMINI_BASE_URL': standin_url,
+        'ANTHROPIC_BASE_URL': standin_url,
+        'SUPABASE_URL': standin_url,
+        'SUPABASE_SERVICE_KEY': 'bench',
+        'GOOGLE_API_KEY': 'bench',
+        'ANTHROPIC_API_KEY': 'bench',
+        'HANDENHEIT_DATA_DIR': data_dir,
+        'VECTOR_BACKEND': 'supabase',
+        'EMBEDDING_PROVIDER': 'gemini',
+        # Measure the pipeline, not answers replayed from the query cache
+        'SEMANTIC_CACHE_SIZE': '0'
+    })
+
+    try:
+        profiles = synthesize(args.profiles)
+        scenarios = build_scenarios(profiles, args.search_profiles)
+        selected = args.scenarios.split(',') if args.scenarios else list(scenarios)
+
+        urls = {}
+        results = {}
+        for name in selected:
+            if name not in scenarios:
+                raise SystemExit(f'Unknown scenario {name}: scenarios are {", ".join(scenarios)}')
+            filename, payload = scenarios[name]
+
+            if filename is None:
+                send, reason = proxy_poster()
+                if send is None:
+                    results[name] = {'skipped': reason}
+                    continue
+                url = None
+            else:
+                if filename not in urls:
+                    urls[filename] = serve_handler(filename)
+                send, url = post, urls[filename]
+
+            results[name] = run_scenario(send, url, payload, args.requests, args.concurrency)
+            print(f'{name}: {results[name]}', file=sys.stderr, flush=True)
+    finally:
+        standin.kill()
+
+    print('# Pipeline benchmark\n')
+    print(f'- profiles: {args.profiles} in the database, {args.search_profiles} per /api/search request')
+    print(f'- {args.requests} requests per scenario, concurrency {args.concurrency}, provider latency x{args.latency_scale}\n')
+    print('| scenario | errors | p50 ms | p95 ms | p99 ms | mean ms | req/s | peak MB |')
+    print('|---|---|---|---|---|---|---|---|')
+    for name, r in results.items():
+        if 'skipped' in r:
+            print(f'| {name} | skipped: {r["skipped"]} | | | | | | |')
+        else:
+            print(f'| {name} | {r["errors"]} | {r["p50_ms"]} | {r["p95_ms"]} | {r["p99_ms"]} | {r["mean_ms"]} | {r["throughput_rps"]} | {r["peak_mb"]} |')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('\nRegressions:\n' + '\n'.join(f'- {r}' for r in regressions))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
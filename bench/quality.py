@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Search quality and cost report over the golden queries
+
+Runs every query in bench/golden-queries.json through each retrieval and
+rerank configuration (BM25 only, vector fast tier, vector + LLM at several
+thresholds and candidate counts, full-list search, cascades) over the
+dn-resumes.json profiles, and reports recall@k and nDCG@k against the
+graded relevance judgments, next to tokens and latency per query. The last
+line names the fastest configuration whose nDCG is within --tolerance of
+the best.
+
+Provider calls go through a replay cache (bench/quality-cache/, keyed by
+request body), so runs are offline and deterministic. Record it once with
+real keys in the environment and --record; configurations with uncached
+calls are reported as such. Latency is the handlers' own time plus the
+provider time measured when the response was recorded.
+
+Usage: python bench/quality.py [--k 10] [--configs bm25,vector-fast,...]
+       [--record] [--json out.json] [--baseline base.json] [--tolerance 0.02]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, '..')
+GOLDEN_PATH = os.path.join(BENCH_DIR, 'golden-queries.json')
+CACHE_DIR = os.path.join(BENCH_DIR, 'quality-cache')
+PROFILES_PATH = os.path.join(ROOT, 'dn-resumes.json')
+
+sys.path.insert(0, BENCH_DIR)
+
+from pipeline import percentile, serve_handler
+
+UPSTREAMS = {
+    'gemini': 'https://generativelanguage.googleapis.com',
+    'anthropic': 'https://api.anthropic.com'
+}
+
+# name -> (handler file, request fields); bm25 runs in-process
+CONFIGS = {
+    'bm25': (None, {}),
+    'vector-fast': ('vector-search.py', {'model': 'fast'}),
+    'vector-fast-t0.3': ('vector-search.py', {'model': 'fast', 'match_threshold': 0.3}),
+    'vector-gemini-flash': ('vector-search.py', {'model': 'gemini-flash'}),
+    'vector-gemini-flash-k20': ('vector-search.py', {'model': 'gemini-flash', 'match_count': 20}),
+    'vector-gemini-flash-t0.3': ('vector-search.py', {'model': 'gemini-flash', 'match_threshold': 0.3}),
+    'vector-gemini-flash-verbose': ('vector-search.py', {'model': 'gemini-flash', 'compact': False}),
+    'vector-claude': ('vector-search.py', {'model': 'claude'}),
+    'search-gemini-3-flash': ('search.py', {'model': 'gemini-3-flash'}),
+    'search-cascade-lexical': ('search.py', {'model': 'gemini-3-flash', 'cascade': True, 'coarse_model': 'lexical'}),
+    'search-cascade-gemini': ('search.py', {'model': 'gemini-3-flash', 'cascade': True}),
+    'search-claude-sonnet': ('search.py', {'model': 'claude-sonnet'})
+}
+
+class ReplayCache:
+    """Provider responses stored by request, replayed or recorded"""
+
+    def __init__(self, record):
+        self.record = record
+        self.lock = threading.Lock()
+        self.misses = 0
+        # Recorded provider time of the responses served since the last reset
+        self.provider_seconds = 0.0
+
+    def key(self, method, path, body):
+        # The API key travels in the query string for Gemini; leave it out
+        parts = urllib.parse.urlsplit(path)
+        query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query) if k != 'key']
+        text = f'{method} {parts.path}?{urllib.parse.urlencode(query)}\n'.encode('utf-8') + body
+        return hashlib.sha256(text).hexdigest()
+
+    def fetch(self, method, path, headers, body):
+        """(status, body) for a provider call, from the cache or upstream"""
+        cache_path = os.path.join(CACHE_DIR, self.key(method, path, body) + '.json')
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            entry = None
+
+        if entry is None and self.record:
+            upstream = UPSTREAMS['anthropic' if path.startswith('/v1/messages') else 'gemini']
+            req = urllib.request.Request(upstream + path, data=body or None, method=method, headers={
+                k: v for k, v in headers.items() if k.lower() in ('content-type', 'x-api-key', 'anthropic-version')
+            })
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=300) as response:
+                    status, text = response.status, response.read().decode('utf-8')
+            except urllib.error.HTTPError as e:
+                status, text = e.code, e.read().decode('utf-8')
+            entry = {'status': status, 'body': text, 'seconds': round(time.perf_counter() - started, 3)}
+            if status == 200:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f)
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return 404, json.dumps({'error': 'not in the quality cache; run with --record'})
+            self.provider_seconds += entry['seconds']
+        return entry['status'], entry['body']
+
+    def reset(self):
+        with self.lock:
+            seconds, self.provider_seconds = self.provider_seconds, 0.0
+        return seconds
+
+def start_cache(cache):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            status, body = cache.fetch('POST', self.path, self.headers, self.rfile.read(length))
+            data = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+def post(url, payload):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'), headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=300) as response:
+            return response.status, json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+def ranked_ids(response):
+    """Match ids, best first and without repeats, from a search response"""
+    result = json.loads(response['content'][0]['text'])
+    matches = sorted(result.get('matches', []), key=lambda m: m.get('score', 0), reverse=True)
+    return list(dict.fromkeys(str(m.get('id')) for m in matches))
+
+def recall_at(ranked, relevant, k):
+    hits = sum(1 for i in ranked[:k] if relevant.get(i, 0) > 0)
+    return hits / len(relevant) if relevant else 0.0
+
+def ndcg_at(ranked, relevant, k):
+    """nDCG@k with graded gains 2^grade - 1"""
+    dcg = sum((2 ** relevant.get(i, 0) - 1) / math.log2(rank + 2) for rank, i in enumerate(ranked[:k]))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum((2 ** grade - 1) / math.log2(rank + 2) for rank, grade in enumerate(ideal))
+    return dcg / idcg if idcg else 0.0
+
+def token_totals(registry):
+    """{kind: tokens} summed over providers and models"""
+    totals = {}
+    with registry.lock:
+        for (name, labels), value in registry.counters.items():
+            if name == 'handenheit_tokens_total':
+                kind = dict(labels)['kind']
+                totals[kind] = totals.get(kind, 0) + value
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--k', type=int, default=10, help='Cutoff for recall and nDCG (recall is also reported at 5)')
+    parser.add_argument('--configs', help='Comma-separated subset of configurations')
+    parser.add_argument('--record', action='store_true', help='Call the real providers for uncached requests and cache them')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--baseline', help='Results file of an earlier run; fail if any nDCG dropped by more than --tolerance')
+    parser.add_argument('--tolerance', type=float, default=0.02, help='nDCG difference treated as equal quality')
+    args = parser.parse_args()
+
+    with open(GOLDEN_PATH, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+    with open(PROFILES_PATH, 'r', encoding='utf-8') as f:
+        profiles = json.load(f)
+
+    cache = ReplayCache(args.record)
+    cache_url = start_cache(cache)
+    # Read by the api modules at import time, so set before any is loaded
+    for name in ('SUPABASE_URL', 'SUPABASE_SERVICE_KEY'):
+        os.environ.pop(name, None)
+    os.environ.update({
+        'GEMINI_BASE_URL': cache_url,
+        'ANTHROPIC_BASE_URL': cache_url,
+        'GOOGLE_API_KEY': os.environ.get('GOOGLE_API_KEY') or 'offline',
+        'ANTHROPIC_API_KEY': os.environ.get('ANTHROPIC_API_KEY') or 'offline',
+        'HANDENHEIT_DATA_DIR': tempfile.mkdtemp(prefix='handenheit-quality-'),
+        'VECTOR_BACKEND': 'exact',
+        'EMBEDDING_PROVIDER': os.environ.get('EMBEDDING_PROVIDER') or 'gemini',
+        'ENTITY_ENRICHMENT': '',
+        # Measure the pipeline, not answers replayed from the query cache
+        'SEMANTIC_CACHE_SIZE': '0'
+    })
+    sys.path.insert(0, os.path.join(ROOT, 'api'))
+    from _lib.fast import rank_lexical
+    from _lib.metrics import REGISTRY
+
+    selected = args.configs.split(',') if args.configs else list(CONFIGS)
+    for name in selected:
+        if name not in CONFIGS:
+            raise SystemExit(f'Unknown configuration {name}: configurations are {", ".join(CONFIGS)}')
+
+    urls = {}
+    synced = None
+    if any(CONFIGS[name][0] == 'vector-search.py' for name in selected):
+        sync_url = serve_handler('sync-attendees.py')
+        status, body = post(sync_url, {'attendees': profiles, 'force': True})
+        synced = status == 200 and body.get('success') == len(profiles)
+
+    attendees = json.dumps(profiles)
+    results = {}
+    for name in selected:
+        filename, fields = CONFIGS[name]
+        if filename == 'vector-search.py' and not synced:
+            results[name] = {'skipped': 'profiles could not be embedded (embedding calls not cached)'}
+            continue
+        if filename and filename not in urls:
+            urls[filename] = serve_handler(filename)
+
+        misses_before = cache.misses
+        tokens_before = token_totals(REGISTRY)
+        cache.reset()
+        recalls, recalls_5, ndcgs, latencies = [], [], [], []
+        failed = 0
+        for item in golden:
+            started = time.perf_counter()
+            if filename is None:
+                ranked = [str(m['id']) for m in rank_lexical(item['query'], profiles, args.k)['matches']]
+            else:
+                payload = dict(fields, query=item['query'])
+                if filename == 'search.py':
+                    payload['attendees'] = attendees
+                status, body = post(urls[filename], payload)
+                ranked = ranked_ids(body) if status == 200 else []
+                failed += status != 200
+            latencies.append((time.perf_counter() - started + cache.reset()) * 1000)
+
+            recalls.append(recall_at(ranked, item['relevant'], args.k))
+            recalls_5.append(recall_at(ranked, item['relevant'], 5))
+            ndcgs.append(ndcg_at(ranked, item['relevant'], args.k))
+
+        if cache.misses > misses_before:
+            results[name] = {'skipped': f'{cache.misses - misses_before} provider calls not cached'}
+            continue
+
+        tokens = token_totals(REGISTRY)
+        queries = len(golden)
+        results[name] = {
+            'failed': failed,
+            'recall_5': round(sum(recalls_5) / queries, 3),
+            f'recall_{args.k}': round(sum(recalls) / queries, 3),
+            f'ndcg_{args.k}': round(sum(ndcgs) / queries, 3),
+            'input_tokens': round((tokens.get('input', 0) - tokens_before.get('input', 0)) / queries),
+            'output_tokens': round((tokens.get('output', 0) - tokens_before.get('output', 0)) / queries),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1)
+        }
+        print(f'{name}: {results[name]}', file=sys.stderr, flush=True)
+
+    ndcg_key = f'ndcg_{args.k}'
+    print('# Search quality\n')
+    print(f'- {len(golden)} golden queries over {len(profiles)} profiles; tokens are per query\n')
+    print(f'| configuration | recall@5 | recall@{args.k} | nDCG@{args.k} | input tokens | output tokens | p50 ms | p95 ms |')
+    print('|---|---|---|---|---|---|---|---|')
+    for name, r in results.items():
+        if 'skipped' in r:
+            print(f'| {name} | skipped: {r["skipped"]} | | | | | | |')
+        else:
+            print(f'| {name} | {r["recall_5"]} | {r[f"recall_{args.k}"]} | {r[ndcg_key]} | {r["input_tokens"]} | {r["output_tokens"]} | {r["p50_ms"]} | {r["p95_ms"]} |')
+
+    measured = {name: r for name, r in results.items() if 'skipped' not in r}
+    if measured:
+        best = max(r[ndcg_key] for r in measured.values())
+        holding = [name for name, r in measured.items() if r[ndcg_key] >= best - args.tolerance]
+        fastest = min(holding, key=lambda name: measured[name]['p50_ms'])
+        print(f'\nFastest configuration within {args.tolerance} nDCG of the best ({best}): {fastest}')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+        drops = [
+            f'{name}: nDCG {baseline[name][ndcg_key]} -> {r[ndcg_key]}'
+            for name, r in measured.items()
+            if ndcg_key in baseline.get(name, {}) and r[ndcg_key] < baseline[name][ndcg_key] - args.tolerance
+        ]
+        if drops:
+            print('\nQuality regressions:\n' + '\n'.join(f'- {d}' for d in drops))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Recall, latency and memory report for the quantized retrieval backends
+
+Runs the same queries through an ExactIndex (float32) and int8 / binary
+QuantizedIndexes over the same vectors, and reports recall@k against exact
+search, per-query latency and bytes held in memory per vector, for a range
+of rescore factors. Uses real embeddings when given --vectors (a JSON list
+of vectors) and clustered synthetic vectors otherwise.
+
+Usage: python bench/quantization.py [--n 5000] [--dim 768] [--queries 50] [--k 10]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+from _lib.ann import ExactIndex
+from _lib.quantize import QUANTIZATION_MODES, QuantizedIndex
+
+from ann_recall import percentile, synthetic_vectors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--vectors', help='JSON file with a list of vectors')
+    parser.add_argument('--n', type=int, default=5000)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--clusters', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--rescore-factor', default='1,4,10')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.vectors:
+        with open(args.vectors) as f:
+            vectors = json.load(f)
+        rng.shuffle(vectors)
+        queries = vectors[:args.queries]
+        vectors = vectors[args.queries:]
+    else:
+        vectors = synthetic_vectors(args.n + args.queries, args.dim, args.clusters, rng)
+        queries = vectors[args.n:]
+        vectors = vectors[:args.n]
+    dim = len(vectors[0])
+
+    exact = ExactIndex()
+    for i, v in enumerate(vectors):
+        exact.add(i, v)
+
+    truth = []
+    exact_times = []
+    for q in queries:
+        start = time.perf_counter()
+        truth.append({i for i, _ in exact.search(q, args.k)})
+        exact_times.append(time.perf_counter() - start)
+
+    print('# Quantized retrieval: recall, latency and memory')
+    print()
+    print(f'- vectors: {len(vectors)} x {dim} ({"file " + args.vectors if args.vectors else f"synthetic, {args.clusters} clusters"})')
+    print(f'- queries: {len(queries)}, k = {args.k}')
+    print()
+    print(f'| search | rescore factor | recall@{args.k} | mean ms | p95 ms | bytes/vector in memory |')
+    print('|---|---|---|---|---|---|')
+
+    exact_mean = sum(exact_times) / len(exact_times)
+    print(f'| float32 exact | - | 1.000 | {1000 * exact_mean:.2f} | {1000 * percentile(exact_times, 95):.2f} | {4 * dim} |')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in QUANTIZATION_MODES:
+            index = QuantizedIndex(mode)
+            for i, v in enumerate(vectors):
+                index.add(i, v)
+            # Reload so rescoring reads float vectors through mmap, as in production
+            index.save(os.path.join(directory, mode))
+            index = QuantizedIndex.load(os.path.join(directory, mode))
+            per_vector = index.memory_bytes() // len(index)
+
+            for factor in (int(x) for x in args.rescore_factor.split(',')):
+                times = []
+                hits = 0
+                for q, expected in zip(queries, truth):
+                    start = time.perf_counter()
+                    found = {i for i, _ in index.search(q, args.k, rescore_factor=factor)}
+                    times.append(time.perf_counter() - start)
+                    hits += len(found & expected)
+                mean = sum(times) / len(times)
+                recall = hits / (args.k * len(queries))
+                print(f'| {mode} | {factor} | {recall:.3f} | {1000 * mean:.2f} | {1000 * percentile(times, 95):.2f} | {per_vector} |')
+            index.vectors.map.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Stand-in for Gemini, Anthropic and Supabase, for offline benchmarks
+
+Serves the provider endpoints the handlers call, so search, sync and
+extraction can be measured without keys or network. Model calls replay the
+responses in bench/fixtures/: the "$ID0", "$ID1"... placeholders in a
+fixture are replaced, in order, by the attendee ids found in the request,
+so the handlers' parsing and expansion do real work. Embeddings are
+feature-hashed bags of words (768 dims), and the Supabase tables live in
+memory, seeded with bench/datasets.py profiles, with match RPCs ranking by
+word overlap.
+
+Every route waits for a latency drawn from a log-normal distribution with
+the given median and p95 (minus the time the stand-in itself spent), so
+results reflect provider latency the way production sees it. Point the
+handlers here with GEMINI_BASE_URL, ANTHROPIC_BASE_URL and SUPABASE_URL.
+
+--record forwards model calls to the real providers (keys from the
+environment) and saves the responses as fixtures, with ids templated.
+
+Usage: python bench/standin.py [--port 8787] [--profiles 10000]
+       [--latency-scale 1.0] [--latency gemini-search=2500:6000 ...] [--record]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datasets import synthesize
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Route -> (median ms, p95 ms)
+DEFAULT_LATENCY = {
+    'gemini-search': (2500, 6000),
+    'gemini-screen': (900, 2000),
+    'gemini-entities': (1500, 3000),
+    'gemini-embed': (150, 400),
+    'anthropic-search': (4000, 9000),
+    'anthropic-extract': (12000, 25000),
+    'supabase-rpc': (80, 250),
+    'supabase-rest': (40, 120)
+}
+
+UPSTREAMS = {
+    'gemini': 'https://generativelanguage.googleapis.com',
+    'anthropic': 'https://api.anthropic.com'
+}
+
+EMBEDDING_DIM = 768
+ID_PATTERN = re.compile(r'\\?"id\\?"\s*:\s*\\?"?([\w.-]+)')
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+def hashed_embedding(text):
+    """Signed feature hashing of the words in text, L2-normalized"""
+    vector = [0.0] * EMBEDDING_DIM
+    for word in WORD_PATTERN.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest()
+        for i in range(0, 8, 2):
+            vector[digest[i] * 3 % EMBEDDING_DIM] += 1.0 if digest[i + 1] & 1 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+def table_row(profile):
+    """A profile as the attendees table stores it: nested lists as JSON text"""
+    row = dict(profile)
+    for key in ('experience', 'education', 'organizations', 'volunteering', 'projects', 'awards'):
+        if not isinstance(row.get(key), str):
+            row[key] = json.dumps(row.get(key) or [])
+    return row
+
+def projected_profile(row):
+    """(md5 digest, profile) as supabase/columnar-search.sql's attendee_profile() builds them"""
+    profile = {key: row.get(key) for key in ('name', 'headline', 'location', 'school', 'about')}
+    profile['id'] = str(row['id'])
+    for key in ('experience', 'education', 'organizations', 'volunteering', 'projects', 'awards'):
+        profile[key] = json.loads(row.get(key) or '[]')
+    for key in ('skills', 'languages', 'interests'):
+        profile[key] = row.get(key)
+    profile = {key: value for key, value in profile.items() if value not in (None, [])}
+    return hashlib.md5(json.dumps(profile).encode('utf-8')).hexdigest(), profile
+
+class Tables:
+    """In-memory attendees table with a word index for the match RPCs"""
+
+    def __init__(self, profiles):
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.words = {}
+        # dataset_version, bumped by every write as supabase/shared-state.sql's triggers do
+        self.version = 0
+        # The entities table, (kind, key) -> row
+        self.entities = {}
+        # The query_log table, query -> count
+        self.query_log = {}
+        # The sync_state table, id -> row, and its version sequence
+        self.sync_state = {}
+        self.sync_version = 0
+        for profile in profiles:
+            self.upsert(table_row(profile))
+
+    def upsert(self, row):
+        row = {k: v for k, v in row.items() if k != 'embedding'}
+        with self.lock:
+            self.version += 1
+            self.rows[str(row['id'])] = row
+            for word in set(WORD_PATTERN.findall(json.dumps(row).lower())):
+                self.words.setdefault(word, set()).add(str(row['id']))
+
+    def delete(self, attendee_id):
+        with self.lock:
+            self.version += 1
+            self.rows.pop(str(attendee_id), None)
+
+    def match(self, query_words, count):
+        """Top rows by number of query words they contain, with similarity-like scores"""
+        hits = {}
+        with self.lock:
+            for word in query_words:
+                for attendee_id in self.words.get(word, ()):
+                    if attendee_id in self.rows:
+                        hits[attendee_id] = hits.get(attendee_id, 0) + 1
+            ranked = sorted(hits.items(), key=lambda item: (-item[1], item[0]))[:count]
+            if len(ranked) < count:
+                ranked += [(i, 0) for i in list(self.rows)[:count - len(ranked)] if i not in hits]
+            best = ranked[0][1] if ranked and ranked[0][1] else 1
+            return [(dict(self.rows[i]), 0.3 + 0.5 * score / best) for i, score in ranked]
+
+class StandIn:
+    def __init__(self, profiles, latency, scale, record):
+        self.tables = Tables(profiles)
+        self.latency = latency
+        self.scale = scale
+        self.record = record
+        self.rng = random.Random(1)
+        self.fixtures = {}
+        # Leading components of single-text (query) embeddings -> the text,
+        # so the match RPCs can rank by the query's words
+        self.queries = {}
+
+    def delay(self, route, started):
+        median, p95 = self.latency[route]
+        sigma = math.log(p95 / median) / 1.645 if p95 > median else 0.0
+        seconds = median / 1000 * math.exp(self.rng.gauss(0, sigma)) * self.scale
+        time.sleep(max(0.0, seconds - (time.perf_counter() - started)))
+
+    def fixture(self, name):
+        if name not in self.fixtures:
+            with open(os.path.join(FIXTURES_DIR, f'{name}.json'), 'r', encoding='utf-8') as f:
+                self.fixtures[name] = f.read()
+        return self.fixtures[name]
+
+    def replay(self, name, body):
+        """A fixture with $IDn placeholders replaced by the ids in the request"""
+        ids = list(dict.fromkeys(ID_PATTERN.findall(body)))
+        text = self.fixture(name)
+        if not ids:
+            return text
+        return re.sub(r'\$ID(\d+)', lambda m: ids[int(m.group(1)) % len(ids)], text)
+
+    def save_recording(self, name, body, response):
+        """Save a real provider response as a fixture, with request ids templated"""
+        ids = list(dict.fromkeys(ID_PATTERN.findall(body)))
+        for n, attendee_id in enumerate(ids):
+            response = re.sub(rf'(?<![\w-]){re.escape(attendee_id)}(?![\w-])', f'$ID{n}', response)
+        with open(os.path.join(FIXTURES_DIR, f'{name}.json'), 'w', encoding='utf-8') as f:
+            f.write(response)
+        self.fixtures.pop(name, None)
+
+    def model_route(self, path, body):
+        """Fixture name for a model call"""
+        if path.startswith('/v1/messages'):
+            return 'anthropic-extract' if '"type": "document"' in body else 'anthropic-search'
+        if '{\\"ids\\"' in body:
+            return 'gemini-screen'
+        if '\\"entities\\"' in body:
+            return 'gemini-entities'
+        return 'gemini-search'
+
+def make_handler(standin):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_body(self, status, body):
+            data = body.encode('utf-8') if isinstance(body, str) else body
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def read_body(self):
+            length = int(self.headers.get('Content-Length', 0))
+            return self.rfile.read(length).decode('utf-8') if length else ''
+
+        def do_POST(self):
+            started = time.perf_counter()
+            body = self.read_body()
+            path = urllib.parse.urlsplit(self.path).path
+
+            if path.endswith(':batchEmbedContents'):
+                requests = json.loads(body)['requests']
+                embeddings = [{'values': hashed_embedding(r['content']['parts'][0]['text'])} for r in requests]
+                if len(requests) == 1:
+                    standin.queries[tuple(embeddings[0]['values'][:8])] = requests[0]['content']['parts'][0]['text'].lower()
+                standin.delay('gemini-embed', started)
+                self.send_body(200, json.dumps({'embeddings': embeddings}))
+                return
+
+            if path.endswith(':generateContent') or path.startswith('/v1/messages'):
+                route = standin.model_route(path, body)
+                if standin.record:
+                    upstream = UPSTREAMS['anthropic' if path.startswith('/v1/messages') else 'gemini']
+                    req = urllib.request.Request(upstream + self.path, data=body.encode('utf-8'), headers={
+                        k: v for k, v in self.headers.items() if k.lower() in ('content-type', 'x-api-key', 'anthropic-version')
+                    })
+                    response = urllib.request.urlopen(req, timeout=300).read().decode('utf-8')
+                    standin.save_recording(route, body, response)
+                else:
+                    response = standin.replay(route, body)
+                    standin.delay(route, started)
+                self.send_body(200, response)
+                return
+
+            if path.endswith('/rpc/attendee_profiles'):
+                with standin.tables.lock:
+                    rows = [standin.tables.rows[i] for i in json.loads(body).get('ids', []) if i in standin.tables.rows]
+                profiles = [projected_profile(row) for row in rows]
+                standin.delay('supabase-rpc', started)
+                self.send_body(200, json.dumps([{'id': p['id'], 'digest': d, 'profile': p} for d, p in profiles]))
+                return
+
+            if path.endswith('/rpc/attendee_facet_sources'):
+                query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+                offset = int(query.get('offset', ['0'])[0])
+                limit = int(query.get('limit', ['1000'])[0])
+                with standin.tables.lock:
+                    rows = [standin.tables.rows[i] for i in sorted(standin.tables.rows)[offset:offset + limit]]
+                sources = [{
+                    'id': str(row['id']),
+                    'school': row.get('school'),
+                    'location': row.get('location'),
+                    'experience': [{'company': e.get('company')} for e in json.loads(row.get('experience') or '[]')],
+                    'education': [{'school': e.get('school')} for e in json.loads(row.get('education') or '[]')]
+                } for row in rows]
+                standin.delay('supabase-rpc', started)
+                self.send_body(200, json.dumps(sources))
+                return
+
+            if path.endswith('/rpc/sync_diff'):
+                data = json.loads(body)
+                with standin.tables.lock:
+                    rows = standin.tables.sync_state
+                    result = {
+                        'version': max((row['version'] for row in rows.values()), default=0),
+                        'upload': [i for i, h in data['manifest'].items()
+                                   if i not in rows or rows[i]['deleted'] or rows[i]['hash'] != h],
+                        'deleted_since': [i for i, row in rows.items() if row['deleted'] and row['version'] > data['since']]
+                    }
+                standin.delay('supabase-rpc', started)
+                self.send_body(200, json.dumps(result))
+                return
+
+            if path.endswith('/rpc/record_query'):
+                data = json.loads(body)
+                with standin.tables.lock:
+                    log = standin.tables.query_log
+                    log[data['search_query']] = runs = log.get(data['search_query'], 0) + 1
+                    for query in sorted(log, key=lambda q: (-log[q], q != data['search_query']))[int(data.get('keep', 500)):]:
+                        del log[query]
+                standin.delay('supabase-rpc', started)
+                self.send_body(200, json.dumps(runs))
+                return
+
+            if path.startswith('/rest/v1/rpc/'):
+                data = json.loads(body or '{}')
+                words = set(WORD_PATTERN.findall(standin.queries.get(tuple(data.get('query_embedding', [])[:8]), '')))
+                matches = standin.tables.match(words, int(data.get('match_count', 50)))
+                if path.endswith('/match_attendees'):
+                    rows = [dict(row, similarity=similarity) for row, similarity in matches]
+                elif path.endswith('/match_attendees_projected'):
+                    rows = []
+                    for row, similarity in matches:
+                        digest, profile = projected_profile(row)
+                        rows.append({'id': profile['id'], 'similarity': similarity, 'digest': digest,
+                                     'profile': None if data.get('ids_only') else profile})
+                elif path.endswith('/match_attendee_chunks'):
+                    rows = [{'attendee': row, 'similarity': similarity, 'chunks': []} for row, similarity in matches]
+                else:
+                    rows = [{'attendee': row, 'similarity': similarity} for row, similarity in matches]
+                standin.delay('supabase-rpc', started)
+                self.send_body(200, json.dumps(rows))
+                return
+
+            if path == '/rest/v1/attendees':
+                standin.tables.upsert(json.loads(body))
+            elif path == '/rest/v1/sync_state':
+                written = []
+                with standin.tables.lock:
+                    for row in json.loads(body):
+                        standin.tables.sync_version += 1
+                        row = dict(row, version=standin.tables.sync_version)
+                        standin.tables.sync_state[row['id']] = row
+                        written.append(row)
+                standin.delay('supabase-rest', started)
+                self.send_body(201, json.dumps(written))
+                return
+            elif path == '/rest/v1/entities':
+                with standin.tables.lock:
+                    standin.tables.version += 1
+                    for row in json.loads(body):
+                        standin.tables.entities[(row['kind'], row['key'])] = row
+            standin.delay('supabase-rest', started)
+            self.send_body(201, '')
+
+        def do_DELETE(self):
+            started = time.perf_counter()
+            parsed = urllib.parse.urlsplit(self.path)
+            if parsed.path == '/rest/v1/attendees':
+                attendee_id = urllib.parse.parse_qs(parsed.query).get('id', [''])[0]
+                standin.tables.delete(attendee_id.removeprefix('eq.'))
+            standin.delay('supabase-rest', started)
+            self.send_body(204, '')
+
+        def do_GET(self):
+            started = time.perf_counter()
+            parsed = urllib.parse.urlsplit(self.path)
+            rows = []
+            if parsed.path == '/rest/v1/dataset_version':
+                rows = [{'version': standin.tables.version}]
+            elif parsed.path == '/rest/v1/entities':
+                query = urllib.parse.parse_qs(parsed.query)
+                offset = int(query.get('offset', ['0'])[0])
+                limit = int(query.get('limit', ['1000'])[0])
+                with standin.tables.lock:
+                    rows = [standin.tables.entities[k] for k in sorted(standin.tables.entities)[offset:offset + limit]]
+            elif parsed.path == '/rest/v1/sync_state':
+                query = urllib.parse.parse_qs(parsed.query)
+                wanted = re.findall(r'"([^"]+)"', query.get('id', [''])[0])
+                offset = int(query.get('offset', ['0'])[0])
+                limit = int(query.get('limit', ['1000'])[0])
+                with standin.tables.lock:
+                    rows = [standin.tables.sync_state[i] for i in sorted(standin.tables.sync_state)
+                            if not standin.tables.sync_state[i]['deleted'] and (not wanted or i in wanted)]
+                rows = rows[offset:offset + limit]
+            elif parsed.path == '/rest/v1/query_log':
+                limit = int(urllib.parse.parse_qs(parsed.query).get('limit', ['1000'])[0])
+                with standin.tables.lock:
+                    log = standin.tables.query_log
+                    rows = [{'query': q} for q in sorted(log, key=lambda q: (-log[q], q))[:limit]]
+            elif parsed.path == '/rest/v1/attendees':
+                id_filter = urllib.parse.parse_qs(parsed.query).get('id', [''])[0]
+                wanted = re.findall(r'"([^"]+)"', id_filter)
+                with standin.tables.lock:
+                    rows = [dict(standin.tables.rows[i]) for i in wanted if i in standin.tables.rows]
+                for row in rows:
+                    row['embedding'] = hashed_embedding(json.dumps(row))
+            standin.delay('supabase-rest', started)
+            self.send_body(200, json.dumps(rows))
+
+    return Handler
+
+def parse_latency(specs):
+    latency = dict(DEFAULT_LATENCY)
+    for spec in specs or []:
+        route, _, values = spec.partition('=')
+        median, _, p95 = values.partition(':')
+        if route not in latency:
+            raise SystemExit(f'Unknown route {route}: routes are {", ".join(latency)}')
+        latency[route] = (float(median), float(p95 or median))
+    return latency
+
+def start(port=0, profiles=10000, latency=None, scale=1.0, record=False):
+    """Start the stand-in in a background thread; returns the server"""
+    standin = StandIn(synthesize(profiles), latency or dict(DEFAULT_LATENCY), scale, record)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(standin))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--profiles', type=int, default=10000, help='Profiles pre-loaded into the attendees table')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='Multiply every latency, e.g. 0.01 for quick runs')
+    parser.add_argument('--latency', action='append', metavar='ROUTE=MEDIAN:P95', help='Override a route latency in ms')
+    parser.add_argument('--record', action='store_true', help='Forward model calls upstream and save them as fixtures')
+    args = parser.parse_args()
+
+    server = start(args.port, args.profiles, parse_latency(args.latency), args.latency_scale, args.record)
+    print(f'Stand-in listening on http://127.0.0.1:{server.server_port}', flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Single-process server for the app and every /api function
+
+On Vercel each function runs in its own instance with its own data
+directory, so the local vector backends (VECTOR_BACKEND=hnsw, exact, int8 or
+binary) that sync-attendees writes are never seen by vector-search. This
+server serves the static app and all api/*.py handlers from one process, so
+sync and search share one data directory and one in-memory store. It needs
+nothing beyond the standard library. It listens on port 8000 by default, where
+the app running on localhost sends /api/search, so it stands in for
+proxy-server.py as well.
+
+Usage: python3 local-server.py [--port 8000] [--host localhost]
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import urllib.parse
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(ROOT, 'api')
+
+def load_handlers():
+    """Route name (the file name without .py) -> the handler class it defines"""
+    handlers = {}
+    for filename in sorted(os.listdir(API_DIR)):
+        if not filename.endswith('.py'):
+            continue
+        name = filename[:-3]
+        spec = importlib.util.spec_from_file_location(name.replace('-', '_'), os.path.join(API_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        try:
+            spec.loader.exec_module(module)
+        except ImportError as e:
+            print(f'Skipping /api/{name}: {e}', flush=True)
+            continue
+        handlers[name] = module.handler
+    return handlers
+
+class Router(SimpleHTTPRequestHandler):
+    """Static files from the project root; /api/<name> goes to api/<name>.py"""
+
+    handlers = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=ROOT, **kwargs)
+
+    def _dispatch(self, method):
+        path = urllib.parse.urlsplit(self.path).path.rstrip('/')
+        if not path.startswith('/api/'):
+            return False
+        name = path[len('/api/'):]
+        if name.endswith('.py'):
+            name = name[:-3]
+        route = self.handlers.get(name)
+        if route is None or not hasattr(route, method):
+            self.send_error(404 if route is None else 405)
+            return True
+        # Handlers only use BaseHTTPRequestHandler state, so this request
+        # becomes one of theirs for as long as it is handled
+        self.__class__ = route
+        try:
+            getattr(route, method)(self)
+        finally:
+            self.__class__ = Router
+        return True
+
+    def do_GET(self):
+        if not self._dispatch('do_GET'):
+            super().do_GET()
+
+    def do_POST(self):
+        if not self._dispatch('do_POST'):
+            self.send_error(405)
+
+    def do_OPTIONS(self):
+        if not self._dispatch('do_OPTIONS'):
+            self.send_response(200)
+            self.end_headers()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, API_DIR)
+    Router.handlers = load_handlers()
+    server = ThreadingHTTPServer((args.host, args.port), Router)
+    server.daemon_threads = True
+    print(f'Serving the app and /api/{{{",".join(Router.handlers)}}} on http://{args.host}:{args.port}', flush=True)
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
@@ -4,10 +4,23 @@ Multi-model proxy server for AI search
 Supports: Claude Sonnet, Gemini Pro/Flash, GPT-4o/mini with caching
 """
 
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, request, jsonify, make_response, g
 import requests
 import json
 import os
+import sys
+import threading
+import time
+
+# Shared modules (job queue, sync, extraction) live with the serverless functions
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from _lib.coalesce import flight_key, join_flight, normalize_query
+from _lib.encoding import compress, decode_body
+from _lib.jobs import get_job_store, handle_job_request, run_job
+from _lib.metrics import REGISTRY, Timings, record_usage
+from _lib.providers import ANTHROPIC_BASE_URL, GEMINI_BASE_URL, OPENAI_BASE_URL
+from _lib.resilience import FUNCTION_MAX_DURATION
 
 app = Flask(__name__)
 
@@ -15,10 +28,34 @@ app = Flask(__name__)
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Content-Encoding')
     response.headers.add('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+
+    # Compress JSON responses the client accepts compressed
+    timings = g.get('timings')
+    if response.mimetype == 'application/json' and not response.direct_passthrough and 'Content-Encoding' not in response.headers:
+        started = time.perf_counter()
+        body, encoding = compress(response.get_data(), request.headers.get('Accept-Encoding'))
+        if timings is not None:
+            timings.add('compress', time.perf_counter() - started)
+        if encoding:
+            response.set_data(body)
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+
+    # Stage timings of instrumented routes, for the browser and /metrics
+    if timings is not None:
+        response.headers['Server-Timing'] = timings.header()
+        timings.finish(response.status_code)
     return response
 
+@app.teardown_request
+def teardown_request(exception):
+    # Release requests waiting on this one's search, answered or not
+    flight = g.pop('flight', None)
+    if flight is not None:
+        flight.finish()
+
 def get_base_prompt():
     """Returns the base prompt text used for all models"""
     return """SCORING RULES (score field is REQUIRED):
@@ -149,7 +186,7 @@ def call_anthropic_api(api_key, search_query, attendees_data):
     base_prompt = get_base_prompt()
 
     response = requests.post(
-        'https://api.anthropic.com/v1/messages',
+        f'{ANTHROPIC_BASE_URL}/v1/messages',
         headers={
             'Content-Type': 'application/json',
             'x-api-key': api_key,
@@ -197,7 +234,7 @@ def call_gemini_api(api_key, search_query, attendees_data, model_id):
     """
     base_prompt = get_base_prompt()
 
-    url = f'https://generativelanguage.googleapis.com/v1beta/models/{model_id}:generateContent?key={api_key}'
+    url = f'{GEMINI_BASE_URL}/v1beta/models/{model_id}:generateContent?key={api_key}'
 
     response = requests.post(
         url,
@@ -241,7 +278,7 @@ def call_openai_api(api_key, search_query, attendees_data, model_id):
     base_prompt = get_base_prompt()
 
     response = requests.post(
-        'https://api.openai.com/v1/chat/completions',
+        f'{OPENAI_BASE_URL}/v1/chat/completions',
         headers={
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {api_key}'
@@ -331,6 +368,10 @@ def parse_openai_response(response_json):
     except Exception as e:
         raise Exception(f"Failed to parse OpenAI response: {str(e)}")
 
+def request_json():
+    """The request's JSON body, decompressed if sent with Content-Encoding"""
+    return json.loads(decode_body(request.get_data(), request.headers.get('Content-Encoding')) or b'null')
+
 @app.route('/api/search', methods=['POST', 'OPTIONS'])
 def proxy_search():
     """Proxy endpoint for AI search requests"""
@@ -344,9 +385,12 @@ def proxy_search():
     print(f"Handling POST request, Content-Type: {request.content_type}", flush=True)
 
     try:
+        g.timings = Timings('proxy-search')
+
         # Get the request data from the frontend
         print("Step 1: Getting JSON data...", flush=True)
-        data = request.get_json(force=True)
+        with g.timings.span('parse'):
+            data = request_json()
         print(f"Step 2: Got data, keys: {list(data.keys())}", flush=True)
 
         search_query = data.get('query')
@@ -375,28 +419,46 @@ def proxy_search():
         else:
             return jsonify({'error': f'Invalid model: {model}'}), 400
 
+        # Identical searches already running: wait for their answer instead of
+        # calling the model again
+        flight = join_flight(flight_key('search', normalize_query(search_query), model, attendees_data), 'proxy-search')
+        if flight.leader:
+            g.flight = flight
+        else:
+            with g.timings.span('coalesced'):
+                shared = flight.wait(FUNCTION_MAX_DURATION)
+            if shared is not None:
+                body, status_code = shared
+                return jsonify(body), status_code
+
         # Call the appropriate API based on model
         print(f"Step 4: Calling {model} API...", flush=True)
 
-        if model == 'claude-sonnet':
-            response = call_anthropic_api(api_key, search_query, attendees_data)
-        elif model == 'gemini-3-pro':
-            response = call_gemini_api(api_key, search_query, attendees_data, 'gemini-3-pro-preview')
-        elif model == 'gemini-3-flash':
-            response = call_gemini_api(api_key, search_query, attendees_data, 'gemini-3-flash-preview')
-        else:
-            return jsonify({'error': f'Invalid model: {model}'}), 400
+        with g.timings.span('llm'):
+            if model == 'claude-sonnet':
+                response = call_anthropic_api(api_key, search_query, attendees_data)
+            elif model == 'gemini-3-pro':
+                response = call_gemini_api(api_key, search_query, attendees_data, 'gemini-3-pro-preview')
+            elif model == 'gemini-3-flash':
+                response = call_gemini_api(api_key, search_query, attendees_data, 'gemini-3-flash-preview')
+            else:
+                return jsonify({'error': f'Invalid model: {model}'}), 400
+        # requests measures elapsed up to the response headers
+        g.timings.add('llm_ttfb', response.elapsed.total_seconds())
 
         print(f"Step 5: Got response, status code: {response.status_code}", flush=True)
 
         if response.status_code == 200:
             response_json = response.json()
+            record_usage('anthropic' if model == 'claude-sonnet' else 'gemini', model, response_json)
 
             # Parse response based on provider
-            if model.startswith('gemini'):
-                response_json = parse_gemini_response(response_json)
+            with g.timings.span('parse_response'):
+                if model.startswith('gemini'):
+                    response_json = parse_gemini_response(response_json)
 
             print("Step 6: Success! Returning response", flush=True)
+            flight.publish(response_json, 200)
             return jsonify(response_json), 200
         else:
             error_detail = response.text
@@ -439,6 +501,44 @@ def proxy_search():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs', methods=['POST', 'OPTIONS'])
+def jobs():
+    """Submit background jobs and report their progress"""
+    print(f"===== ROUTE HIT: {request.method} request to /api/jobs =====", flush=True)
+
+    if request.method == 'OPTIONS':
+        return make_response('', 200)
+
+    try:
+        data = request_json() or {}
+        # The worker thread does the processing here; status polls only read
+        data['run'] = False
+        response, status_code = handle_job_request(data)
+        return jsonify(response), status_code
+    except Exception as e:
+        print(f"EXCEPTION in jobs: {type(e).__name__}: {str(e)}", flush=True)
+        return jsonify({'error': str(e)}), 500
+
+def job_worker(poll_seconds=2):
+    """Drain the job queue in the background for as long as the server runs"""
+    store = get_job_store()
+    while True:
+        try:
+            job_id = run_job(store)
+            if job_id:
+                print(f"Job worker: worked on {job_id}: {store.summary(job_id)['status']}", flush=True)
+                continue
+        except Exception as e:
+            print(f"EXCEPTION in job_worker: {type(e).__name__}: {str(e)}", flush=True)
+        time.sleep(poll_seconds)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage latency histograms, request counts and token usage in Prometheus text format"""
+    response = make_response(REGISTRY.render(), 200)
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4'
+    return response
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
@@ -451,4 +551,5 @@ if __name__ == '__main__':
     print("Registered routes:")
     for rule in app.url_map.iter_rules():
         print(f"  {rule.endpoint}: {rule.rule} [{', '.join(rule.methods)}]")
+    threading.Thread(target=job_worker, daemon=True).start()
     app.run(host='localhost', port=8000, debug=False, use_reloader=False)
@@ -0,0 +1,58 @@
+-- Chunk-level embeddings for attendees
+--
+-- One row per profile section (each experience, education, project,
+-- organization, volunteering and award entry, plus headline and about),
+-- addressed by (section, idx) exactly like search highlights. idx is null for
+-- headline/about. Run this in the Supabase SQL editor, then set
+-- ATTENDEE_CHUNKS=1 and re-sync so api/sync-attendees.py fills the table and
+-- api/vector-search.py retrieves through match_attendee_chunks.
+
+create table if not exists attendee_chunks (
+  id text primary key,                 -- '<attendee_id>:<section>:<idx>'
+  attendee_id text not null references attendees(id) on delete cascade,
+  section text not null,
+  idx integer,
+  content text not null,
+  embedding vector(768) not null
+);
+
+create index if not exists attendee_chunks_attendee_id_idx on attendee_chunks (attendee_id);
+
+create index if not exists attendee_chunks_embedding_idx
+  on attendee_chunks using hnsw (embedding vector_cosine_ops);
+
+-- Max-sim retrieval: rank attendees by their best-matching chunk and return
+-- the matching chunk addresses so highlights can point at them directly
+create or replace function match_attendee_chunks(
+  query_embedding vector(768),
+  match_threshold float,
+  match_count int,
+  chunk_count int default 400
+)
+returns table (attendee jsonb, similarity float, chunks jsonb)
+language sql stable
+as $$
+  with top_chunks as (
+    select c.attendee_id, c.section, c.idx,
+           1 - (c.embedding <=> query_embedding) as similarity
+    from attendee_chunks c
+    where 1 - (c.embedding <=> query_embedding) > match_threshold
+    order by c.embedding <=> query_embedding
+    limit chunk_count
+  ),
+  per_attendee as (
+    select attendee_id,
+           max(similarity) as similarity,
+           jsonb_agg(
+             jsonb_build_object('section', section, 'index', idx, 'similarity', similarity)
+             order by similarity desc
+           ) as chunks
+    from top_chunks
+    group by attendee_id
+  )
+  select to_jsonb(a) - 'embedding', p.similarity, p.chunks
+  from per_attendee p
+  join attendees a on a.id = p.attendee_id
+  order by p.similarity desc
+  limit match_count;
+$$;
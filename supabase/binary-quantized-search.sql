@@ -0,0 +1,32 @@
+-- Binary-quantized attendee retrieval with exact rescoring (pgvector >= 0.7)
+--
+-- Indexes the sign bits of each embedding (768 bits = 96 bytes instead of
+-- 3 KB), shortlists by Hamming distance and rescores the shortlist with the
+-- full-precision cosine similarity. Run this in the Supabase SQL editor and
+-- set VECTOR_BACKEND=supabase-binary to have api/vector-search.py use it in
+-- place of match_attendees.
+
+create index if not exists attendees_embedding_binary_idx
+  on attendees using hnsw ((binary_quantize(embedding)::bit(768)) bit_hamming_ops);
+
+create or replace function match_attendees_binary(
+  query_embedding vector(768),
+  match_threshold float,
+  match_count int,
+  rescore_factor int default 10
+)
+returns table (attendee jsonb, similarity float)
+language sql stable
+as $$
+  with shortlist as (
+    select a.*
+    from attendees a
+    order by binary_quantize(a.embedding)::bit(768) <~> binary_quantize(query_embedding)
+    limit match_count * rescore_factor
+  )
+  select to_jsonb(s) - 'embedding', 1 - (s.embedding <=> query_embedding) as similarity
+  from shortlist s
+  where 1 - (s.embedding <=> query_embedding) > match_threshold
+  order by s.embedding <=> query_embedding
+  limit match_count;
+$$;
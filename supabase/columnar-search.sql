@@ -0,0 +1,65 @@
+-- Columnar attendee retrieval: only the columns the search prompts use
+--
+-- match_attendees returns whole rows - image and url included - with the
+-- experience, education... lists as JSON text that api/vector-search.py
+-- parses a second time. match_attendees_projected returns each match's
+-- prompt columns as one jsonb object (the lists as real JSON) with an md5
+-- digest of it, or with ids_only just the id, similarity and digest, so the
+-- profiles can come from the function's local profile cache;
+-- attendee_profiles fetches the ones the cache lacks. Run this in the
+-- Supabase SQL editor and set SUPABASE_PROJECTION=columns or ids.
+
+-- Nulls and empty lists are left out, as the prompts leave them out
+create or replace function attendee_profile(a attendees)
+returns jsonb
+language sql stable
+as $$
+  select jsonb_strip_nulls(jsonb_build_object(
+    'id', a.id,
+    'name', a.name,
+    'headline', a.headline,
+    'location', a.location,
+    'school', a.school,
+    'about', a.about,
+    'experience', nullif(coalesce(a.experience, '[]')::jsonb, '[]'::jsonb),
+    'education', nullif(coalesce(a.education, '[]')::jsonb, '[]'::jsonb),
+    'organizations', nullif(coalesce(a.organizations, '[]')::jsonb, '[]'::jsonb),
+    'volunteering', nullif(coalesce(a.volunteering, '[]')::jsonb, '[]'::jsonb),
+    'projects', nullif(coalesce(a.projects, '[]')::jsonb, '[]'::jsonb),
+    'awards', nullif(coalesce(a.awards, '[]')::jsonb, '[]'::jsonb),
+    'skills', nullif(to_jsonb(a.skills), '[]'::jsonb),
+    'languages', nullif(to_jsonb(a.languages), '[]'::jsonb),
+    'interests', nullif(to_jsonb(a.interests), '[]'::jsonb)
+  ));
+$$;
+
+create or replace function match_attendees_projected(
+  query_embedding vector(768),
+  match_threshold float,
+  match_count int,
+  ids_only boolean default false
+)
+returns table (id text, similarity float, digest text, profile jsonb)
+language sql stable
+as $$
+  with matches as (
+    select a, 1 - (a.embedding <=> query_embedding) as similarity
+    from attendees a
+    where 1 - (a.embedding <=> query_embedding) > match_threshold
+    order by a.embedding <=> query_embedding
+    limit match_count
+  )
+  select (m.a).id, m.similarity, md5(p.profile::text),
+         case when ids_only then null else p.profile end
+  from matches m, lateral (select attendee_profile(m.a) as profile) p
+  order by m.similarity desc;
+$$;
+
+create or replace function attendee_profiles(ids text[])
+returns table (id text, digest text, profile jsonb)
+language sql stable
+as $$
+  select a.id, md5(p.profile::text), p.profile
+  from attendees a, lateral (select attendee_profile(a) as profile) p
+  where a.id = any(ids);
+$$;
@@ -0,0 +1,143 @@
+-- State every function reads the same way
+--
+-- On Vercel each function has its own data directory, so what sync-attendees
+-- keeps there (the facet index, for one) is never seen by /api/vector-search
+-- or /api/facets. With this add-on they read it from Supabase instead:
+-- dataset_version is bumped by every write to the attendees table, and each
+-- function rebuilds its facet index from attendee_facet_sources - the names
+-- only, not the profiles - when the version moves. Companies and schools
+-- resolved by entity enrichment go to the entities table, which the search
+-- functions read their facts from, searches are counted in query_log for
+-- the warm-up after a sync, and sync_state holds the hashes and tombstones
+-- delta sync compares against. Run this in the Supabase SQL editor;
+-- there is nothing to set, the functions use it once it exists.
+
+create table if not exists dataset_version (
+  id int primary key default 1 check (id = 1),
+  version bigint not null default 0
+);
+
+insert into dataset_version (id, version) values (1, 0) on conflict (id) do nothing;
+
+create or replace function bump_dataset_version()
+returns trigger
+language plpgsql
+as $$
+begin
+  update dataset_version set version = version + 1 where id = 1;
+  return null;
+end;
+$$;
+
+drop trigger if exists attendees_dataset_version on attendees;
+create trigger attendees_dataset_version
+  after insert or update or delete on attendees
+  for each statement execute function bump_dataset_version();
+
+-- What the facet index is built from: school, location and the company and
+-- school of each experience and education entry
+create or replace function attendee_facet_sources()
+returns table (id text, school text, location text, experience jsonb, education jsonb)
+language sql stable
+as $$
+  select a.id, a.school, a.location,
+         (select coalesce(jsonb_agg(jsonb_build_object('company', e->>'company')), '[]'::jsonb)
+          from jsonb_array_elements(coalesce(a.experience, '[]')::jsonb) e),
+         (select coalesce(jsonb_agg(jsonb_build_object('school', e->>'school')), '[]'::jsonb)
+          from jsonb_array_elements(coalesce(a.education, '[]')::jsonb) e)
+  from attendees a
+  order by a.id;
+$$;
+
+-- Facts about companies and schools (see api/_lib/entities.py), keyed by the
+-- normalized name the facet index uses. Writes bump the dataset version too:
+-- the industry and org_location facets are derived from them.
+create table if not exists entities (
+  kind text not null,
+  key text not null,
+  name text,
+  location text,
+  industry text,
+  type text,
+  primary key (kind, key)
+);
+
+drop trigger if exists entities_dataset_version on entities;
+create trigger entities_dataset_version
+  after insert or update or delete on entities
+  for each statement execute function bump_dataset_version();
+
+-- Searches people have run and how often (see api/_lib/warmup.py), so the
+-- warm-up sync-attendees runs after a sync sees what vector-search logged.
+-- Not part of the dataset: writes leave the version alone.
+create table if not exists query_log (
+  query text primary key,
+  count bigint not null default 0,
+  last_run timestamptz not null default now()
+);
+
+-- Count one run of a normalized query, keeping the keep most frequent
+create or replace function record_query(search_query text, keep int default 500)
+returns bigint
+language plpgsql
+as $$
+declare
+  runs bigint;
+begin
+  insert into query_log (query, count) values (search_query, 1)
+  on conflict (query) do update set count = query_log.count + 1, last_run = now()
+  returning count into runs;
+  delete from query_log where query in (
+    select query from query_log order by count desc, last_run desc offset keep
+  );
+  return runs;
+end;
+$$;
+
+-- What delta sync compares client manifests against (see
+-- api/_lib/sync_state.py): each attendee's content hash, or a tombstone once
+-- deleted, and the version it last changed at. Versions come from one
+-- sequence, so every function hands clients versions from the same counter.
+create sequence if not exists sync_version;
+
+create table if not exists sync_state (
+  id text primary key,
+  hash text,
+  deleted boolean not null default false,
+  version bigint not null default nextval('sync_version')
+);
+
+create index if not exists sync_state_version_idx on sync_state (version);
+
+create or replace function next_sync_version()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.version := nextval('sync_version');
+  return new;
+end;
+$$;
+
+drop trigger if exists sync_state_version on sync_state;
+create trigger sync_state_version
+  before update on sync_state
+  for each row execute function next_sync_version();
+
+-- The ids of a client manifest ({id: hash}) stored with other content or
+-- not at all, and the ids deleted after the client's version
+create or replace function sync_diff(manifest jsonb, since bigint)
+returns jsonb
+language sql stable
+as $$
+  select jsonb_build_object(
+    'version', (select coalesce(max(version), 0) from sync_state),
+    'upload', (select coalesce(jsonb_agg(m.key), '[]'::jsonb)
+               from jsonb_each_text(manifest) m
+               left join sync_state s on s.id = m.key and not s.deleted
+               where s.hash is distinct from m.value),
+    'deleted_since', (select coalesce(jsonb_agg(s.id), '[]'::jsonb)
+                      from sync_state s
+                      where s.deleted and s.version > since)
+  );
+$$;